@@ -0,0 +1,213 @@
+"""
+Times each analysis stage on synthetic fields of increasing size and writes the results as JSON.
+
+    python -m benchmarks.bench_stages
+    python -m benchmarks.bench_stages --wells 10 100 --months 1 12 --compare results/benchmarks/baseline.json
+
+A stage slower than --budget seconds is not run on the larger fields, so the full grid finishes
+while the slow stages still show how they scale. --compare exits with 1 when a stage got slower
+than the baseline by more than --tolerance.
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import synthetic
+from process_data import bhp_pf, bhp_vs_whp, coeffs_process, instrument, ipr, merge, pf_oil_benefit, pf_press_rate
+from process_data import process, welltests
+
+RESULTS_DIR = os.path.join("results", "benchmarks")
+
+
+def _calc_optimal_rp(merged: pd.DataFrame, max_rp: int) -> pd.DataFrame:
+    # woffl is only needed here, import it when the stage runs
+    from process_data import calc_PI_RP
+
+    return calc_PI_RP.calc_optimal_RP(merged.copy(), max_pres=max_rp)
+
+
+def _true_rp(merged: pd.DataFrame, field: Dict) -> pd.DataFrame:
+    """Reservoir pressure from the generator, lets the IPR and lookup stages run without woffl."""
+    rp_calc = merged.copy()
+    rp_calc["Optimal_RP"] = rp_calc["well"].map(field["wells"]["pres"])
+    rp_calc["PI"] = rp_calc["WtTotalFluid"] / (rp_calc["Optimal_RP"] - rp_calc["BHP"])
+    return rp_calc
+
+
+def run_case(num_wells: int, months: int, seed: int, skip: set, max_rp: int, work_dir: str) -> List[Dict]:
+    """
+    Run every stage once on a synthetic field.
+
+    Returns:
+        List[Dict]: One record per stage with wall_s, cpu_s, rows_in, rows_out and status
+    """
+    records = []
+
+    def stage(name: str, func: Callable, *args):
+        if name in skip:
+            records.append({"stage": name, "status": "over budget"})
+            return None
+        with instrument.run(work_dir, memory=False) as report:
+            try:
+                with instrument.stage(name, inputs=list(args)) as stats:
+                    result = func(*args)
+                    stats["rows_out"] = instrument.count_rows(result)
+            except ImportError as error:
+                records.append({"stage": name, "status": f"skipped: {error}"})
+                return None
+        # the outer stage only, the instrumented functions inside it are part of its time
+        records.append({key: value for key, value in report.records[-1].items() if key != "depth"})
+        return result
+
+    field = stage("generate", synthetic.generate, num_wells, months, "2024-01-01", seed)
+    long = synthetic.scada_long(field)
+    tests_path = os.path.join(work_dir, "well_tests.csv")
+    synthetic.well_tests(field).to_csv(tests_path, index=False)
+    raw_daily = synthetic.wt_average(field)
+    jp_dfs = synthetic.jp_well_dfs(field)
+
+    well_dfs = stage("proc_scada", process.proc_scada, long, field["header_tags"])
+    del long
+    if well_dfs is not None:
+        stage("whp_daily_fit", bhp_vs_whp.fit_daily_coefficients, well_dfs, "WHP")
+        header_coeffs = stage("header_daily_fit", bhp_vs_whp.fit_daily_coefficients, well_dfs, "HeaderP")
+        if header_coeffs is not None:
+            stage("process_coefficients", coeffs_process.process_coefficients, header_coeffs)
+    pf_coeffs = stage("pf_daily_fit", bhp_pf.fit_daily_coefficients, jp_dfs)
+
+    tests = stage("welltests", lambda path: welltests.FDCProcessor(path).get_welltests(), tests_path)
+    merged = stage("merge_data", merge.merge_data, list(raw_daily), raw_daily, tests)
+    if merged is None:
+        return records
+
+    rp_calc = stage("calc_optimal_RP", _calc_optimal_rp, merged, max_rp)
+    if rp_calc is None:
+        rp_calc = _true_rp(merged, field)
+    ipr_params = stage("fit_ipr_params", ipr.fit_ipr_params, rp_calc, 150)
+
+    if pf_coeffs is not None and ipr_params is not None:
+        processed = coeffs_process.process_coefficients(pf_coeffs)
+        bhp_table = stage("bhp_lookup", pf_press_rate.bhp_lookup, processed)
+        if bhp_table is not None:
+            liquid = stage("assign_liquid_rate", pf_press_rate.assign_liquid_rate, ipr_params, bhp_table)
+            if liquid is not None:
+                stage("calc_oil_rate", pf_oil_benefit.calc_oil_rate, liquid, merged)
+    return records
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_grid(wells: List[int], months: List[int], seed: int = 0, budget: float = 120, max_rp: int = 1800) -> Dict:
+    """
+    Run the stages on every wells x months field, smallest first.
+
+    A stage that takes longer than budget seconds is skipped on every field at least as large in
+    both wells and months.
+
+    Returns:
+        Dict: meta (versions, machine, commit) and results (one record per field and stage)
+    """
+    results = []
+    slow: Dict[str, List[tuple]] = {}
+    for num_months in sorted(months):
+        for num_wells in sorted(wells):
+            skip = {
+                name for name, sizes in slow.items() if any(num_wells >= w and num_months >= m for w, m in sizes)
+            }
+            print(f"{num_wells} wells x {num_months} months")
+            with tempfile.TemporaryDirectory() as work_dir:
+                for record in run_case(num_wells, num_months, seed, skip, max_rp, work_dir):
+                    record = {"wells": num_wells, "months": num_months, **record}
+                    results.append(record)
+                    if record.get("wall_s") is not None:
+                        print(f"  {record['stage']:<22}{record['wall_s']:>9.3f} s")
+                        if record["wall_s"] > budget:
+                            slow.setdefault(record["stage"], []).append((num_wells, num_months))
+                    else:
+                        print(f"  {record['stage']:<22}{record['status']}")
+
+    meta = {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": seed,
+        "budget_s": budget,
+    }
+    return {"meta": meta, "results": results}
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float = 0.25) -> pd.DataFrame:
+    """
+    Wall time of each stage and field against a baseline run.
+
+    Returns:
+        pd.DataFrame: wells, months, stage, baseline_s, current_s, ratio and regression
+                      (ratio above 1 + tolerance)
+    """
+    keys = ["wells", "months", "stage"]
+    columns = [*keys, "wall_s"]
+    now = pd.DataFrame(current["results"]).reindex(columns=columns).dropna(subset=["wall_s"])
+    then = pd.DataFrame(baseline["results"]).reindex(columns=columns).dropna(subset=["wall_s"])
+    table = now.merge(then, on=keys, suffixes=("_current", "_baseline"))
+    table = table.rename(columns={"wall_s_current": "current_s", "wall_s_baseline": "baseline_s"})
+    table["ratio"] = table["current_s"] / table["baseline_s"]
+    # sub 10 ms stages are timer noise
+    table["regression"] = (table["ratio"] > 1 + tolerance) & (table["current_s"] > 0.01)
+    return table[[*keys, "baseline_s", "current_s", "ratio", "regression"]]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Time the analysis stages on synthetic fields.")
+    parser.add_argument("--wells", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--months", type=int, nargs="+", default=[1, 12, 36])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--budget", type=float, default=120, help="seconds before a stage is dropped from larger fields")
+    parser.add_argument("--max-rp", type=int, default=1800)
+    parser.add_argument("--out", help="results JSON, defaults to results/benchmarks/stages-<time>.json")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against --compare")
+    args = parser.parse_args(argv)
+    # per well log messages would be timed with the stages
+    instrument.configure_logging(logging.CRITICAL)
+
+    results = run_grid(args.wells, args.months, args.seed, args.budget, args.max_rp)
+    out = args.out or os.path.join(RESULTS_DIR, f"stages-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as handle:
+        json.dump(results, handle, indent=1)
+    print(f"results written to {out}")
+
+    if args.compare:
+        with open(args.compare) as handle:
+            table = compare(results, json.load(handle), args.tolerance)
+        print(table.to_string(index=False))
+        if table["regression"].any():
+            print(f"{int(table['regression'].sum())} stage(s) slower than the baseline by more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
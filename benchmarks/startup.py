@@ -0,0 +1,98 @@
+"""
+Import time of the entry points, measured in fresh interpreters with python -X importtime.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --module pipelines --module process_data.lookup_engine --top 15
+
+For each module it records the wall time of "import <module>", the total import time reported by
+-X importtime, the slowest imports and which heavy optional packages (matplotlib, woffl, databricks,
+dotenv, PIL) got imported. Results are written as JSON like bench_stages.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+RESULTS_DIR = os.path.join("results", "benchmarks")
+MODULES = ["process_data.lookup_engine", "process_data.ipr", "pipelines", "cli"]
+HEAVY = ["matplotlib", "woffl", "databricks", "dotenv", "PIL"]
+
+_PROBE = """
+import json, sys
+import {module}
+print(json.dumps(sorted(name for name in {heavy!r} if name in sys.modules)))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """Rows of -X importtime output as dicts with module, self_us and cumulative_us."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        rows.append({"module": name.strip(), "self_us": int(self_us), "cumulative_us": int(cumulative_us)})
+    return rows
+
+
+def measure(module: str, repeat: int = 3, top: int = 10) -> Dict:
+    """
+    Import module in fresh interpreters.
+
+    Returns:
+        Dict: module, wall_s (median of repeat runs), import_s (sum of self times), heavy (optional
+              packages imported) and slowest (imports with the largest cumulative time)
+    """
+    code = _PROBE.format(module=module, heavy=HEAVY)
+    probe = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    if probe.returncode != 0:
+        return {"module": module, "error": probe.stderr.strip().splitlines()[-1]}
+    rows = parse_importtime(probe.stderr)
+
+    walls = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], check=True, capture_output=True)
+        walls.append(time.perf_counter() - start)
+    slowest = sorted(rows, key=lambda row: row["cumulative_us"], reverse=True)[:top]
+    return {
+        "module": module,
+        "wall_s": statistics.median(walls),
+        "import_s": sum(row["self_us"] for row in rows) / 1e6,
+        "heavy": json.loads(probe.stdout.strip().splitlines()[-1]),
+        "slowest": slowest,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Measure the import time of the entry points.")
+    parser.add_argument("--module", action="append", help="module to import, repeatable, defaults to the entry points")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports listed per module")
+    parser.add_argument("--out", help="results JSON, defaults to results/benchmarks/startup-<time>.json")
+    args = parser.parse_args(argv)
+
+    results = []
+    for module in args.module or MODULES:
+        result = measure(module, args.repeat, args.top)
+        results.append(result)
+        if "error" in result:
+            print(f"{module:<30}{result['error']}")
+        else:
+            heavy = ", ".join(result["heavy"]) or "none"
+            print(f"{module:<30}{result['wall_s']:>7.3f} s   heavy imports: {heavy}")
+
+    out = args.out or os.path.join(RESULTS_DIR, f"startup-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as handle:
+        json.dump({"python": sys.version.split()[0], "results": results}, handle, indent=1)
+    print(f"results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
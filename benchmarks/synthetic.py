@@ -0,0 +1,385 @@
+"""
+Synthetic field data in the formats the pipelines read, for benchmarks and dry runs without the historian.
+
+    python -m benchmarks.synthetic --wells 100 --months 12 --out results/synthetic
+
+Each well follows a Vogel IPR with a declining reservoir pressure. BHP tracks the pad header and
+wellhead pressure plus the jet pump's power fluid pressure. The series have gauge noise, shut-ins
+and gauge dropouts, which read zero or are missing. Well tests are written in the FDC export layout.
+"""
+
+import argparse
+import os
+import string
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+FDC_COLUMNS = [
+    "RouteGroupName",
+    "EntName1",
+    "WtDate",
+    "WtHours",
+    "Choke",
+    "TubingPress",
+    "IA",
+    "BHP",
+    "WtOilVol",
+    "WtGasVol",
+    "WtGasRate",
+    "WtGasLiftVol",
+    "WtWaterVol",
+    "WtrLift",
+    "WtTotalFluid",
+    "Textbox29",
+    "WtWaterCut",
+    "WtWaterCutShakeout",
+    "WtGOR",
+    "Textbox26",
+    "WtSeparatorPress",
+    "WtSeparatorTemp",
+    "WtLinePressVal",
+    "WtEspFrequency",
+    "WtEspAmps",
+    "SolidsPct",
+    "WtRemarks",
+    "WtInfoOnly",
+    "ChangeUser",
+]
+
+
+def pad_names(num_pads: int) -> List[str]:
+    """A, B, ... Z, AA, AB, ... like the pad letters in well_config."""
+    letters = string.ascii_uppercase
+    names = list(letters)
+    for first in letters:
+        names.extend(first + second for second in letters)
+    return names[:num_pads]
+
+
+def make_wells(num_wells: int, wells_per_pad: int = 12, seed: int = 0) -> pd.DataFrame:
+    """
+    Random well parameters, one row per well named like MPB-07.
+
+    Args:
+        num_wells (int): Wells in the field
+        wells_per_pad (int): Wells sharing a header
+        seed (int): Random seed
+
+    Returns:
+        pd.DataFrame: Indexed by well with pad, reservoir pressure, qmax, water cut and the pressure responses
+    """
+    rng = np.random.default_rng(seed)
+    pads = pad_names(int(np.ceil(num_wells / wells_per_pad)))
+    wells = [f"MP{pads[i // wells_per_pad]}-{i % wells_per_pad + 1:02d}" for i in range(num_wells)]
+    pres = rng.uniform(1300, 2300, num_wells)
+    return pd.DataFrame(
+        {
+            "pad": [pads[i // wells_per_pad] for i in range(num_wells)],
+            "pres": pres,
+            # psi per day
+            "decline": rng.uniform(0.05, 0.5, num_wells),
+            "qmax": rng.uniform(400, 3000, num_wells),
+            # flowing BHP as a fraction of reservoir pressure
+            "drawdown": rng.uniform(0.3, 0.7, num_wells),
+            "water_cut": rng.uniform(20, 90, num_wells),
+            "gor": rng.uniform(300, 1500, num_wells),
+            "flowline_dp": rng.uniform(5, 60, num_wells),
+            # BHP change per psi of WHP, and per psi of power fluid pressure
+            "whp_gain": rng.uniform(0.4, 2.0, num_wells),
+            "pf_gain": rng.uniform(-0.6, -0.1, num_wells),
+            "pf_pres": rng.uniform(2400, 3200, num_wells),
+            "pf_rate": rng.uniform(1200, 3200, num_wells),
+            "test_every": rng.integers(3, 11, num_wells),
+        },
+        index=pd.Index(wells, name="well"),
+    )
+
+
+def _header(index: pd.DatetimeIndex, rng) -> np.ndarray:
+    hours = np.arange(len(index))
+    base = rng.uniform(120, 250)
+    daily = 15 * np.sin(2 * np.pi * (hours % 24) / 24 + rng.uniform(0, 2 * np.pi))
+    # slow wander plus a few operating changes
+    wander = np.cumsum(rng.normal(0, 0.8, len(index)))
+    wander -= np.linspace(0, wander[-1], len(index))
+    steps = np.zeros(len(index))
+    for start in rng.integers(0, len(index), max(1, len(index) // (24 * 45))):
+        steps[start:] += rng.normal(0, 20)
+    return base + daily + wander + steps
+
+
+def _intervals(rng, length: int, every_hours: float, min_hours: int, max_hours: int) -> np.ndarray:
+    """Mask of random events, on average one every every_hours lasting min_hours to max_hours."""
+    mask = np.zeros(length, dtype=bool)
+    for start in rng.integers(0, length, rng.poisson(length / every_hours)):
+        mask[start : start + rng.integers(min_hours, max_hours + 1)] = True
+    return mask
+
+
+def vogel_rate(qmax, pres, bhp):
+    ratio = np.clip(bhp / pres, 0, 1)
+    return qmax * (1 - 0.2 * ratio - 0.8 * ratio**2)
+
+
+def well_series(well: pd.Series, header: np.ndarray, index: pd.DatetimeIndex, rng) -> pd.DataFrame:
+    """
+    Hourly BHP, HeaderP, WHP, PF_Pres and PF_Rate of one well, plus the true liquid rate.
+
+    BHP and WHP are NaN while the gauge drops out and BHP reads zero during a gauge fault, like
+    the historian data.
+    """
+    num_hours = len(index)
+    days = np.arange(num_hours) / 24
+    pres = well["pres"] - well["decline"] * days
+
+    header_p = header + rng.normal(0, 1.5, num_hours)
+    whp = header + well["flowline_dp"] + rng.normal(0, 2.0, num_hours)
+
+    # power fluid pressure set points change every few days
+    pf_steps = np.repeat(rng.normal(0, 120, num_hours // 72 + 1), 72)[:num_hours]
+    pf_pres = well["pf_pres"] + pf_steps + rng.normal(0, 15, num_hours)
+    pf_rate = well["pf_rate"] * (pf_pres / well["pf_pres"]) ** 0.5 + rng.normal(0, 30, num_hours)
+
+    bhp = (
+        well["drawdown"] * pres
+        + well["whp_gain"] * (whp - whp.mean())
+        + well["pf_gain"] * (pf_pres - well["pf_pres"])
+        + rng.normal(0, 4, num_hours)
+    )
+    bhp = np.clip(bhp, 150, pres - 50)
+    liquid = vogel_rate(well["qmax"] * pres / well["pres"], pres, bhp)
+
+    # shut-ins: no flow, BHP builds toward reservoir pressure, no power fluid
+    shut_in = _intervals(rng, num_hours, 24 * 60, 6, 72)
+    if shut_in.any():
+        starts = np.flatnonzero(np.diff(np.concatenate(([False], shut_in))) == 1)
+        hours_shut = np.zeros(num_hours)
+        for start in starts:
+            end = start
+            while end < num_hours and shut_in[end]:
+                end += 1
+            hours_shut[start:end] = np.arange(end - start)
+        build_up = pres - (pres - bhp) * np.exp(-hours_shut / 12)
+        bhp = np.where(shut_in, build_up, bhp)
+        whp = np.where(shut_in, header + rng.normal(0, 2.0, num_hours), whp)
+        liquid = np.where(shut_in, 0.0, liquid)
+        pf_rate = np.where(shut_in, rng.uniform(0, 50, num_hours), pf_rate)
+        pf_pres = np.where(shut_in, header + rng.normal(0, 10, num_hours), pf_pres)
+
+    # gauge faults read zero, dropouts are missing
+    bhp = np.where(_intervals(rng, num_hours, 24 * 30, 1, 48), 0.0, bhp)
+    bhp = np.where(_intervals(rng, num_hours, 24 * 40, 1, 24), np.nan, bhp)
+    whp = np.where(_intervals(rng, num_hours, 24 * 60, 1, 24), np.nan, whp)
+
+    return pd.DataFrame(
+        {
+            "BHP": bhp,
+            "HeaderP": header_p,
+            "WHP": whp,
+            "PF_Pres": pf_pres,
+            "PF_Rate": pf_rate,
+            "Liquid": liquid,
+            "Pres": pres,
+        },
+        index=pd.Index(index, name="datetime"),
+    )
+
+
+def generate(num_wells: int, months: int, start: str = "2024-01-01", seed: int = 0) -> Dict:
+    """
+    Hourly series and parameters of a synthetic field.
+
+    Args:
+        num_wells (int): Wells in the field
+        months (int): Months of hourly data
+        start (str): First hour
+        seed (int): Random seed, the same seed gives the same field
+
+    Returns:
+        Dict: wells (parameters), hourly (well -> hourly DataFrame), header_tags and jp_tags, the
+              tag dicts of pull_tags.gen_tag_dict and jp_data.gen_tag_dict
+    """
+    wells = make_wells(num_wells, seed=seed)
+    rng = np.random.default_rng(seed + 1)
+    start = pd.Timestamp(start)
+    index = pd.date_range(start, start + pd.DateOffset(months=months), freq="h", inclusive="left")
+
+    headers = {pad: _header(index, rng) for pad in wells["pad"].unique()}
+    hourly = {well: well_series(row, headers[row["pad"]], index, rng) for well, row in wells.iterrows()}
+
+    header_tags = {
+        well: (f"SYN_PI_{well}_BHP", f"SYN_PI_{row['pad']}_HDR", f"SYN_PI_{well}_WHP") for well, row in wells.iterrows()
+    }
+    jp_tags = {well: (f"SYN_PI_{well}_BHP", f"SYN_PI_{well}_PF", f"SYN_FI_{well}_PF") for well in wells.index}
+    return {"wells": wells, "hourly": hourly, "header_tags": header_tags, "jp_tags": jp_tags, "seed": seed}
+
+
+def scada_long(field: Dict, missing: float = 0.01) -> pd.DataFrame:
+    """
+    Hourly header tags in the long datetime, tag, value layout of pull_tags.query_tag.
+
+    Missing gauge readings have no row and a fraction missing of the other readings is dropped, as
+    the historian skips hours without samples. Pad header tags appear once per pad.
+
+    Args:
+        field (Dict): From generate
+        missing (float): Fraction of readings dropped at random
+
+    Returns:
+        pd.DataFrame: Columns datetime, tag and value, tag is categorical to keep large fields in memory
+    """
+    rng = np.random.default_rng(field["seed"] + 2)
+    parts = []
+    seen = set()
+    for well, (bhp_tag, header_tag, whp_tag) in field["header_tags"].items():
+        df = field["hourly"][well]
+        for tag, column in ((bhp_tag, "BHP"), (header_tag, "HeaderP"), (whp_tag, "WHP")):
+            if tag in seen:
+                continue
+            seen.add(tag)
+            values = df[column].to_numpy()
+            keep = ~np.isnan(values) & (rng.random(len(values)) >= missing)
+            parts.append((df.index[keep], tag, values[keep]))
+
+    tags = [tag for _, tag, _ in parts]
+    long = pd.DataFrame(
+        {
+            "datetime": np.concatenate([index.to_numpy() for index, _, _ in parts]),
+            "tag": pd.Categorical.from_codes(
+                np.concatenate([np.full(len(index), i) for i, (index, _, _) in enumerate(parts)]), categories=tags
+            ),
+            "value": np.concatenate([values for _, _, values in parts]),
+        }
+    )
+    return long.sort_values("datetime", kind="stable", ignore_index=True)
+
+
+def jp_well_dfs(field: Dict) -> Dict[str, pd.DataFrame]:
+    """Hourly BHP, PF_Pres and PF_Rate per well, like jp_data.query_tag_list."""
+    return {
+        well: df[["BHP", "PF_Pres", "PF_Rate"]].dropna(how="all").rename_axis(columns="tag")
+        for well, df in field["hourly"].items()
+    }
+
+
+def wt_average(field: Dict) -> Dict[str, pd.DataFrame]:
+    """
+    Highest six hour average of each day per well, like pull_tags.query_tag_WT_average.
+
+    Returns:
+        Dict[str, pd.DataFrame]: Daily BHP, HeaderP and WHP per well
+    """
+    well_dfs = {}
+    for well, df in field["hourly"].items():
+        six_hour = df[["BHP", "HeaderP", "WHP"]].resample("6h").mean()
+        daily = six_hour.groupby(six_hour.index.normalize()).max()
+        well_dfs[well] = daily.rename_axis(index="datetime", columns="tag")
+    return well_dfs
+
+
+def _fdc_number(values: np.ndarray) -> List[str]:
+    # the export writes thousands separators
+    return [f"{value:,.1f}" if np.isfinite(value) else "" for value in values]
+
+
+def well_tests(field: Dict) -> pd.DataFrame:
+    """
+    Well tests in the FDC export layout read by welltests.FDCProcessor.
+
+    Each well is tested every few days at the day's average rate with metering noise. Days the well
+    is shut in are not tested.
+
+    Returns:
+        pd.DataFrame: FDC_COLUMNS, numbers formatted as text like the export
+    """
+    rng = np.random.default_rng(field["seed"] + 3)
+    rows = []
+    for well, params in field["wells"].iterrows():
+        daily = field["hourly"][well].resample("D").agg({"Liquid": "mean", "WHP": "mean"})
+        test_days = daily.index[:: int(params["test_every"])]
+        daily = daily.loc[test_days]
+        daily = daily[daily["Liquid"] > 1]
+        if daily.empty:
+            continue
+
+        fluid = daily["Liquid"].to_numpy() * rng.normal(1, 0.05, len(daily))
+        water_cut = np.clip(params["water_cut"] + rng.normal(0, 1.5, len(daily)), 0, 100)
+        oil = fluid * (100 - water_cut) / 100
+        gas = oil * params["gor"] / 1000 * rng.normal(1, 0.1, len(daily))
+        gas_lift = rng.uniform(0, 2500, len(daily))
+        pad, number = well[2:].split("-")
+        rows.append(
+            pd.DataFrame(
+                {
+                    "RouteGroupName": f"MilnePt Pad {pad} Shift Log Wells (Route Group)",
+                    # MPB-07 -> MPU B-007A, FDCProcessor turns it back into MPB-07
+                    "EntName1": f"MPU {pad}-{int(number):03d}A Kuparuk PA - 50.0000.0000.00",
+                    "WtDate": daily.index.strftime("%m/%d/%Y"),
+                    "WtHours": 24,
+                    "TubingPress": np.round(daily["WHP"].to_numpy(), 1),
+                    "IA": _fdc_number(rng.uniform(800, 1300, len(daily))),
+                    "WtOilVol": _fdc_number(oil),
+                    "WtGasVol": _fdc_number(gas + gas_lift),
+                    "WtGasRate": _fdc_number(gas),
+                    "WtGasLiftVol": _fdc_number(gas_lift),
+                    "WtWaterVol": _fdc_number(fluid - oil),
+                    "WtrLift": _fdc_number(np.zeros(len(daily))),
+                    "WtTotalFluid": _fdc_number(fluid),
+                    "WtWaterCut": _fdc_number(water_cut),
+                    "WtGOR": _fdc_number(params["gor"] * rng.normal(1, 0.1, len(daily))),
+                    "WtSeparatorPress": np.round(daily["WHP"].to_numpy() - rng.uniform(0, 5, len(daily)), 1),
+                    "WtSeparatorTemp": np.round(rng.uniform(70, 110, len(daily)), 1),
+                    "WtLinePressVal": 0.0,
+                    "WtInfoOnly": "Yes",
+                    "ChangeUser": "FDC SCADA",
+                }
+            )
+        )
+    if not rows:
+        return pd.DataFrame(columns=FDC_COLUMNS)
+    return pd.concat(rows, ignore_index=True).reindex(columns=FDC_COLUMNS)
+
+
+def tag_tables(field: Dict) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Tag tables in the layout of pull_data/bhp_dict.csv and pull_data/pw_jetpump_tags.csv."""
+    bhp_dict = pd.DataFrame(
+        [(well, *tags) for well, tags in field["header_tags"].items()],
+        columns=["wellname", "bhp_tag", "headerP_tag", "whp_tag"],
+    )
+    jp_tags = pd.DataFrame(
+        [(well, *tags) for well, tags in field["jp_tags"].items()], columns=["Well", "BHG", "PF Pres", "PF Rate"]
+    )
+    return bhp_dict, jp_tags
+
+
+def write_field(field: Dict, out_dir: str) -> None:
+    """
+    Write a synthetic field to out_dir: scada_long.pkl (query_tag output), well_tests.csv (FDC
+    export), bhp_dict.csv and pw_jetpump_tags.csv (tag tables) and wells.csv (true parameters).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    scada_long(field).to_pickle(os.path.join(out_dir, "scada_long.pkl"))
+    well_tests(field).to_csv(os.path.join(out_dir, "well_tests.csv"), index=False)
+    bhp_dict, jp_tags = tag_tables(field)
+    bhp_dict.to_csv(os.path.join(out_dir, "bhp_dict.csv"), index=False)
+    jp_tags.to_csv(os.path.join(out_dir, "pw_jetpump_tags.csv"), index=False)
+    field["wells"].to_csv(os.path.join(out_dir, "wells.csv"))
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Write a synthetic field in the formats the pipelines read.")
+    parser.add_argument("--wells", type=int, default=100)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--start", default="2024-01-01")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=os.path.join("results", "synthetic"))
+    args = parser.parse_args(argv)
+
+    write_field(generate(args.wells, args.months, args.start, args.seed), args.out)
+    print(f"{args.wells} wells x {args.months} months written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import argparse
+import datetime
+import json
+import logging
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+import streaming
+import well_config
+from pipelines import header_pipeline, pf_pipeline
+from process_data import aggregate, instrument, plot_density, profiling, results_store
+from well_config import well_pad
+
+GROUPS = ("all_jps", "tract14", "f_and_l", "all_wells_with_gauges", "B_pad_JPs")
+PIPELINES = {"header": header_pipeline, "pf": pf_pipeline}
+# wells analyzed when no group is given
+DEFAULT_GROUPS = {"header": "all_wells_with_gauges", "pf": "all_jps"}
+# pipeline options the streaming mode does not have, with any of them set --chunk-size runs the pipeline
+PIPELINE_ONLY = ("incremental", "report", "monte_carlo")
+
+logger = logging.getLogger(__name__)
+
+
+def split_by_pad(wells: List[str]) -> Dict[str, List[str]]:
+    """Group wells by pad letter, keeping the order of the input list."""
+    pads: Dict[str, List[str]] = {}
+    for well in wells:
+        pads.setdefault(well_pad(well), []).append(well)
+    return pads
+
+
+def run_unit(
+    analysis: str,
+    name: str,
+    wells: List[str],
+    unit_dir: str,
+    options: dict,
+    resume: bool,
+    memory: bool = True,
+    profile: Optional[List[str]] = None,
+    chunk_size: Optional[int] = None,
+    fit_workers: int = 1,
+) -> str:
+    """
+    Run one pad or group in its own results, plots and cache folders.
+
+    The pipeline cache doubles as the stage checkpoint, so after a failure the rerun picks up at
+    the stage that failed. Stage timings, rows and memory peaks go to run_report.json/csv in the
+    pad's results folder, profiles of the stages in profile (default HPI_PROFILE) to its
+    results/profiles folder. With chunk_size the header analysis runs in streaming mode instead,
+    chunk_size wells at a time on fit_workers without the cache, see streaming.stream_header_analysis.
+    """
+    results_dir = os.path.join(unit_dir, "results")
+    profiling.configure(profile, os.path.join(results_dir, "profiles"))
+    streamable = analysis == "header" and not any(options.get(name) for name in PIPELINE_ONLY)
+    if chunk_size and streamable:
+        with instrument.run(results_dir, memory=memory):
+            streaming.stream_header_analysis(
+                wells,
+                chunk_size,
+                results_dir=results_dir,
+                plots_dir=os.path.join(unit_dir, "plots"),
+                workers=fit_workers,
+                **options,
+            )
+        return name
+    if chunk_size:
+        logger.warning(
+            "%s: streaming mode is only available for the header analysis without %s, running the pipeline",
+            name,
+            ", ".join(f"--{option.replace('_', '-')}" for option in PIPELINE_ONLY),
+        )
+    pipeline = PIPELINES[analysis](
+        wells,
+        results_dir=results_dir,
+        plots_dir=os.path.join(unit_dir, "plots"),
+        **options,
+    )
+    force = [] if resume else [stage.name for stage in pipeline.stages]
+    with instrument.run(results_dir, memory=memory):
+        pipeline.run(force=force)
+    return name
+
+
+class Checkpoint:
+    """Status of every pad of a run, rewritten after each pad finishes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.units: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path) as handle:
+                self.units = json.load(handle)
+
+    def done(self, name: str) -> bool:
+        return self.units.get(name, {}).get("status") == "done"
+
+    def mark(self, name: str, status: str, error: Optional[str] = None) -> None:
+        self.units[name] = {"status": status, "time": datetime.datetime.now().isoformat(timespec="seconds")}
+        if error:
+            self.units[name]["error"] = error
+        with open(f"{self.path}.tmp", "w") as handle:
+            json.dump(self.units, handle, indent=1, sort_keys=True)
+        os.replace(f"{self.path}.tmp", self.path)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the header pressure or power fluid analysis for a group of wells.")
+    parser.add_argument("analysis", choices=sorted(PIPELINES), help="header (main.py) or pf (b_pad_main.py)")
+    parser.add_argument("--group", choices=GROUPS, help="well_config group to analyze, defaults to every well")
+    parser.add_argument("--by-pad", action="store_true", help="split the group into pads and run them concurrently")
+    parser.add_argument("--workers", type=int, default=None, help="pads run at once, defaults to the CPU count")
+    parser.add_argument("--run-dir", help="checkpoint and output folder, defaults to results/runs/<analysis>-<group>-<date>")
+    parser.add_argument("--run-date", default=datetime.date.today().isoformat(), help="SCADA is pulled again per date")
+    parser.add_argument("--no-resume", action="store_true", help="rerun every pad and stage instead of resuming")
+    parser.add_argument("--max-rp", type=int, default=1800, help="max allowable reservoir pressure, psi")
+    parser.add_argument("--resp-modifier", type=float, default=150, help="added to the optimal reservoir pressure")
+    parser.add_argument("--test-path", help="FDC well test export, defaults to the pipeline's")
+    parser.add_argument("--start-date", help="start of the SCADA pull, defaults to the pipeline's")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc peaks in the run report, faster")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        help="header analysis only: stream the wells through in chunks of this size, bounded memory",
+    )
+    parser.add_argument("--fit-workers", type=int, default=1, help="chunks fitted at once with --chunk-size")
+    parser.add_argument(
+        "--plot-workers",
+        type=int,
+        default=None,
+        help="processes rendering the daily fit grid panels of each pad, defaults to the CPU count, 1 draws in-process",
+    )
+    parser.add_argument(
+        "--density",
+        choices=[mode for mode in plot_density.DENSITY_MODES if mode],
+        help="draw the daily fit grids as a density layer or decimated scatter instead of every point",
+    )
+    parser.add_argument(
+        "--store",
+        nargs="?",
+        const=results_store.DATASET_DIR,
+        help=f"also append the results to a Parquet dataset, needs pyarrow, defaults to {results_store.DATASET_DIR}",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="fit only the days after the last stored daily fit and append them, see incremental.DailyFitHistory",
+    )
+    parser.add_argument(
+        "--report",
+        action="store_true",
+        help="also write the result sheets to an xlsx workbook with Parquet sidecars, needs xlsxwriter and pyarrow",
+    )
+    parser.add_argument(
+        "--test-method",
+        choices=[method for method in aggregate.METHODS if method != "count"],
+        help="pf analysis only: how each well's tests are averaged for the oil lookup, defaults to mean",
+    )
+    parser.add_argument(
+        "--monte-carlo",
+        action="store_true",
+        help="also write P90/P50/P10 oil per well and pad from sampled daily fits, reservoir pressure and water cut",
+    )
+    parser.add_argument("--log-json", action="store_true", help="log JSON lines instead of plain messages")
+    parser.add_argument(
+        "--profile",
+        type=lambda value: [name.strip() for name in value.split(",") if name.strip()],
+        help='comma separated stages to profile, e.g. "ipr,calc_PI_RP.calc_optimal_RP", or "all"',
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    json_format = True if args.log_json else None
+    instrument.configure_logging(json_format=json_format)
+    group = args.group or DEFAULT_GROUPS[args.analysis]
+    wells = list(getattr(well_config, group))
+    units = split_by_pad(wells) if args.by_pad else {group: wells}
+
+    run_dir = args.run_dir or os.path.join("results", "runs", f"{args.analysis}-{group}-{args.run_date}")
+    os.makedirs(run_dir, exist_ok=True)
+    checkpoint = Checkpoint(os.path.join(run_dir, "status.json"))
+    resume = not args.no_resume
+
+    options = {
+        "max_rp": args.max_rp,
+        "resp_modifier": args.resp_modifier,
+        "run_date": args.run_date,
+        "plot_workers": args.plot_workers,
+    }
+    if args.test_path:
+        options["test_path"] = args.test_path
+    if args.start_date:
+        options["start_date"] = args.start_date
+    if args.store:
+        options["store_dir"] = args.store
+    if args.incremental:
+        options["incremental"] = True
+    if args.report:
+        options["report"] = True
+    if args.monte_carlo:
+        options["monte_carlo"] = True
+    if args.density:
+        options["density"] = args.density
+    if args.test_method:
+        if args.analysis == "pf":
+            options["test_method"] = args.test_method
+        else:
+            logger.warning("--test-method only applies to the pf analysis, ignored")
+
+    todo = {name: unit for name, unit in units.items() if not (resume and checkpoint.done(name))}
+    for name in units.keys() - todo.keys():
+        logger.info("%s: done in an earlier run, skipped", name)
+
+    failed = []
+    with ProcessPoolExecutor(
+        max_workers=args.workers, initializer=instrument.configure_logging, initargs=(logging.INFO, json_format)
+    ) as pool:
+        futures = {
+            pool.submit(
+                run_unit,
+                args.analysis,
+                name,
+                unit,
+                os.path.join(run_dir, name),
+                options,
+                resume,
+                not args.no_memory,
+                args.profile,
+                args.chunk_size,
+                args.fit_workers,
+            ): name
+            for name, unit in todo.items()
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                future.result()
+            except Exception:
+                error = traceback.format_exc()
+                logger.error("%s: failed\n%s", name, error)
+                checkpoint.mark(name, "failed", error)
+                failed.append(name)
+            else:
+                logger.info("%s: done", name)
+                checkpoint.mark(name, "done")
+
+    if failed:
+        logger.error("Failed: %s. Rerun the same command to resume from the last checkpoint.", ", ".join(sorted(failed)))
+        return 1
+    logger.info("fin")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
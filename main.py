@@ -1,16 +1,5 @@
-import pandas as pd
-
-from process_data import (
-    bhp_liq,
-    bhp_vs_whp,
-    calc_PI_RP,
-    coeffs_process,
-    merge,
-    plot_wells,
-    process,
-    welltests,
-)
-from pull_data import pull_tags
+from pipelines import header_pipeline
+from process_data import instrument
 
 # well config stores list of wells to analyze
 from well_config import all_jps, all_wells_with_gauges, f_and_l, tract14
@@ -18,50 +7,16 @@ from well_config import all_jps, all_wells_with_gauges, f_and_l, tract14
 well_list = tract14
 max_rp = 1800
 
-# IF A TAG IS MISSING IT WILL ERROR OUT THE PROGRAM AND TAKE YOU 30 minutes to find out its a missing tag for a well
-tag_dict = pull_tags.gen_tag_dict()
-tag_list = pull_tags.get_tags(well_list, tag_dict)
-raw_scada_data = pull_tags.query_tag_WT_average(tag_list, tag_dict)
-
-# data for whp vs bhp
-data_bhp_whp = pull_tags.query_tag(tag_list, "2024-3-1")
-well_scada_data = process.proc_scada(data_bhp_whp, tag_dict=tag_dict)  # make this similar to wt average
-
-
-daily_coeffs = bhp_vs_whp.plot_grid_BHP_WHP_DailyFit(well_scada_data)
-daily_coeffs.to_csv(r"results/daily_bhp_whp_fit_coeffs.csv")
-
-
-daily_coeffs_header = bhp_vs_whp.plot_grid_BHP_HeaderP_DailyFit(well_scada_data)
-daily_coeffs_header.to_csv(r"results/daily_bhp_header_fit_coeffs.csv")
-
-processed_daily_coeffs = coeffs_process.process_coefficients(daily_coeffs)
-processed_daily_coeffs.to_csv(r"results\processed_daily_whp_bhp_coeffs.csv")
-
-processed_daily_coeffs_header = coeffs_process.process_coefficients(daily_coeffs_header)
-processed_daily_coeffs_header.to_csv(r"results\processed_daily_header_bhp_coeffs.csv")
-
-# bhp_vs_whp.plot_grid_BHP_WHP(well_scada_data, processed_daily_coeffs.set_index("Well"))
-
-# process tests
-test_path = r"fdc_test_data\Well Test 5-12-2024.csv"
-test_processor = welltests.FDCProcessor(test_path)
-well_specific_tests = test_processor.get_welltests()
-merged_test_data = merge.merge_data(well_list, raw_scada_data, well_specific_tests)
-merged_test_data.to_csv(r"results\merged_tests.csv")
-print(merged_test_data)
-
-
-# estimate reservoir pressure for PI
-rp_calc = calc_PI_RP.calc_optimal_RP(merged_test_data, max_pres=max_rp)
-rp_calc.to_csv(r"results\res pressure.csv")
-
-# plot liquid rate vs bhp
-vogel_coeffs = bhp_liq.plot_bhp_liquidrate(merged_test_data, rp_calc)
+if __name__ == "__main__":
+    instrument.configure_logging()
 
-test_coeffs, test_ipr_data = bhp_liq.plot_bhp_liquidrate_r2(rp_calc, resp_modifier=150, filename="plots/t14_graphs.png")
-test_coeffs.to_csv(r"results\vogel_coeffs_test.csv")
-test_ipr_data.to_csv(r"results\ipr_data.csv")
+    # stages whose data and parameters are unchanged since the last run are skipped,
+    # e.g. changing resp_modifier only reruns the IPR and header impact stages
+    pipeline = header_pipeline(well_list, max_rp=max_rp, resp_modifier=150)
+    # timings, rows and memory peaks per stage go to results/run_report.json and .csv
+    # set HPI_PROFILE=ipr (comma separated stages, or all) to write profiles to results/profiles
+    with instrument.run("results"):
+        pipeline.run()
 
-vogel_coeffs.to_csv(r"results\vogel_coeffs.csv")
-print("fin")
+    print(pipeline.load("merged_test_data"))
+    print("fin")
@@ -0,0 +1,849 @@
+import datetime
+import logging
+import os
+from functools import partial
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from process_data import (
+    bhp_liq,
+    bhp_pf,
+    bhp_vs_whp,
+    calc_PI_RP,
+    coeffs_process,
+    header_scenario,
+    merge,
+    monte_carlo,
+    pf_oil_benefit,
+    pf_optimizer,
+    pf_press_rate,
+    process,
+    welltests,
+)
+
+# imported by name, the pipelines' incremental and report flags would shadow the modules
+from process_data.incremental import DailyFitHistory
+from process_data.lookup_engine import PFLookupEngine
+from process_data.pipeline import Pipeline, Stage
+from process_data.plot_cache import PlotCache
+from process_data.report import sidecar_path
+from process_data.report import write_report as write_workbook
+from process_data.results_store import ResultsStore
+from pull_data import jp_data, pull_tags
+
+logger = logging.getLogger(__name__)
+
+# daily fits of the incremental mode, the fits of the DailyFit grids without drawing them
+DAILY_FITS = {
+    "whp": partial(bhp_vs_whp.fit_daily_coefficients, y="WHP"),
+    "header": partial(bhp_vs_whp.fit_daily_coefficients, y="HeaderP"),
+    "pf": bhp_pf.fit_daily_coefficients,
+}
+# draws per header delta or power fluid pressure of the Monte Carlo stages, seeded so reruns agree
+MONTE_CARLO_DRAWS = 100_000
+MONTE_CARLO_SEED = 0
+
+
+def pull_header_scada(well_list: List[str], start_date: str, run_date: str):
+    # IF A TAG IS MISSING IT WILL ERROR OUT THE PROGRAM AND TAKE YOU 30 minutes to find out its a missing tag for a well
+    tag_dict = pull_tags.gen_tag_dict()
+    tag_list = pull_tags.get_tags(well_list, tag_dict)
+    raw_scada_data = pull_tags.query_tag_WT_average(tag_list, tag_dict)
+
+    # data for whp vs bhp
+    data_bhp_whp = pull_tags.query_tag(tag_list, start_date)
+    well_scada_data = process.proc_scada(data_bhp_whp, tag_dict=tag_dict)
+    return raw_scada_data, well_scada_data
+
+
+def fit_whp(
+    well_scada_data: Dict[str, pd.DataFrame],
+    plot_path: str,
+    coeffs_path: str,
+    processed_path: str,
+    plot_workers: Optional[int] = None,
+    density: Optional[str] = None,
+    manifest_path: Optional[str] = None,
+):
+    # only wells whose data changed are redrawn, see plot_cache.PlotCache
+    cache = PlotCache(manifest_path) if manifest_path else None
+    daily_coeffs = bhp_vs_whp.plot_grid_BHP_WHP_DailyFit(
+        well_scada_data, density=density, filename=plot_path, max_workers=plot_workers, cache=cache
+    )
+    daily_coeffs.to_csv(coeffs_path)
+    processed_daily_coeffs = coeffs_process.process_coefficients(daily_coeffs)
+    processed_daily_coeffs.to_csv(processed_path)
+    return daily_coeffs, processed_daily_coeffs
+
+
+def fit_header(
+    well_scada_data: Dict[str, pd.DataFrame],
+    plot_path: str,
+    coeffs_path: str,
+    processed_path: str,
+    plot_workers: Optional[int] = None,
+    density: Optional[str] = None,
+    manifest_path: Optional[str] = None,
+):
+    cache = PlotCache(manifest_path) if manifest_path else None
+    daily_coeffs_header = bhp_vs_whp.plot_grid_BHP_HeaderP_DailyFit(
+        well_scada_data, density=density, filename=plot_path, max_workers=plot_workers, cache=cache
+    )
+    daily_coeffs_header.to_csv(coeffs_path)
+    processed_daily_coeffs_header = coeffs_process.process_coefficients(daily_coeffs_header)
+    processed_daily_coeffs_header.to_csv(processed_path)
+    return daily_coeffs_header, processed_daily_coeffs_header
+
+
+def fit_incremental(well_scada_data: Dict[str, pd.DataFrame], kind: str, coeffs_path: str, processed_path: str):
+    # fit only the days after the last stored fit and append them, see incremental.DailyFitHistory
+    history = DailyFitHistory(coeffs_path)
+    new_coeffs = history.update(well_scada_data, DAILY_FITS[kind])
+    processed_coeffs = history.processed()
+    processed_coeffs.to_csv(processed_path)
+    return new_coeffs, processed_coeffs
+
+
+def merge_tests(raw_scada_data: Dict[str, pd.DataFrame], well_list: List[str], test_path: str, merged_path: str):
+    test_processor = welltests.FDCProcessor(test_path)
+    well_specific_tests = test_processor.get_welltests()
+    merged_test_data = merge.merge_data(well_list, raw_scada_data, well_specific_tests)
+    merged_test_data.to_csv(merged_path)
+    logger.info("%s", merged_test_data)
+    return merged_test_data
+
+
+def estimate_rp(merged_test_data: pd.DataFrame, max_rp: int, rp_path: str):
+    # estimate reservoir pressure for PI
+    rp_calc = calc_PI_RP.calc_optimal_RP(merged_test_data, max_pres=max_rp)
+    rp_calc.to_csv(rp_path)
+    return rp_calc
+
+
+def fit_vogel(merged_test_data: pd.DataFrame, rp_calc: pd.DataFrame, plot_path: str, vogel_path: str):
+    # plot liquid rate vs bhp
+    vogel_coeffs = bhp_liq.plot_bhp_liquidrate(merged_test_data, rp_calc, filename=plot_path)
+    vogel_coeffs.to_csv(vogel_path)
+    return vogel_coeffs
+
+
+def fit_ipr(rp_calc: pd.DataFrame, resp_modifier: float, plot_path: str, coeffs_path: str, ipr_path: str):
+    test_coeffs, test_ipr_params = bhp_liq.plot_bhp_liquidrate_r2(rp_calc, resp_modifier=resp_modifier, filename=plot_path)
+    test_coeffs.to_csv(coeffs_path)
+    test_ipr_params.to_csv(ipr_path, index=False)
+    return test_coeffs, test_ipr_params
+
+
+def header_impact(
+    daily_coeffs_header: pd.DataFrame, ipr_params: pd.DataFrame, merged_test_data: pd.DataFrame, impact_path: str
+):
+    # oil impact of header pressure changes, one row per delta and one column per well
+    impact = header_scenario.header_pressure_impact(
+        np.arange(-100, 101, 10), header_scenario.header_slopes(daily_coeffs_header), ipr_params, merged_test_data
+    )
+    impact.to_csv(impact_path)
+    return impact
+
+
+def header_impact_history(
+    daily_coeffs_header: pd.DataFrame,
+    ipr_params: pd.DataFrame,
+    merged_test_data: pd.DataFrame,
+    history_path: str,
+    impact_path: str,
+):
+    # daily_coeffs_header only holds the new fits of an incremental run, the slopes come from every stored fit
+    return header_impact(DailyFitHistory(history_path).coefficients(), ipr_params, merged_test_data, impact_path)
+
+
+def header_monte_carlo(
+    daily_coeffs_header: pd.DataFrame,
+    ipr_params: pd.DataFrame,
+    merged_test_data: pd.DataFrame,
+    header_deltas: List[float],
+    num_draws: int,
+    seed: int,
+    history_path: Optional[str],
+    percentiles_path: str,
+):
+    # P90/P50/P10 oil change of every well and the pad per header delta, see monte_carlo.simulate_header_impact
+    if history_path:
+        # an incremental run only holds the new fits, the draws come from every stored fit
+        daily_coeffs_header = DailyFitHistory(history_path).coefficients()
+    percentiles = pd.concat(
+        {
+            delta: monte_carlo.simulate_header_impact(
+                daily_coeffs_header, ipr_params, merged_test_data, delta, num_draws=num_draws, seed=seed
+            )
+            for delta in header_deltas
+        },
+        names=["header_delta"],
+    )
+    percentiles.to_csv(percentiles_path)
+    return percentiles
+
+
+def pull_jp_scada(well_list: List[str], start_date: str, run_date: str):
+    # this does any tag in the pw_jetpump_tags.csv need to make it look at the list eventually
+    tag_dict = jp_data.gen_tag_dict()
+    tag_list = jp_data.get_tags(well_list, tag_dict)
+    return jp_data.query_tag_list(tag_list, tag_dict, start_date=start_date)
+
+
+def fit_pf(
+    raw_scada_data: Dict[str, pd.DataFrame],
+    grid_path: str,
+    plot_path: str,
+    coeffs_path: str,
+    processed_path: str,
+    plot_workers: Optional[int] = None,
+    density: Optional[str] = None,
+    manifest_path: Optional[str] = None,
+):
+    # plot the data and calculate BHP/PF coefficients
+    cache = PlotCache(manifest_path) if manifest_path else None
+    bhp_pf.plot_grid_bhp_vs_pf_pres(
+        raw_scada_data, density=density, filename=grid_path, max_workers=plot_workers, cache=cache
+    )
+    pf_bhp_coeffs = bhp_pf.plot_grid_BHP_PF_Pres_DailyFit(
+        raw_scada_data, filename=plot_path, density=density, max_workers=plot_workers, cache=cache
+    )
+    pf_bhp_coeffs.to_csv(coeffs_path)
+    processed_pf_bhp_coeffs = coeffs_process.process_coefficients(pf_bhp_coeffs)
+    processed_pf_bhp_coeffs.to_csv(processed_path)
+    return pf_bhp_coeffs, processed_pf_bhp_coeffs
+
+
+def fit_pf_incremental(raw_scada_data: Dict[str, pd.DataFrame], coeffs_path: str, processed_path: str):
+    return fit_incremental(raw_scada_data, "pf", coeffs_path, processed_path)
+
+
+def pf_lookups(
+    processed_pf_bhp_coeffs: pd.DataFrame,
+    ipr_params: pd.DataFrame,
+    merged_test_data: pd.DataFrame,
+    liquid_path: str,
+    oil_path: str,
+    sum_path: str,
+    engine_path: str,
+    method: str = "mean",
+):
+    # create lookup tables of rates
+    bhp_lookup_table = pf_press_rate.bhp_lookup(processed_pf_bhp_coeffs)
+    liq_lookup_table = pf_press_rate.assign_liquid_rate(ipr_params, bhp_lookup_table)
+    liq_lookup_table.to_csv(liquid_path)
+
+    # Now assign watercut and calculate associated oil rate
+    rate_lookup_table, sum_df = pf_oil_benefit.calc_oil_rate(liq_lookup_table, merged_test_data, method=method)
+    rate_lookup_table.to_csv(oil_path)
+    sum_df.to_csv(sum_path)
+
+    # dense binary copy of the lookup tables for fast queries, see lookup_engine.PFLookupEngine.load
+    pf_engine = PFLookupEngine.from_lookup_table(rate_lookup_table)
+    pf_engine.save(engine_path)
+    return rate_lookup_table, sum_df, pf_engine
+
+
+def pf_monte_carlo(
+    pf_bhp_coeffs: pd.DataFrame,
+    ipr_params: pd.DataFrame,
+    merged_test_data: pd.DataFrame,
+    pf_pres: List[float],
+    num_draws: int,
+    seed: int,
+    history_path: Optional[str],
+    percentiles_path: str,
+):
+    # P90/P50/P10 oil of every well and the pad per power fluid pressure, see monte_carlo.simulate_pf_oil
+    if history_path:
+        # an incremental run only holds the new fits, the draws come from every stored fit
+        pf_bhp_coeffs = DailyFitHistory(history_path).coefficients()
+    percentiles = pd.concat(
+        {
+            pres: monte_carlo.simulate_pf_oil(
+                pf_bhp_coeffs, ipr_params, merged_test_data, pres, num_draws=num_draws, seed=seed
+            )
+            for pres in pf_pres
+        },
+        names=["pf_pres"],
+    )
+    percentiles.to_csv(percentiles_path)
+    return percentiles
+
+
+def optimize_pf(raw_scada_data: Dict[str, pd.DataFrame], pf_engine: PFLookupEngine, setpoints_path: str):
+    # split the current power fluid rate of the jet pumps the optimizer can place across them for the most oil
+    nozzle_coeffs = pf_optimizer.calibrate_nozzle_coeffs(raw_scada_data)
+    wells = pf_optimizer.allocatable_wells(pf_engine, nozzle_coeffs)
+    dropped = sorted(set(pf_engine.wells) - set(wells))
+    if dropped:
+        logger.warning("optimizer: no nozzle coefficient or no oil at any setpoint, left out: %s", ", ".join(dropped))
+    limit = nozzle_coeffs.loc[nozzle_coeffs["Well"].isin(wells), "PF_Rate"].sum()
+    pf_setpoints = pd.DataFrame(columns=["Well", "pf_pres", "bhp", "oil", "pf_rate", "hhp"])
+    if wells:
+        try:
+            pf_setpoints = pf_optimizer.optimize_pf_allocation(pf_engine, nozzle_coeffs, limit=limit, wells=wells)
+        except ValueError as error:
+            # e.g. the current power fluid rate is below the cheapest allocation
+            logger.warning("optimizer: no power fluid allocation, %s", error)
+    pf_setpoints.to_csv(setpoints_path)
+    return pf_setpoints
+
+
+def plot_pf_benefit(sum_df: pd.DataFrame, plot_path: str):
+    pf_oil_benefit.plot_oil_rates(sum_df, filename=plot_path)
+
+
+def store_results(store_dir: str, analysis: str, run_date: str, params: dict, **tables: pd.DataFrame):
+    # append this run's tables to the partitioned results dataset, see results_store.ResultsStore
+    store = ResultsStore(store_dir, run_date=run_date, analysis=analysis, params=params)
+    if "header_impact" in tables:
+        tables["header_impact"] = header_scenario.impact_by_well(tables["header_impact"])
+    store.write_tables(tables)
+
+
+def write_report(report_path: str, sheets: Dict[str, str], **tables: pd.DataFrame):
+    # coefficient, IPR, lookup and summary sheets in one workbook with Parquet sidecars, see report.write_report
+    write_workbook(report_path, {sheets[name]: df for name, df in tables.items()})
+
+
+def _dirs(results_dir: str, plots_dir: str, cache_dir: Optional[str]):
+    """Output path helpers for a pipeline writing to its own results and plots folders."""
+    os.makedirs(results_dir, exist_ok=True)
+    os.makedirs(plots_dir, exist_ok=True)
+
+    def results(name):
+        return os.path.join(results_dir, name)
+
+    def plots(name):
+        return os.path.join(plots_dir, name)
+
+    return results, plots, cache_dir or results(".pipeline")
+
+
+def header_pipeline(
+    well_list: List[str],
+    max_rp: int = 1800,
+    resp_modifier: float = 150,
+    test_path: str = r"fdc_test_data\Well Test 5-12-2024.csv",
+    start_date: str = "2024-3-1",
+    run_date: Optional[str] = None,
+    results_dir: str = "results",
+    plots_dir: str = "plots",
+    cache_dir: Optional[str] = None,
+    store_dir: Optional[str] = None,
+    incremental: bool = False,
+    report: bool = False,
+    monte_carlo: bool = False,
+    plot_workers: Optional[int] = None,
+    density: Optional[str] = None,
+) -> Pipeline:
+    """
+    Header pressure impact analysis of main.py as a cached pipeline.
+
+    Args:
+        well_list (List[str]): Wells to analyze, see well_config
+        max_rp (int): Max allowable reservoir pressure, psi
+        resp_modifier (float): Added to the optimal reservoir pressure for the IPRs
+        test_path (str): FDC well test export
+        start_date (str): Start of the hourly SCADA pull
+        run_date (str): SCADA is pulled again when this changes, defaults to today
+        results_dir (str): Folder for the result CSVs
+        plots_dir (str): Folder for the plots
+        cache_dir (str): Pipeline cache, defaults to .pipeline in results_dir
+        store_dir (str): Also append the results to this Parquet dataset, see results_store. Once
+                         per run date, a rerun with unchanged results adds nothing.
+        incremental (bool): Pull and fit only the days after the last stored daily fit and append
+                            them to the daily coefficient CSVs, see incremental.DailyFitHistory.
+                            daily_coeffs then holds the new fits only, the header impact still
+                            uses every stored fit, and the DailyFit grids are not drawn.
+        report (bool): Also write the coefficient, IPR and impact sheets to BHP_WHP Impact
+                       Fieldwide.xlsx in results_dir with Parquet sidecars, see report.write_report.
+                       Needs xlsxwriter and pyarrow.
+        monte_carlo (bool): Also write the P90/P50/P10 oil change of every well and the pad per
+                            header pressure delta to header_impact_percentiles.csv, drawn from the
+                            daily header fits, reservoir pressure and water cut, see
+                            monte_carlo.simulate_header_impact.
+        plot_workers (int): Processes rendering the DailyFit grid panels, None for the CPU count.
+                            The panels are kept in plots_dir/panels with a manifest, so reruns only
+                            redraw wells whose data changed, see plot_cache.PlotCache.
+        density (str): Scatter of the DailyFit grids, None draws every point, 'hexbin', 'hist2d' or
+                       'lttb' a density layer or decimated scatter, see plot_density.density_scatter.
+
+    Returns:
+        Pipeline: Call run to execute
+    """
+    run_date = run_date or datetime.date.today().isoformat()
+    results, plots, cache_dir = _dirs(results_dir, plots_dir, cache_dir)
+    coeffs_paths = {
+        "whp": results("daily_bhp_whp_fit_coeffs.csv"),
+        "header": results("daily_bhp_header_fit_coeffs.csv"),
+    }
+    if incremental:
+        # only the days after the last stored fit are pulled and fitted
+        start_date = min(
+            DailyFitHistory(path).pull_start(well_list, start_date) for path in coeffs_paths.values()
+        )
+    stages = [
+        Stage(
+            "scada",
+            pull_header_scada,
+            outputs=["raw_scada_data", "well_scada_data"],
+            params={"well_list": list(well_list), "start_date": start_date, "run_date": run_date},
+            sources=["pull_data/bhp_dict.csv"],
+        ),
+    ]
+    if incremental:
+        stages += [
+            Stage(
+                "whp_fits",
+                fit_incremental,
+                inputs=["well_scada_data"],
+                outputs=["daily_coeffs", "processed_daily_coeffs"],
+                params={
+                    "kind": "whp",
+                    "coeffs_path": coeffs_paths["whp"],
+                    "processed_path": results("processed_daily_whp_bhp_coeffs.csv"),
+                },
+                # the coefficients CSV only exists once a fit is kept
+                writes=[results("processed_daily_whp_bhp_coeffs.csv")],
+            ),
+            Stage(
+                "header_fits",
+                fit_incremental,
+                inputs=["well_scada_data"],
+                outputs=["daily_coeffs_header", "processed_daily_coeffs_header"],
+                params={
+                    "kind": "header",
+                    "coeffs_path": coeffs_paths["header"],
+                    "processed_path": results("processed_daily_header_bhp_coeffs.csv"),
+                },
+                # the coefficients CSV only exists once a fit is kept
+                writes=[results("processed_daily_header_bhp_coeffs.csv")],
+            ),
+        ]
+    else:
+        stages += [
+            Stage(
+                "whp_fits",
+                fit_whp,
+                inputs=["well_scada_data"],
+                outputs=["daily_coeffs", "processed_daily_coeffs"],
+                params={
+                    "plot_path": plots("well_data_grid_plotBHP_WHP_dailyfit.png"),
+                    "coeffs_path": coeffs_paths["whp"],
+                    "processed_path": results("processed_daily_whp_bhp_coeffs.csv"),
+                    "plot_workers": plot_workers,
+                    "density": density,
+                    "manifest_path": plots(".manifest.json"),
+                },
+                writes=[
+                    plots("well_data_grid_plotBHP_WHP_dailyfit.png"),
+                    coeffs_paths["whp"],
+                    results("processed_daily_whp_bhp_coeffs.csv"),
+                ],
+            ),
+            Stage(
+                "header_fits",
+                fit_header,
+                inputs=["well_scada_data"],
+                outputs=["daily_coeffs_header", "processed_daily_coeffs_header"],
+                params={
+                    "plot_path": plots("well_data_grid_plotBHP_HeaderP_dailyfit.png"),
+                    "coeffs_path": coeffs_paths["header"],
+                    "processed_path": results("processed_daily_header_bhp_coeffs.csv"),
+                    "plot_workers": plot_workers,
+                    "density": density,
+                    "manifest_path": plots(".manifest.json"),
+                },
+                writes=[
+                    plots("well_data_grid_plotBHP_HeaderP_dailyfit.png"),
+                    coeffs_paths["header"],
+                    results("processed_daily_header_bhp_coeffs.csv"),
+                ],
+            ),
+        ]
+    stages += [
+        Stage(
+            "tests",
+            merge_tests,
+            inputs=["raw_scada_data"],
+            outputs=["merged_test_data"],
+            params={"well_list": list(well_list), "test_path": test_path, "merged_path": results("merged_tests.csv")},
+            sources=[test_path],
+            writes=[results("merged_tests.csv")],
+        ),
+        Stage(
+            "rp",
+            estimate_rp,
+            inputs=["merged_test_data"],
+            outputs=["rp_calc"],
+            params={"max_rp": max_rp, "rp_path": results("res pressure.csv")},
+            writes=[results("res pressure.csv")],
+        ),
+        Stage(
+            "vogel",
+            fit_vogel,
+            inputs=["merged_test_data", "rp_calc"],
+            outputs=["vogel_coeffs"],
+            params={"plot_path": plots("bhp_liq_grid.png"), "vogel_path": results("vogel_coeffs.csv")},
+            writes=[plots("bhp_liq_grid.png"), results("vogel_coeffs.csv")],
+        ),
+        Stage(
+            "ipr",
+            fit_ipr,
+            inputs=["rp_calc"],
+            outputs=["test_coeffs", "ipr_params"],
+            params={
+                "resp_modifier": resp_modifier,
+                "plot_path": plots("t14_graphs.png"),
+                "coeffs_path": results("vogel_coeffs_test.csv"),
+                "ipr_path": results("ipr_params.csv"),
+            },
+            writes=[plots("t14_graphs.png"), results("vogel_coeffs_test.csv"), results("ipr_params.csv")],
+        ),
+    ]
+    if incremental:
+        stages.append(
+            Stage(
+                "header_impact",
+                header_impact_history,
+                inputs=["daily_coeffs_header", "ipr_params", "merged_test_data"],
+                outputs=["header_impact"],
+                params={"history_path": coeffs_paths["header"], "impact_path": results("header_pressure_impact.csv")},
+                writes=[results("header_pressure_impact.csv")],
+            )
+        )
+    else:
+        stages.append(
+            Stage(
+                "header_impact",
+                header_impact,
+                inputs=["daily_coeffs_header", "ipr_params", "merged_test_data"],
+                outputs=["header_impact"],
+                params={"impact_path": results("header_pressure_impact.csv")},
+                writes=[results("header_pressure_impact.csv")],
+            )
+        )
+    if monte_carlo:
+        stages.append(
+            Stage(
+                "monte_carlo",
+                header_monte_carlo,
+                inputs=["daily_coeffs_header", "ipr_params", "merged_test_data"],
+                outputs=["header_impact_percentiles"],
+                params={
+                    "header_deltas": list(range(-100, 101, 10)),
+                    "num_draws": MONTE_CARLO_DRAWS,
+                    "seed": MONTE_CARLO_SEED,
+                    "history_path": coeffs_paths["header"] if incremental else None,
+                    "percentiles_path": results("header_impact_percentiles.csv"),
+                },
+                writes=[results("header_impact_percentiles.csv")],
+            )
+        )
+    if report:
+        report_path = results("BHP_WHP Impact Fieldwide.xlsx")
+        sheets = {
+            "processed_daily_coeffs": "processed_daily_whp_bhp_coeffs",
+            "processed_daily_coeffs_header": "processed_daily_header_bhp_coeffs",
+            "ipr_params": "ipr_params",
+            "header_impact": "header_pressure_impact",
+        }
+        stages.append(
+            Stage(
+                "report",
+                write_report,
+                inputs=list(sheets),
+                params={"report_path": report_path, "sheets": sheets},
+                # a deleted Parquet sidecar reruns the report too, report.read_sheet reads those
+                writes=[report_path, *(sidecar_path(report_path, sheet) for sheet in sheets.values())],
+            )
+        )
+    if store_dir:
+        stages.append(
+            Stage(
+                "store",
+                store_results,
+                inputs=[
+                    "daily_coeffs",
+                    "processed_daily_coeffs",
+                    "daily_coeffs_header",
+                    "processed_daily_coeffs_header",
+                    "merged_test_data",
+                    "rp_calc",
+                    "vogel_coeffs",
+                    "test_coeffs",
+                    "ipr_params",
+                    "header_impact",
+                ],
+                params={
+                    "store_dir": store_dir,
+                    "analysis": "header",
+                    "run_date": run_date,
+                    "params": {
+                        "well_list": list(well_list),
+                        "max_rp": max_rp,
+                        "resp_modifier": resp_modifier,
+                        "test_path": test_path,
+                        "start_date": start_date,
+                    },
+                },
+            )
+        )
+    return Pipeline(stages, cache_dir=cache_dir)
+
+
+def pf_pipeline(
+    well_list: List[str],
+    max_rp: int = 1800,
+    resp_modifier: float = 150,
+    test_path: str = r"fdc_test_data\Well Test 5-23-24.csv",
+    start_date: str = "2024-4-1",
+    run_date: Optional[str] = None,
+    results_dir: str = "results",
+    plots_dir: str = "plots",
+    cache_dir: Optional[str] = None,
+    store_dir: Optional[str] = None,
+    incremental: bool = False,
+    report: bool = False,
+    monte_carlo: bool = False,
+    test_method: str = "mean",
+    plot_workers: Optional[int] = None,
+    density: Optional[str] = None,
+) -> Pipeline:
+    """
+    Jet pump power fluid analysis of b_pad_main.py as a cached pipeline.
+
+    Args:
+        well_list (List[str]): Jet pump wells to analyze, see well_config
+        max_rp (int): Max allowable reservoir pressure, psi
+        resp_modifier (float): Added to the optimal reservoir pressure for the IPRs
+        test_path (str): FDC well test export
+        start_date (str): Start of the SCADA pull
+        run_date (str): SCADA is pulled again when this changes, defaults to today
+        results_dir (str): Folder for the result CSVs
+        plots_dir (str): Folder for the plots
+        cache_dir (str): Pipeline cache, defaults to .pipeline in results_dir
+        store_dir (str): Also append the results to this Parquet dataset, see results_store. Once
+                         per run date, a rerun with unchanged results adds nothing.
+        incremental (bool): Fit only the days after the last stored daily fit and append them to
+                            the daily coefficient CSV, see incremental.DailyFitHistory. The whole
+                            pull is still needed for the test merge and the optimizer, pf_bhp_coeffs
+                            then holds the new fits only and the grids are not drawn.
+        report (bool): Also write the coefficient, IPR, lookup and benefit sheets to B-pad PF
+                       Impact.xlsx in results_dir with Parquet sidecars, see report.write_report.
+                       Needs xlsxwriter and pyarrow.
+        monte_carlo (bool): Also write the P90/P50/P10 oil of every well and the pad per power
+                            fluid pressure to B-pad pf_oil_percentiles.csv, drawn from the daily
+                            BHP vs PF fits, reservoir pressure and water cut, see
+                            monte_carlo.simulate_pf_oil.
+        test_method (str): How each well's tests are averaged into the water cut of the oil lookup,
+                           an aggregate.METHODS name such as iqr_mean, see pf_oil_benefit.calc_oil_rate.
+        plot_workers (int): Processes rendering the panels of the BHP vs PF grids, None for the CPU
+                            count. The panels are kept in plots_dir/panels with a manifest, so reruns
+                            only redraw wells whose data changed, see plot_cache.PlotCache.
+        density (str): Scatter of the BHP vs PF grids, None draws every point, 'hexbin', 'hist2d' or
+                       'lttb' a density layer or decimated scatter, see plot_density.density_scatter.
+
+    Returns:
+        Pipeline: Call run to execute
+    """
+    run_date = run_date or datetime.date.today().isoformat()
+    results, plots, cache_dir = _dirs(results_dir, plots_dir, cache_dir)
+    fit_paths = {
+        "coeffs_path": results("daily_bhp_pf_RAW_coeffs.csv"),
+        "processed_path": results("daily_bhp_pf_coeffs.csv"),
+    }
+    if incremental:
+        pf_fits = Stage(
+            "pf_fits",
+            fit_pf_incremental,
+            inputs=["raw_scada_data"],
+            outputs=["pf_bhp_coeffs", "processed_pf_bhp_coeffs"],
+            params=fit_paths,
+            # the coefficients CSV only exists once a fit is kept
+            writes=[fit_paths["processed_path"]],
+        )
+    else:
+        pf_fits = Stage(
+            "pf_fits",
+            fit_pf,
+            inputs=["raw_scada_data"],
+            outputs=["pf_bhp_coeffs", "processed_pf_bhp_coeffs"],
+            params={
+                "grid_path": plots("well_data_grid_plotBHP_PF_pres.png"),
+                "plot_path": plots("BHP_PF_daily_fit_5-23-24"),
+                **fit_paths,
+                "plot_workers": plot_workers,
+                "density": density,
+                "manifest_path": plots(".manifest.json"),
+            },
+            # savefig adds the .png
+            writes=[
+                plots("well_data_grid_plotBHP_PF_pres.png"),
+                plots("BHP_PF_daily_fit_5-23-24.png"),
+                *fit_paths.values(),
+            ],
+        )
+    stages = [
+        Stage(
+            "scada",
+            pull_jp_scada,
+            outputs=["raw_scada_data"],
+            params={"well_list": list(well_list), "start_date": start_date, "run_date": run_date},
+            sources=["pull_data/pw_jetpump_tags.csv"],
+        ),
+        pf_fits,
+        Stage(
+            "tests",
+            merge_tests,
+            inputs=["raw_scada_data"],
+            outputs=["merged_test_data"],
+            params={
+                "well_list": list(well_list),
+                "test_path": test_path,
+                "merged_path": results("B_Pad_merged_tests.csv"),
+            },
+            sources=[test_path],
+            writes=[results("B_Pad_merged_tests.csv")],
+        ),
+        Stage(
+            "rp",
+            estimate_rp,
+            inputs=["merged_test_data"],
+            outputs=["rp_calc"],
+            params={"max_rp": max_rp, "rp_path": results("B-pad res pressure.csv")},
+            writes=[results("B-pad res pressure.csv")],
+        ),
+        Stage(
+            "vogel",
+            fit_vogel,
+            inputs=["merged_test_data", "rp_calc"],
+            outputs=["vogel_coeffs"],
+            params={"plot_path": plots("B-pad bhp_liq_grid.png"), "vogel_path": results("B-pad vogel_coeffs.csv")},
+            writes=[plots("B-pad bhp_liq_grid.png"), results("B-pad vogel_coeffs.csv")],
+        ),
+        Stage(
+            "ipr",
+            fit_ipr,
+            inputs=["rp_calc"],
+            outputs=["test_coeffs", "ipr_params"],
+            params={
+                "resp_modifier": resp_modifier,
+                "plot_path": plots("B-pad IPRs 5-23-24.png"),
+                "coeffs_path": results("B-pad vogel_coeffs_test.csv"),
+                "ipr_path": results("B-pad ipr_params.csv"),
+            },
+            writes=[
+                plots("B-pad IPRs 5-23-24.png"),
+                results("B-pad vogel_coeffs_test.csv"),
+                results("B-pad ipr_params.csv"),
+            ],
+        ),
+        Stage(
+            "lookups",
+            pf_lookups,
+            inputs=["processed_pf_bhp_coeffs", "ipr_params", "merged_test_data"],
+            outputs=["rate_lookup_table", "sum_df", "pf_engine"],
+            params={
+                "liquid_path": results("PF_bhp_lookup_table.csv"),
+                "oil_path": results("PF_oil_lookup_table.csv"),
+                "sum_path": results("pf_summed oil benefit.csv"),
+                "engine_path": results("PF_lookup"),
+                "method": test_method,
+            },
+            writes=[
+                results("PF_bhp_lookup_table.csv"),
+                results("PF_oil_lookup_table.csv"),
+                results("pf_summed oil benefit.csv"),
+                results("PF_lookup.npy"),
+                results("PF_lookup.json"),
+            ],
+        ),
+        Stage(
+            "optimizer",
+            optimize_pf,
+            inputs=["raw_scada_data", "pf_engine"],
+            outputs=["pf_setpoints"],
+            params={"setpoints_path": results("B-pad pf_setpoints.csv")},
+            writes=[results("B-pad pf_setpoints.csv")],
+        ),
+        Stage(
+            "pf_benefit_plot",
+            plot_pf_benefit,
+            inputs=["sum_df"],
+            params={"plot_path": plots("pf_oil_benefit.png")},
+            writes=[plots("pf_oil_benefit.png")],
+        ),
+    ]
+    if monte_carlo:
+        stages.append(
+            Stage(
+                "monte_carlo",
+                pf_monte_carlo,
+                inputs=["pf_bhp_coeffs", "ipr_params", "merged_test_data"],
+                outputs=["pf_oil_percentiles"],
+                params={
+                    "pf_pres": pf_press_rate.pf_pressure_grid(pf_step=100).tolist(),
+                    "num_draws": MONTE_CARLO_DRAWS,
+                    "seed": MONTE_CARLO_SEED,
+                    "history_path": fit_paths["coeffs_path"] if incremental else None,
+                    "percentiles_path": results("B-pad pf_oil_percentiles.csv"),
+                },
+                writes=[results("B-pad pf_oil_percentiles.csv")],
+            )
+        )
+    if report:
+        report_path = results("B-pad PF Impact.xlsx")
+        sheets = {
+            "processed_pf_bhp_coeffs": "daily_bhp_pf_coeffs",
+            "ipr_params": "B-pad ipr_params",
+            "rate_lookup_table": "PF_oil_lookup_table",
+            "sum_df": "pf_summed oil benefit",
+            "pf_setpoints": "B-pad pf_setpoints",
+        }
+        stages.append(
+            Stage(
+                "report",
+                write_report,
+                inputs=list(sheets),
+                params={"report_path": report_path, "sheets": sheets},
+                # a deleted Parquet sidecar reruns the report too, report.read_sheet reads those
+                writes=[report_path, *(sidecar_path(report_path, sheet) for sheet in sheets.values())],
+            )
+        )
+    if store_dir:
+        stages.append(
+            Stage(
+                "store",
+                store_results,
+                inputs=[
+                    "pf_bhp_coeffs",
+                    "processed_pf_bhp_coeffs",
+                    "merged_test_data",
+                    "rp_calc",
+                    "vogel_coeffs",
+                    "test_coeffs",
+                    "ipr_params",
+                    "rate_lookup_table",
+                    "sum_df",
+                    "pf_setpoints",
+                ],
+                params={
+                    "store_dir": store_dir,
+                    "analysis": "pf",
+                    "run_date": run_date,
+                    "params": {
+                        "well_list": list(well_list),
+                        "max_rp": max_rp,
+                        "resp_modifier": resp_modifier,
+                        "test_path": test_path,
+                        "start_date": start_date,
+                    },
+                },
+            )
+        )
+    return Pipeline(stages, cache_dir=cache_dir)
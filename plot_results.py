@@ -1,10 +1,12 @@
 import matplotlib.pyplot as plt
-import pandas as pd
+
+from process_data import report
 
 
 def plot_excel_data(filename, sheet_name, column_name=None, bins=10):
     """
-    Reads an Excel file into a pandas DataFrame and plots the data in bins.
+    Reads a sheet of an Excel file into a pandas DataFrame and plots the data in bins. Workbooks
+    written by the report stage are read from their Parquet sidecar, see report.read_sheet.
 
     Parameters:
     - filename: str, the path to the Excel file.
@@ -15,8 +17,8 @@ def plot_excel_data(filename, sheet_name, column_name=None, bins=10):
     Returns:
     - None, but displays a histogram of the data.
     """
-    # Read the Excel file
-    df = pd.read_excel(filename, sheet_name=sheet_name)
+    # Read the sheet, from its Parquet sidecar if the report stage wrote one
+    df = report.read_sheet(filename, sheet_name)
 
     # Check if column_name is provided, otherwise use the first column
     if column_name is None:
@@ -0,0 +1,15 @@
+import importlib
+import pkgutil
+
+# submodules are imported on first use, e.g. process_data.ipr, so importing the package stays cheap
+_SUBMODULES = {info.name for info in pkgutil.iter_modules(__path__)}
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES)
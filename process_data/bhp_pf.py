@@ -1,17 +1,69 @@
 import math
-from typing import Dict
+import os
+from typing import Dict, Optional
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
+from process_data import daily_fit, lazy, plot_density, render
+from process_data.plot_cache import PlotCache
 
-def plot_grid_bhp_vs_pf_pres(well_dfs: Dict[str, pd.DataFrame]):
+plt = lazy.module("matplotlib.pyplot")
+
+
+def _draw_bhp_vs_pf_pres(ax, well, df, density=None):
+    """One cell of plot_grid_bhp_vs_pf_pres: BHP vs PF pressure colored by PF rate."""
+    scatter = plot_density.density_scatter(ax, df["PF_Pres"], df["BHP"], df["PF_Rate"], mode=density, t=df.index)
+    ax.set_title(f"Data for Well: {well}")
+    ax.set_xlabel("Power Fluid Pressure")
+    ax.set_ylabel("Bottom Hole Pressure")
+    ax.legend()
+    ax.grid(True)
+
+    cbar = plt.colorbar(scatter, ax=ax)
+    cbar.set_label("Power Fluid Rate")
+
+
+def _plot_bhp_vs_pf_pres_panel(well, df, path, density=None):
+    # one grid cell on its own, the same size as in the matplotlib grid
+    fig, ax = plt.subplots(figsize=(7, 5))
+    _draw_bhp_vs_pf_pres(ax, well, df, density)
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def _panel_path(filename: str, well: str, name: str) -> str:
+    """Panel of one well in a panels folder next to the grid image."""
+    panel_dir = os.path.join(os.path.dirname(filename), "panels")
+    os.makedirs(panel_dir, exist_ok=True)
+    return os.path.join(panel_dir, f"{well}_{name}_panel.png")
+
+
+def _grid_path(filename: str) -> str:
+    # savefig adds a missing .png, PIL needs it spelled out
+    return filename if os.path.splitext(filename)[1] else f"{filename}.png"
+
+
+def plot_grid_bhp_vs_pf_pres(
+    well_dfs: Dict[str, pd.DataFrame],
+    density: Optional[str] = None,
+    filename: str = "plots/well_data_grid_plotBHP_PF_pres.png",
+    max_workers: Optional[int] = 1,
+    cache: Optional[PlotCache] = None,
+):
     """
     Plots a grid of BHP vs WHP for each well and overlays a trend line using median coefficients.
 
     Args:
         well_dfs (dict): Dictionary with well identifiers as keys and their data as pandas DataFrames.
+        density (str): None scatters every point, 'hexbin', 'hist2d' or 'lttb' draw a rasterized
+                       density layer or decimated scatter instead, see plot_density.density_scatter.
+        filename (str): Where to save the grid plot.
+        max_workers (int): Rendering processes, None for the CPU count. 1 without a cache draws the grid in
+                           one matplotlib figure, otherwise every well is drawn as its own panel and the
+                           grid is pasted together from the panels.
+        cache (PlotCache): Manifest of rendered panels, only wells whose data changed are redrawn.
 
     Saves:
         PNG file: Grid plot saved as a PNG file in a directory named 'plots'.
@@ -26,6 +78,16 @@ def plot_grid_bhp_vs_pf_pres(well_dfs: Dict[str, pd.DataFrame]):
                 filtered_well_dfs[well] = df
 
     well_dfs = filtered_well_dfs.copy()
+    if cache is not None or max_workers != 1:
+        # only the columns the panel draws are sent to the render workers
+        jobs = [
+            (well, df[["PF_Pres", "BHP", "PF_Rate"]], _panel_path(filename, well, "BHP_PF_pres"), density)
+            for well, df in well_dfs.items()
+        ]
+        paths = [job[2] for job in jobs]
+        render.render_grid(_plot_bhp_vs_pf_pres_panel, jobs, paths, _grid_path(filename), max_workers, cache)
+        return
+
     num_wells = len(well_dfs)
     num_columns = int(math.ceil(math.sqrt(num_wells)))
     num_rows = int(math.ceil(num_wells / num_columns))
@@ -34,27 +96,84 @@ def plot_grid_bhp_vs_pf_pres(well_dfs: Dict[str, pd.DataFrame]):
     axs = axs.flatten()
 
     for i, (well, df) in enumerate(well_dfs.items()):
-        ax = axs[i]
-
-        scatter = ax.scatter(df["PF_Pres"], df["BHP"], c=df["PF_Rate"], cmap="viridis")
-        ax.set_title(f"Data for Well: {well}")
-        ax.set_xlabel("Power Fluid Pressure")
-        ax.set_ylabel("Bottom Hole Pressure")
-        ax.legend()
-        ax.grid(True)
-
-        cbar = plt.colorbar(scatter, ax=ax)
-        cbar.set_label("Power Fluid Rate")
+        _draw_bhp_vs_pf_pres(axs[i], well, df, density)
 
     for j in range(i + 1, len(axs)):
         axs[j].axis("off")
 
     plt.tight_layout()
-    plt.savefig("plots/well_data_grid_plotBHP_PF_pres.png")
+    plt.savefig(filename)
+    plt.close(fig)
+
+
+def _daily_fit_wells(well_dfs: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """Hours with the jet pump running, PF rate above 500 and PF pressure above 1500, per well."""
+    filtered_well_dfs = {}
+    for well, df in well_dfs.items():
+        if "BHP" in df.columns and "PF_Pres" in df.columns:
+            df = df[(df["BHP"] != 0)]
+            df = df[(df["PF_Rate"] > 500)]
+            df = df[(df["PF_Pres"] > 1500)]
+            if not df.empty:
+                filtered_well_dfs[well] = df
+    return filtered_well_dfs
+
+
+def _daily_fits(well_dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    # BHP has to drop as power fluid pressure goes up
+    return daily_fit.fit_daily_lines(
+        well_dfs, "PF_Pres", "BHP", dropna=["BHP", "PF_Pres"], keep=lambda slope: slope < 0, no_fit_slope=np.nan
+    )
+
+
+def fit_daily_coefficients(well_dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Daily BHP vs power fluid pressure fits of plot_grid_BHP_PF_Pres_DailyFit without drawing the grid.
+
+    Args:
+        well_dfs (Dict[str, pd.DataFrame]): Hourly BHP, PF_Pres and PF_Rate per well
+
+    Returns:
+        pd.DataFrame: Well, Date, Slope and Intercept of the fits with a negative slope, wells without
+                      any get one row with a NaN slope
+    """
+    return _daily_fits(_daily_fit_wells(well_dfs))[daily_fit.COEFF_COLUMNS]
+
+
+def _draw_daily_fits(ax, well, df, fits, density=None):
+    """One cell of plot_grid_BHP_PF_Pres_DailyFit: the day's trend lines over BHP vs PF pressure."""
+    for fit in fits[fits["Date"].notna()].itertuples():
+        x_range = np.linspace(fit.XMin, fit.XMax, 10)
+        y_pred = fit.Slope * x_range + fit.Intercept
+        ax.plot(x_range, y_pred, label=f'Trend for {fit.Date.strftime("%Y-%m-%d")}')
+
+    scatter = plot_density.density_scatter(ax, df["PF_Pres"], df["BHP"], df["PF_Rate"], mode=density, t=df.index)
+    ax.set_title(f"Data for Well: {well}")
+    ax.set_xlabel("Power Fluid Pressure, psi")
+    ax.set_ylabel("Bottom Hole Pressure, psi")
+    # ax.legend()
+    ax.grid(True)
+
+    cbar = plt.colorbar(scatter, ax=ax)
+    cbar.set_label("Power Fluid Rate")
+
+
+def _plot_daily_fit_panel(well, df, fits, path, density=None):
+    # one grid cell on its own, the same size as in the matplotlib grid
+    fig, ax = plt.subplots(figsize=(7, 5))
+    _draw_daily_fits(ax, well, df, fits, density)
+    fig.tight_layout()
+    fig.savefig(path)
     plt.close(fig)
 
 
-def plot_grid_BHP_PF_Pres_DailyFit(well_dfs: Dict[str, pd.DataFrame], filename: str) -> pd.DataFrame:
+def plot_grid_BHP_PF_Pres_DailyFit(
+    well_dfs: Dict[str, pd.DataFrame],
+    filename: str,
+    density: Optional[str] = None,
+    max_workers: Optional[int] = 1,
+    cache: Optional[PlotCache] = None,
+) -> pd.DataFrame:
     """
     Plots daily BHP vs Power Pressure data for multiple wells and fits a linear regression model to each day's data.
     Additionally, it collects the coefficients of the fitted models.
@@ -63,6 +182,12 @@ def plot_grid_BHP_PF_Pres_DailyFit(well_dfs: Dict[str, pd.DataFrame], filename:
     Args:
         well_dfs (Dict[str, pd.DataFrame]): A dictionary where keys are well names and values are DataFrames
                                             containing BHP and Power Pressure and rate data along with dates.
+        density (str): None scatters every point, 'hexbin', 'hist2d' or 'lttb' draw a rasterized
+                       density layer or decimated scatter instead, see plot_density.density_scatter.
+        max_workers (int): Rendering processes, None for the CPU count. 1 without a cache draws the grid in
+                           one matplotlib figure, otherwise every fitted well is drawn as its own panel
+                           and the grid is pasted together from the panels.
+        cache (PlotCache): Manifest of rendered panels, only wells whose data changed are redrawn.
 
     Returns:
         pd.DataFrame: A DataFrame containing the well names, dates, slopes, and intercepts of the fitted models.
@@ -70,17 +195,25 @@ def plot_grid_BHP_PF_Pres_DailyFit(well_dfs: Dict[str, pd.DataFrame], filename:
     Raises:
         ValueError: If any DataFrame is empty after filtering or does not contain the required columns.
     """
-    filtered_well_dfs = {}
-    coefficients_list = []
-    for well, df in well_dfs.items():
-        if "BHP" in df.columns and "PF_Pres" in df.columns:
-            df = df[(df["BHP"] != 0)]
-            df = df[(df["PF_Rate"] > 500)]
-            df = df[(df["PF_Pres"] > 1500)]
-            if not df.empty:
-                filtered_well_dfs[well] = df
+    well_dfs = _daily_fit_wells(well_dfs)
+    fits = _daily_fits(well_dfs)
+    fitted_wells = set(fits["Well"])
+    if cache is not None or max_workers != 1:
+        jobs = [
+            (
+                well,
+                df[["PF_Pres", "BHP", "PF_Rate"]],
+                fits[fits["Well"] == well],
+                _panel_path(filename, well, "BHP_PF_dailyfit"),
+                density,
+            )
+            for well, df in well_dfs.items()
+            if well in fitted_wells
+        ]
+        paths = [job[3] for job in jobs]
+        render.render_grid(_plot_daily_fit_panel, jobs, paths, _grid_path(filename), max_workers, cache)
+        return fits[daily_fit.COEFF_COLUMNS]
 
-    well_dfs = filtered_well_dfs.copy()
     num_wells = len(well_dfs)
     num_columns = int(math.ceil(math.sqrt(num_wells)))
     num_rows = int(math.ceil(num_wells / num_columns))
@@ -90,41 +223,11 @@ def plot_grid_BHP_PF_Pres_DailyFit(well_dfs: Dict[str, pd.DataFrame], filename:
 
     for i, (well, df) in enumerate(well_dfs.items()):
         ax = axs[i]
-        valid_slope_found = False
-        # Assuming 'Date' is a column in df
-        if "Date" not in df.columns:
-            df["Date"] = df.index.date  # Convert index to date if necessary
-
-        empty_check = df.dropna(subset=["BHP", "PF_Pres"])
-        if empty_check["BHP"].empty:
+        # wells without a complete BHP and PF pressure row are left blank
+        if well not in fitted_wells:
             continue
 
-        for date, group in df.groupby("Date"):
-            group = group.dropna(subset=["BHP", "PF_Pres"])  # Drop rows where BHP or WHP is NaN
-
-            if len(group) > 1:  # Ensure there's enough data to fit the model
-                y = group["BHP"].values
-                x = group["PF_Pres"].values
-                slope, intercept = np.polyfit(x, y, 1)
-                x_range = np.linspace(x.min(), x.max(), 10)
-                y_pred = slope * x_range + intercept
-
-                if slope < 0:
-                    ax.plot(x_range, y_pred, label=f'Trend for {date.strftime("%Y-%m-%d")}')
-                    valid_slope_found = True
-                    coefficients_list.append({"Well": well, "Date": date, "Slope": slope, "Intercept": intercept})
-
-        scatter = ax.scatter(df["PF_Pres"], df["BHP"], c=df["PF_Rate"], cmap="viridis")
-        ax.set_title(f"Data for Well: {well}")
-        ax.set_xlabel("Power Fluid Pressure, psi")
-        ax.set_ylabel("Bottom Hole Pressure, psi")
-        # ax.legend()
-        ax.grid(True)
-        if not valid_slope_found:
-            coefficients_list.append({"Well": well, "Date": pd.NaT, "Slope": np.nan, "Intercept": np.nan})
-
-        cbar = plt.colorbar(scatter, ax=ax)
-        cbar.set_label("Power Fluid Rate")
+        _draw_daily_fits(ax, well, df, fits[fits["Well"] == well], density)
 
     for j in range(i + 1, len(axs)):
         axs[j].axis("off")
@@ -133,5 +236,4 @@ def plot_grid_BHP_PF_Pres_DailyFit(well_dfs: Dict[str, pd.DataFrame], filename:
     plt.savefig(filename)
     plt.close(fig)
 
-    coefficients_df = pd.DataFrame(coefficients_list)
-    return coefficients_df
+    return fits[daily_fit.COEFF_COLUMNS]
@@ -1,17 +1,48 @@
+import logging
 import math
-from typing import Dict
+import os
+from typing import Dict, List, Optional, Tuple
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
+from process_data import daily_fit, lazy, plot_density, render
+from process_data.plot_cache import PlotCache
 
-def plot_bhp_vs_headerp(well_dfs):
+plt = lazy.module("matplotlib.pyplot")
+
+logger = logging.getLogger(__name__)
+
+
+def _plot_well_bhp_vs_headerp(well, bhp, header_p, slope, intercept):
+    trendline = slope * bhp + intercept
+
+    plt.figure(figsize=(10, 5))
+    plt.scatter(bhp, header_p, alpha=0.5)
+    plt.plot(bhp, trendline, color="red", label=f"Trend line (y={slope:.2f}x+{intercept:.2f})")
+    # Add the curve fit equation as text on the plot
+    equation_text = f"y = {slope:.2f}x + {intercept:.2f}"
+    plt.text(0.05, 0.95, equation_text, transform=plt.gca().transAxes, fontsize=12, verticalalignment="top")
+    plt.title(f"BHP vs HeaderP for Well: {well}")
+    plt.xlabel("BHP (Bottom Hole Pressure)")
+    plt.ylabel("HeaderP (Header Pressure)")
+    plt.grid(True)
+    plt.tight_layout()
+    plt.savefig(f"plots/{well}_BHP_vs_HeaderP_plot.png")  # Save the plot as a PNG file
+    # plt.show()
+    plt.close()
+
+
+def plot_bhp_vs_headerp(well_dfs, max_workers=1, cache=None):
     """
     Plot BHP versus Header Pressure for each well and fit a linear trend line.
 
+    The fits run here, the plots are rendered on a process pool.
+
     Args:
         well_dfs (dict of pandas.DataFrame): Dictionary with well identifiers as keys and their data as pandas DataFrames.
+        max_workers (int): Rendering processes, None for the CPU count. 1 renders in this process.
+        cache (PlotCache): Skip wells whose figure is already rendered from the same data, None renders all.
 
     Returns:
         pandas.DataFrame: DataFrame containing the slope and intercept of the fitted line for each well.
@@ -21,6 +52,7 @@ def plot_bhp_vs_headerp(well_dfs):
     """
     # Initialize a DataFrame to store the coefficients
     coefficients_list = []
+    jobs = []
 
     for well, df in well_dfs.items():
 
@@ -32,42 +64,32 @@ def plot_bhp_vs_headerp(well_dfs):
             if df["BHP"].nunique() > 1 and df["HeaderP"].nunique() > 1:
                 try:
                     slope, intercept = np.polyfit(df["BHP"], df["HeaderP"], 1)
-                    coefficients_list.append({"Well": well, "Slope": slope, "Intercept": intercept})
-                    trendline = slope * df["BHP"] + intercept
-
-                    plt.figure(figsize=(10, 5))
-                    plt.scatter(df["BHP"], df["HeaderP"], alpha=0.5)
-                    plt.plot(df["BHP"], trendline, color="red", label=f"Trend line (y={slope:.2f}x+{intercept:.2f})")
-                    # Add the curve fit equation as text on the plot
-                    equation_text = f"y = {slope:.2f}x + {intercept:.2f}"
-                    plt.text(
-                        0.05, 0.95, equation_text, transform=plt.gca().transAxes, fontsize=12, verticalalignment="top"
-                    )
-                    plt.title(f"BHP vs HeaderP for Well: {well}")
-                    plt.xlabel("BHP (Bottom Hole Pressure)")
-                    plt.ylabel("HeaderP (Header Pressure)")
-                    plt.grid(True)
-                    plt.tight_layout()
-                    plt.savefig(f"plots/{well}_BHP_vs_HeaderP_plot.png")  # Save the plot as a PNG file
-                    # plt.show()
-                    plt.close()
                 except Exception as e:
-                    print(f"error fitting {e}")
+                    logger.error("error fitting %s", e)
                     continue
+                coefficients_list.append({"Well": well, "Slope": slope, "Intercept": intercept})
+                # only the two columns the plot needs are sent to the workers
+                jobs.append((well, df["BHP"].to_numpy(), df["HeaderP"].to_numpy(), slope, intercept))
         else:
-            print(f"Data for BHP or HeaderP is missing for well {well}")
+            logger.warning("Data for BHP or HeaderP is missing for well %s", well)
+
+    paths = [f"plots/{job[0]}_BHP_vs_HeaderP_plot.png" for job in jobs]
+    render.render_jobs(_plot_well_bhp_vs_headerp, jobs, max_workers, paths, cache)
+
     # Create a DataFrame from the list of coefficients
     coefficients_df = pd.DataFrame(coefficients_list)
     return coefficients_df
 
 
-def plot_grid_BHP_WHP(well_dfs, median_coefficients):
+def plot_grid_BHP_WHP(well_dfs, median_coefficients, density=None):
     """
     Plots a grid of BHP vs WHP for each well and overlays a trend line using median coefficients.
 
     Args:
         well_dfs (dict): Dictionary with well identifiers as keys and their data as pandas DataFrames.
         median_coefficients (pd.DataFrame): DataFrame containing the median slope and intercept for each well.
+        density (str): None scatters every point, 'hexbin', 'hist2d' or 'lttb' draw a rasterized
+                       density layer or decimated scatter instead, see plot_density.density_scatter.
 
     Saves:
         PNG file: Grid plot saved as a PNG file in a directory named 'plots'.
@@ -99,7 +121,9 @@ def plot_grid_BHP_WHP(well_dfs, median_coefficients):
 
             ax.plot(x_values, trendline, color="red", label=f"Mean trend line (y={slope:.2f}x+{intercept:.2f})")
 
-        scatter = ax.scatter(df["BHP"], df["WHP"], c=(df.index.max() - df.index).days, cmap="viridis")
+        scatter = plot_density.density_scatter(
+            ax, df["BHP"], df["WHP"], (df.index.max() - df.index).days, mode=density, t=df.index
+        )
         ax.set_title(f"Data for Well: {well}")
         ax.set_xlabel("BHP")
         ax.set_ylabel("Wellhead Pressure")
@@ -117,7 +141,129 @@ def plot_grid_BHP_WHP(well_dfs, median_coefficients):
     plt.close(fig)
 
 
-def plot_grid_BHP_HeaderP_DailyFit(well_dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+def _daily_fit_wells(well_dfs: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """Wells with BHP and WHP and more than 5 non zero BHP readings, the wells of the daily fit grids."""
+    filtered_well_dfs = {}
+    for well, df in well_dfs.items():
+        if "BHP" in df.columns and "WHP" in df.columns:
+            df = df[(df["BHP"] != 0)]
+            df = df.dropna(subset=["BHP"])
+            if not df.empty:
+                if len(df["BHP"]) > 5:
+                    filtered_well_dfs[well] = df
+    return filtered_well_dfs
+
+
+def _daily_fits(well_dfs: Dict[str, pd.DataFrame], y: str) -> pd.DataFrame:
+    # slopes below 0.9 are BHP slugging rather than a wellhead pressure response
+    return daily_fit.fit_daily_lines(
+        well_dfs, "BHP", y, dropna=["BHP", "WHP"], keep=lambda slope: slope >= 0.9, no_fit_slope=1000000
+    )
+
+
+def fit_daily_coefficients(well_dfs: Dict[str, pd.DataFrame], y: str = "WHP") -> pd.DataFrame:
+    """
+    Daily fits of plot_grid_BHP_WHP_DailyFit (y="WHP") or plot_grid_BHP_HeaderP_DailyFit (y="HeaderP")
+    without drawing the grid, for runs and benchmarks that only need the coefficients.
+
+    Args:
+        well_dfs (Dict[str, pd.DataFrame]): Hourly BHP, WHP and HeaderP per well
+        y (str): Pressure fitted against BHP, WHP or HeaderP
+
+    Returns:
+        pd.DataFrame: Well, Date, Slope and Intercept of the fits with a slope of 0.9 or more, wells
+                      without any get one row with Slope 1000000
+    """
+    return _daily_fits(_daily_fit_wells(well_dfs), y)[daily_fit.COEFF_COLUMNS]
+
+
+def _draw_daily_fits(ax, well, df, fits, y, density=None):
+    """One cell of the daily fit grids: the day's trend lines over the BHP vs y scatter colored by date."""
+    for fit in fits[fits["Date"].notna()].itertuples():
+        x_range = np.linspace(fit.XMin, fit.XMax, 10)
+        y_pred = fit.Slope * x_range + fit.Intercept
+        ax.plot(x_range, y_pred, label=f'Trend for {fit.Date.strftime("%Y-%m-%d")}')
+
+    scatter = plot_density.density_scatter(
+        ax, df["BHP"], df[y], pd.to_datetime(df["Date"]).astype("int64"), mode=density, t=df.index
+    )
+    ax.set_title(f"Data for Well: {well}")
+    ax.set_xlabel("Bottom Hole Pressure, psi")
+    ax.set_ylabel("Well Head Pressure, psi")
+    # ax.legend()
+    ax.grid(True)
+
+    cbar = plt.colorbar(scatter, ax=ax)
+    cbar.set_label("Date")
+
+
+def plot_daily_fit_panel(well, df, fits, y, path, density=None):
+    """
+    Draw one well's cell of the daily fit grid as its own image, the same size as in the grid.
+
+    Module level so render workers can run it, plot_cache.compose_grid pastes the panels into the grid.
+    """
+    fig, ax = plt.subplots(figsize=(7, 5))
+    _draw_daily_fits(ax, well, df, fits, y, density)
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def daily_fit_panels(
+    well_dfs: Dict[str, pd.DataFrame], y: str = "WHP", panel_dir: str = "plots/panels", density: Optional[str] = None
+) -> Tuple[pd.DataFrame, List[tuple]]:
+    """
+    Daily fits of fit_daily_coefficients together with the plot_daily_fit_panel jobs of the wells
+    the grid would draw, for runs that render the grid cells separately from the fitting.
+
+    Args:
+        well_dfs (Dict[str, pd.DataFrame]): Hourly BHP, WHP and HeaderP per well
+        y (str): Pressure fitted against BHP, WHP or HeaderP
+        panel_dir (str): Folder the panels are written to
+        density (str): Scatter mode of the panels, see plot_density.density_scatter
+
+    Returns:
+        Tuple[pd.DataFrame, List[tuple]]: The coefficients as fit_daily_coefficients and one
+                                          (well, df, fits, y, path, density) job per fitted well in grid order
+    """
+    well_dfs = _daily_fit_wells(well_dfs)
+    fits = _daily_fits(well_dfs, y)
+    jobs = []
+    for well, df in well_dfs.items():
+        well_fits = fits[fits["Well"] == well]
+        if well_fits.empty:
+            continue
+        # only the columns the panel draws are sent to the render workers
+        panel_df = pd.DataFrame({"BHP": df["BHP"], y: df[y], "Date": df.index.date}, index=df.index)
+        path = os.path.join(panel_dir, f"{well}_BHP_{y}_dailyfit_panel.png")
+        jobs.append((well, panel_df, well_fits, y, path, density))
+    return fits[daily_fit.COEFF_COLUMNS], jobs
+
+
+def _render_daily_fit_grid(
+    well_dfs: Dict[str, pd.DataFrame],
+    y: str,
+    density: Optional[str],
+    filename: str,
+    max_workers: Optional[int],
+    cache: Optional[PlotCache],
+) -> pd.DataFrame:
+    """The daily fit grid pasted together from panels rendered on max_workers processes."""
+    panel_dir = os.path.join(os.path.dirname(filename), "panels")
+    os.makedirs(panel_dir, exist_ok=True)
+    fits, jobs = daily_fit_panels(well_dfs, y, panel_dir, density)
+    render.render_grid(plot_daily_fit_panel, jobs, [job[4] for job in jobs], filename, max_workers, cache)
+    return fits
+
+
+def plot_grid_BHP_HeaderP_DailyFit(
+    well_dfs: Dict[str, pd.DataFrame],
+    density: Optional[str] = None,
+    filename: str = "plots/well_data_grid_plotBHP_HeaderP_dailyfit.png",
+    max_workers: Optional[int] = 1,
+    cache: Optional[PlotCache] = None,
+) -> pd.DataFrame:
     """
     Plots daily BHP vs HeaderP data for multiple wells and fits a linear regression model to each day's data.
     Additionally, it collects the coefficients of the fitted models.
@@ -128,6 +274,13 @@ def plot_grid_BHP_HeaderP_DailyFit(well_dfs: Dict[str, pd.DataFrame]) -> pd.Data
     Args:
         well_dfs (Dict[str, pd.DataFrame]): A dictionary where keys are well names and values are DataFrames
                                             containing BHP and WHP data along with dates.
+        density (str): None scatters every point, 'hexbin', 'hist2d' or 'lttb' draw a rasterized
+                       density layer or decimated scatter instead, see plot_density.density_scatter.
+        filename (str): Where to save the grid plot.
+        max_workers (int): Rendering processes, None for the CPU count. 1 without a cache draws the grid in
+                           one matplotlib figure, otherwise every fitted well is drawn as its own panel
+                           and the grid is pasted together from the panels.
+        cache (PlotCache): Manifest of rendered panels, only wells whose data changed are redrawn.
 
     Returns:
         pd.DataFrame: A DataFrame containing the well names, dates, slopes, and intercepts of the fitted models.
@@ -135,18 +288,12 @@ def plot_grid_BHP_HeaderP_DailyFit(well_dfs: Dict[str, pd.DataFrame]) -> pd.Data
     Raises:
         ValueError: If any DataFrame is empty after filtering or does not contain the required columns.
     """
-    filtered_well_dfs = {}
-    coefficients_list = []
+    if cache is not None or max_workers != 1:
+        return _render_daily_fit_grid(well_dfs, "HeaderP", density, filename, max_workers, cache)
 
-    for well, df in well_dfs.items():
-        if "BHP" in df.columns and "WHP" in df.columns:
-            df = df[(df["BHP"] != 0)]
-            df = df.dropna(subset=["BHP"])
-            if not df.empty:
-                if len(df["BHP"]) > 5:
-                    filtered_well_dfs[well] = df
-
-    well_dfs = filtered_well_dfs.copy()
+    well_dfs = _daily_fit_wells(well_dfs)
+    fits = _daily_fits(well_dfs, "HeaderP")
+    fitted_wells = set(fits["Well"])
     num_wells = len(well_dfs)
     num_columns = int(math.ceil(math.sqrt(num_wells)))
     num_rows = int(math.ceil(num_wells / num_columns))
@@ -156,54 +303,33 @@ def plot_grid_BHP_HeaderP_DailyFit(well_dfs: Dict[str, pd.DataFrame]) -> pd.Data
 
     for i, (well, df) in enumerate(well_dfs.items()):
         ax = axs[i]
-        valid_slope_found = False
         # Assuming 'Date' is a column in df
         if "Date" not in df.columns:
             df["Date"] = df.index.date  # Convert index to date if necessary
 
-        empty_check = df.dropna(subset=["BHP", "WHP"])
-        if empty_check["BHP"].empty:
+        # wells without a complete BHP and WHP row are left blank
+        if well not in fitted_wells:
             continue
 
-        for date, group in df.groupby("Date"):
-            group = group.dropna(subset=["BHP", "WHP"])  # Drop rows where BHP or WHP is NaN
-
-            if len(group) > 1:  # Ensure there's enough data to fit the model
-                x = group["BHP"].values
-                y = group["HeaderP"].values
-                slope, intercept = np.polyfit(x, y, 1)
-                x_range = np.linspace(x.min(), x.max(), 10)
-                y_pred = slope * x_range + intercept
-
-                if slope >= 0.9:
-                    ax.plot(x_range, y_pred, label=f'Trend for {date.strftime("%Y-%m-%d")}')
-                    valid_slope_found = True
-                    coefficients_list.append({"Well": well, "Date": date, "Slope": slope, "Intercept": intercept})
-
-        scatter = ax.scatter(df["BHP"], df["HeaderP"], c=pd.to_datetime(df["Date"]).astype("int64"), cmap="viridis")
-        ax.set_title(f"Data for Well: {well}")
-        ax.set_xlabel("Bottom Hole Pressure, psi")
-        ax.set_ylabel("Well Head Pressure, psi")
-        # ax.legend()
-        ax.grid(True)
-        if not valid_slope_found:
-            coefficients_list.append({"Well": well, "Date": pd.NaT, "Slope": 1000000, "Intercept": np.nan})
-
-        cbar = plt.colorbar(scatter, ax=ax)
-        cbar.set_label("Date")
+        _draw_daily_fits(ax, well, df, fits[fits["Well"] == well], "HeaderP", density)
 
     for j in range(i + 1, len(axs)):
         axs[j].axis("off")
 
     plt.tight_layout()
-    plt.savefig("plots/well_data_grid_plotBHP_HeaderP_dailyfit.png")
+    plt.savefig(filename)
     plt.close(fig)
 
-    coefficients_df = pd.DataFrame(coefficients_list)
-    return coefficients_df
+    return fits[daily_fit.COEFF_COLUMNS]
 
 
-def plot_grid_BHP_WHP_DailyFit(well_dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+def plot_grid_BHP_WHP_DailyFit(
+    well_dfs: Dict[str, pd.DataFrame],
+    density: Optional[str] = None,
+    filename: str = "plots/well_data_grid_plotBHP_WHP_dailyfit.png",
+    max_workers: Optional[int] = 1,
+    cache: Optional[PlotCache] = None,
+) -> pd.DataFrame:
     """
     Plots daily BHP vs WHP data for multiple wells and fits a linear regression model to each day's data.
     Additionally, it collects the coefficients of the fitted models.
@@ -216,6 +342,13 @@ def plot_grid_BHP_WHP_DailyFit(well_dfs: Dict[str, pd.DataFrame]) -> pd.DataFram
     Args:
         well_dfs (Dict[str, pd.DataFrame]): A dictionary where keys are well names and values are DataFrames
                                             containing BHP and WHP data along with dates.
+        density (str): None scatters every point, 'hexbin', 'hist2d' or 'lttb' draw a rasterized
+                       density layer or decimated scatter instead, see plot_density.density_scatter.
+        filename (str): Where to save the grid plot.
+        max_workers (int): Rendering processes, None for the CPU count. 1 without a cache draws the grid in
+                           one matplotlib figure, otherwise every fitted well is drawn as its own panel
+                           and the grid is pasted together from the panels.
+        cache (PlotCache): Manifest of rendered panels, only wells whose data changed are redrawn.
 
     Returns:
         pd.DataFrame: A DataFrame containing the well names, dates, slopes, and intercepts of the fitted models.
@@ -223,18 +356,12 @@ def plot_grid_BHP_WHP_DailyFit(well_dfs: Dict[str, pd.DataFrame]) -> pd.DataFram
     Raises:
         ValueError: If any DataFrame is empty after filtering or does not contain the required columns.
     """
-    filtered_well_dfs = {}
-    coefficients_list = []
-
-    for well, df in well_dfs.items():
-        if "BHP" in df.columns and "WHP" in df.columns:
-            df = df[(df["BHP"] != 0)]
-            df = df.dropna(subset=["BHP"])
-            if not df.empty:
-                if len(df["BHP"]) > 5:
-                    filtered_well_dfs[well] = df
+    if cache is not None or max_workers != 1:
+        return _render_daily_fit_grid(well_dfs, "WHP", density, filename, max_workers, cache)
 
-    well_dfs = filtered_well_dfs.copy()
+    well_dfs = _daily_fit_wells(well_dfs)
+    fits = _daily_fits(well_dfs, "WHP")
+    fitted_wells = set(fits["Well"])
     num_wells = len(well_dfs)
     num_columns = int(math.ceil(math.sqrt(num_wells)))
     num_rows = int(math.ceil(num_wells / num_columns))
@@ -244,54 +371,27 @@ def plot_grid_BHP_WHP_DailyFit(well_dfs: Dict[str, pd.DataFrame]) -> pd.DataFram
 
     for i, (well, df) in enumerate(well_dfs.items()):
         ax = axs[i]
-        valid_slope_found = False
         # Assuming 'Date' is a column in df
         if "Date" not in df.columns:
             df["Date"] = df.index.date  # Convert index to date if necessary
 
-        empty_check = df.dropna(subset=["BHP", "WHP"])
-        if empty_check["BHP"].empty:
+        # wells without a complete BHP and WHP row are left blank
+        if well not in fitted_wells:
             continue
 
-        for date, group in df.groupby("Date"):
-            group = group.dropna(subset=["BHP", "WHP"])  # Drop rows where BHP or WHP is NaN
-
-            if len(group) > 1:  # Ensure there's enough data to fit the model
-                x = group["BHP"].values
-                y = group["WHP"].values
-                slope, intercept = np.polyfit(x, y, 1)
-                x_range = np.linspace(x.min(), x.max(), 10)
-                y_pred = slope * x_range + intercept
-
-                if slope >= 0.9:
-                    ax.plot(x_range, y_pred, label=f'Trend for {date.strftime("%Y-%m-%d")}')
-                    valid_slope_found = True
-                    coefficients_list.append({"Well": well, "Date": date, "Slope": slope, "Intercept": intercept})
-
-        scatter = ax.scatter(df["BHP"], df["WHP"], c=pd.to_datetime(df["Date"]).astype("int64"), cmap="viridis")
-        ax.set_title(f"Data for Well: {well}")
-        ax.set_xlabel("Bottom Hole Pressure, psi")
-        ax.set_ylabel("Well Head Pressure, psi")
-        # ax.legend()
-        ax.grid(True)
-        if not valid_slope_found:
-            coefficients_list.append({"Well": well, "Date": pd.NaT, "Slope": 1000000, "Intercept": np.nan})
-
-        cbar = plt.colorbar(scatter, ax=ax)
-        cbar.set_label("Date")
+        _draw_daily_fits(ax, well, df, fits[fits["Well"] == well], "WHP", density)
 
     for j in range(i + 1, len(axs)):
         axs[j].axis("off")
 
     plt.tight_layout()
-    plt.savefig("plots/well_data_grid_plotBHP_WHP_dailyfit.png")
+    plt.savefig(filename)
     plt.close(fig)
 
-    coefficients_df = pd.DataFrame(coefficients_list)
-    return coefficients_df
+    return fits[daily_fit.COEFF_COLUMNS]
 
 
-def plot_grid_BHP_WHP_HourlyFit(well_dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+def plot_grid_BHP_WHP_HourlyFit(well_dfs: Dict[str, pd.DataFrame], density: Optional[str] = None) -> pd.DataFrame:
     """
     Plots daily BHP vs WHP data for multiple wells and fits a linear regression model to each day's data.
     Additionally, it collects the coefficients of the fitted models.
@@ -299,6 +399,8 @@ def plot_grid_BHP_WHP_HourlyFit(well_dfs: Dict[str, pd.DataFrame]) -> pd.DataFra
     Args:
         well_dfs (Dict[str, pd.DataFrame]): A dictionary where keys are well names and values are DataFrames
                                             containing BHP and WHP data along with dates.
+        density (str): None scatters every point, 'hexbin', 'hist2d' or 'lttb' draw a rasterized
+                       density layer or decimated scatter instead, see plot_density.density_scatter.
 
     Returns:
         pd.DataFrame: A DataFrame containing the well names, dates, slopes, and intercepts of the fitted models.
@@ -342,7 +444,9 @@ def plot_grid_BHP_WHP_HourlyFit(well_dfs: Dict[str, pd.DataFrame]) -> pd.DataFra
                     valid_slope_found = True
                     coefficients_list.append({"Well": well, "Date": time, "Slope": slope, "Intercept": intercept})
 
-        scatter = ax.scatter(df["BHP"], df["WHP"], c=pd.to_datetime(df["Date"]).astype("int64"), cmap="viridis")
+        scatter = plot_density.density_scatter(
+            ax, df["BHP"], df["WHP"], pd.to_datetime(df["Date"]).astype("int64"), mode=density, t=df.index
+        )
         ax.set_title(f"Data for Well: {well}")
         ax.set_xlabel("BHP")
         ax.set_ylabel("Wellhead Pressure")
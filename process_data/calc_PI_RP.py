@@ -1,5 +1,13 @@
+import logging
+
 import pandas as pd
-from woffl.flow.inflow import InFlow
+
+from process_data import lazy
+from process_data.instrument import instrumented
+
+inflow = lazy.module("woffl.flow.inflow")
+
+logger = logging.getLogger(__name__)
 
 
 def calculate_cumulative_error(group: pd.DataFrame, pres: float) -> float:
@@ -18,18 +26,19 @@ def calculate_cumulative_error(group: pd.DataFrame, pres: float) -> float:
     vogel = None
     for index, row in group.iterrows():
         if index == 0:
-            vogel = InFlow(row["WtTotalFluid"], row["BHP"], pres)
+            vogel = inflow.InFlow(row["WtTotalFluid"], row["BHP"], pres)
         else:
             if vogel is not None:
                 calculated_qwf = vogel.oil_flow(row["BHP"], "vogel")
                 error = abs(calculated_qwf - row["WtTotalFluid"])
                 cumulative_error += error
             else:
-                print("Error: vogel did not intialize")
+                logger.error("Error: vogel did not intialize")
                 break
     return cumulative_error
 
 
+@instrumented()
 def calc_optimal_RP(df: pd.DataFrame, max_pres: int = 5000) -> pd.DataFrame:
     """
     Calculate the optimal reservoir pressure for each well and compute productivity index.
@@ -48,7 +57,7 @@ def calc_optimal_RP(df: pd.DataFrame, max_pres: int = 5000) -> pd.DataFrame:
         max_bhp = well_data["BHP"].max()
 
         if pd.isna(max_bhp):
-            print(f"Warning: No valid BHP data for well {well}. Skipping this well.")
+            logger.warning("Warning: No valid BHP data for well %s. Skipping this well.", well)
             continue  # Skip this iteration if max_bhp is NaN
 
         min_error = float("inf")
@@ -1,58 +1,91 @@
 # drop negatives
 # take median slope
 # take median intercept
+from typing import Optional
+
 import pandas as pd
 
+from process_data import aggregate
+from process_data.quantile_sketch import StreamingWellStats
+
 
-def process_coefficients(coefficients_df: pd.DataFrame) -> pd.DataFrame:
+def process_coefficients(coefficients_df: pd.DataFrame, method: str = "mean") -> pd.DataFrame:
     """
-    Processes the coefficients DataFrame to group by well name, filter, sort, and calculate median values.
+    Processes the coefficients DataFrame to group by well name, filter and aggregate the daily fits.
+
+    Mean slope is the most accurate to use for the wells. Slopes of 0.9 and above are dropped and
+    wells with 3 or fewer remaining fits get a slope of 1000000 and intercept of 0.
 
     Args:
         coefficients_df (pd.DataFrame): DataFrame containing well names, dates, slopes, and intercepts.
+        method (str): Aggregation from aggregate.METHODS, e.g. mean, median, iqr_mean or trimmed_mean.
 
     Returns:
-        pd.DataFrame: A DataFrame with the median slope and median intercept for each well.
+        pd.DataFrame: A DataFrame with the mean slope and mean intercept for each well.
     """
-    # Group by 'Well' and apply processing to each group
-    result = coefficients_df.groupby("Well").apply(lambda group: process_group(group))
+    wells = pd.Index(coefficients_df["Well"].unique()).sort_values()
+
+    # Filter out rows where Slope is 0.9 or above
+    filtered = coefficients_df[coefficients_df["Slope"] < 0.9]
 
-    # Reset index to turn the multi-index into columns
-    result = result.reset_index()
+    result = aggregate.grouped_stats(
+        filtered,
+        "Well",
+        ["Slope", "Intercept"],
+        method=method,
+        min_count=3,
+        fill={"Slope": 1000000, "Intercept": 0},
+    )
 
-    return result
+    # wells with every fit filtered out still get the placeholder
+    no_fits = ~wells.isin(result.index)
+    result = result.reindex(wells)
+    result.loc[no_fits, ["Slope", "Intercept"]] = [1000000, 0]
 
+    result = result.rename(columns={"Slope": "Mean Slope", "Intercept": "Mean Intercept"})
+    result.index.name = "Well"
 
-def process_group(group: pd.DataFrame) -> pd.Series:
+    return result.reset_index()
+
+
+def update_coefficient_sketches(
+    coefficients_df: pd.DataFrame, stats: Optional[StreamingWellStats] = None
+) -> StreamingWellStats:
     """
-    Helper function to process each group: filters, sorts, and calculates medians.
+    Streaming version of process_coefficients: fold new daily coefficients into per well quantile
+    sketches instead of keeping the whole history in memory. Sketches from parallel workers can
+    be combined with StreamingWellStats.merge.
 
-    Mean slope is the most accurate to use for the wells
+    Args:
+        coefficients_df (pd.DataFrame): New daily coefficients with Well, Slope and Intercept.
+        stats (StreamingWellStats): Sketches to update, a new set is started if None.
+
+    Returns:
+        StreamingWellStats: The updated sketches.
+    """
+    if stats is None:
+        stats = StreamingWellStats(["Slope", "Intercept"])
+
+    stats.register(coefficients_df["Well"].unique())
+    return stats.update(coefficients_df[coefficients_df["Slope"] < 0.9], by="Well")
+
+
+def process_coefficient_sketches(stats: StreamingWellStats, method: str = "mean") -> pd.DataFrame:
+    """
+    process_coefficients output computed from streaming sketches. mean and count are exact, the
+    quantile based methods are approximate.
 
     Args:
-        group (pd.DataFrame): The DataFrame group for a single well.
+        stats (StreamingWellStats): Sketches from update_coefficient_sketches.
+        method (str): mean, median, iqr_mean or trimmed_mean.
 
     Returns:
-        pd.Series: A Series containing the mean slope and mean intercept for the group.
+        pd.DataFrame: A DataFrame with the mean slope and mean intercept for each well.
     """
-    # Filter out rows where Slope is less than 0
-    filtered_group = group[group["Slope"] < 0.9]
-    # filtered_group = group.copy()
-
-    # Sort the group by 'Slope'
-    sorted_group = filtered_group.sort_values(by="Slope")
-
-    # Calculate median slope and intercept
-    # median_slope = sorted_group["Slope"].median()
-    # median_intercept = sorted_group["Intercept"].median()
-    median_slope = sorted_group["Slope"].median()
-    median_intercept = sorted_group["Intercept"].median()
-
-    if sorted_group["Slope"].count() > 3:
-        mean_slope = sorted_group["Slope"].mean()
-        mean_intercept = sorted_group["Intercept"].mean()
-    else:
-        mean_slope = int(1000000)
-        mean_intercept = int(0)
-
-    return pd.Series({"Mean Slope": mean_slope, "Mean Intercept": mean_intercept})
+    result = stats.summary(method)
+    too_few = stats.summary("count")["Slope"] <= 3
+    result.loc[too_few, ["Slope", "Intercept"]] = [1000000, 0]
+
+    result = result.rename(columns={"Slope": "Mean Slope", "Intercept": "Mean Intercept"})
+    result.index.name = "Well"
+    return result.reset_index()
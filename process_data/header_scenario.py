@@ -0,0 +1,137 @@
+import logging
+from typing import Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from process_data import aggregate
+from process_data.ipr import vogel_rate
+from process_data.pf_oil_benefit import average_well_tests
+from well_config import well_pad
+
+logger = logging.getLogger(__name__)
+
+# slope of wells without a header pressure response, as in the daily fits and process_coefficients
+NO_IMPACT_SLOPE = 1000000
+
+
+def _delta_matrix(header_deltas, wells: pd.Index) -> np.ndarray:
+    """Broadcast header pressure deltas to a (scenario, well) matrix."""
+    if isinstance(header_deltas, pd.DataFrame):
+        # one column per well, wells missing from the frame see no change
+        return header_deltas.reindex(columns=wells).fillna(0).to_numpy(dtype=float)
+
+    if isinstance(header_deltas, dict):
+        # one array of deltas per pad, wells on pads missing from the dict see no change
+        pads = {pad: np.asarray(deltas, dtype=float) for pad, deltas in header_deltas.items()}
+        num_scenarios = {len(deltas) for deltas in pads.values()}
+        if len(num_scenarios) != 1:
+            raise ValueError("Every pad needs the same number of header pressure deltas")
+        zeros = np.zeros(num_scenarios.pop())
+        return np.column_stack([pads.get(well_pad(well), zeros) for well in wells])
+
+    deltas = np.asarray(header_deltas, dtype=float)
+    if deltas.ndim == 1:
+        return np.repeat(deltas[:, None], len(wells), axis=1)
+    if deltas.ndim == 2 and deltas.shape[1] == len(wells):
+        return deltas
+    raise ValueError("header_deltas must be 1-D, (scenarios, wells), a per pad dict or a DataFrame of wells")
+
+
+def header_slopes(daily_coeffs_header: pd.DataFrame, method: str = "mean", min_count: int = 3) -> pd.DataFrame:
+    """
+    Per well BHP vs HeaderP slope and intercept for header_pressure_impact, aggregated over the
+    daily fits the header fit kept.
+
+    bhp_vs_whp keeps the daily slopes of 0.9 and above, process_coefficients drops exactly those,
+    so its output has the placeholder slope for every well and cannot drive the scenarios.
+
+    Args:
+        daily_coeffs_header (pd.DataFrame): bhp_vs_whp.fit_daily_coefficients(..., y="HeaderP") output
+        method (str): Aggregation from aggregate.METHODS
+        min_count (int): Wells with this many kept fits or fewer get the placeholder slope
+
+    Returns:
+        pd.DataFrame: Well, Mean Slope and Mean Intercept, the layout of process_coefficients
+    """
+    wells = pd.Index(daily_coeffs_header["Well"].unique()).sort_values()
+    fits = daily_coeffs_header[daily_coeffs_header["Date"].notna() & (daily_coeffs_header["Slope"] < NO_IMPACT_SLOPE)]
+    result = aggregate.grouped_stats(
+        fits,
+        "Well",
+        ["Slope", "Intercept"],
+        method=method,
+        min_count=min_count,
+        fill={"Slope": NO_IMPACT_SLOPE, "Intercept": 0},
+    )
+    result = result.reindex(wells)
+    result[["Slope", "Intercept"]] = result[["Slope", "Intercept"]].fillna({"Slope": NO_IMPACT_SLOPE, "Intercept": 0})
+    result = result.rename(columns={"Slope": "Mean Slope", "Intercept": "Mean Intercept"})
+    result.index.name = "Well"
+    return result.reset_index()
+
+
+def header_pressure_impact(
+    header_deltas: Union[np.ndarray, Dict[str, np.ndarray], pd.DataFrame],
+    header_coeffs: pd.DataFrame,
+    ipr_params: pd.DataFrame,
+    test_data: pd.DataFrame,
+    scenario: str = "newest",
+    base_bhp: Optional[pd.Series] = None,
+) -> pd.DataFrame:
+    """
+    Oil rate change of every well for every header pressure scenario, computed in one broadcast.
+
+    A header pressure delta moves BHP by delta / slope through the processed BHP vs HeaderP fit
+    (HeaderP = slope * BHP + intercept), the new BHP is run through the well's Vogel IPR and the
+    liquid rate is turned into oil with the average test water cut. Wells the fits found no
+    header impact on carry the 1000000 placeholder slope and see no change, a warning is logged
+    when that is every well.
+
+    Args:
+        header_deltas: Header pressure changes, psi. Either a 1-D array applied to every well,
+                       a (scenarios, wells) array in ipr_params well order, a dict of pad letter
+                       to 1-D array or a DataFrame with one column per well.
+        header_coeffs (pd.DataFrame): header_slopes output for the daily header fits
+        ipr_params (pd.DataFrame): Compact IPR table from ipr.fit_ipr_params
+        test_data (pd.DataFrame): Merged test data, used for each well's average water cut
+        scenario (str): IPR scenario to evaluate
+        base_bhp (pd.Series): Current BHP by well, defaults to the BHP of the test the IPR is anchored on
+
+    Returns:
+        pd.DataFrame: Oil rate change, bopd, with one row per scenario and one column per well,
+                      indexed by the delta when header_deltas is 1-D. NaN for wells missing a
+                      fit or water cut.
+    """
+    params = ipr_params[ipr_params["scenario"] == scenario].set_index("well")
+    wells = params.index
+
+    slope = header_coeffs.set_index("Well")["Mean Slope"].reindex(wells).to_numpy(dtype=float)
+    slope = np.where(slope == 0, np.nan, slope)
+    if len(wells) and not (np.isfinite(slope) & (slope < NO_IMPACT_SLOPE)).any():
+        logger.warning(
+            "No well has a header pressure slope, every impact is 0. Are the coefficients from header_slopes?"
+        )
+    watercut = average_well_tests(test_data.copy()).set_index("well")["WtWaterCut"].reindex(wells).to_numpy()
+    oil_fraction = (100 - watercut) / 100
+
+    qmax = params["qmax"].to_numpy(dtype=float)
+    pres = params["pres"].to_numpy(dtype=float)
+    bhp = params["pwf"] if base_bhp is None else base_bhp.reindex(wells)
+    bhp = bhp.to_numpy(dtype=float)
+
+    deltas = _delta_matrix(header_deltas, wells)
+    new_bhp = bhp[None, :] + deltas / slope[None, :]
+
+    base_oil = vogel_rate(qmax, pres, bhp) * oil_fraction
+    new_oil = vogel_rate(qmax[None, :], pres[None, :], new_bhp) * oil_fraction[None, :]
+
+    impact = pd.DataFrame(new_oil - base_oil[None, :], columns=wells)
+    if np.ndim(header_deltas) == 1 and not isinstance(header_deltas, dict):
+        impact.index = pd.Index(np.asarray(header_deltas, dtype=float), name="header_delta")
+    return impact
+
+
+def impact_by_well(impact: pd.DataFrame) -> pd.DataFrame:
+    """header_pressure_impact output in long format: the delta index, well and oil_change, one row per delta and well."""
+    return impact.rename_axis(columns="well").stack().rename("oil_change").reset_index()
@@ -0,0 +1,159 @@
+import datetime
+import logging
+import os
+import pickle
+from typing import Callable, Dict, Iterable, Optional
+
+import pandas as pd
+
+from process_data import coeffs_process, daily_fit
+from process_data.quantile_sketch import StreamingWellStats
+
+logger = logging.getLogger(__name__)
+
+
+class DailyFitHistory:
+    """
+    Daily coefficients of one kind of fit kept across runs, so a run only fits the days that are new.
+
+    The coefficients CSV holds every kept daily fit so far, in the layout of the pipeline's daily
+    coefficient CSVs, and new fits are appended to it. Next to it a state file keeps the last day
+    fitted per well and the per well running sums of the fits process_coefficients aggregates
+    (coeffs_process.update_coefficient_sketches), so the processed coefficients are updated
+    without reading the history back. A run costs O(new days) instead of O(history).
+
+    Only complete days are fitted: the run's own day is still filling up and is fitted by the next
+    run. Wells with no kept fit are not written to the CSV, the processed coefficients give them
+    the usual placeholder.
+    """
+
+    def __init__(self, coeffs_path: str, state_path: Optional[str] = None):
+        """
+        Args:
+            coeffs_path (str): Daily coefficients CSV, created on the first update
+            state_path (str): State file, defaults to <coeffs_path without .csv>_state.pkl
+        """
+        self.coeffs_path = coeffs_path
+        self.state_path = state_path or f"{os.path.splitext(coeffs_path)[0]}_state.pkl"
+        self.through: Dict[str, datetime.date] = {}
+        self.stats: Optional[StreamingWellStats] = None
+        self.rows = 0
+        self._csv_bytes = 0
+        if os.path.exists(self.state_path):
+            self._load()
+
+    def _load(self) -> None:
+        with open(self.state_path, "rb") as handle:
+            state = pickle.load(handle)
+        self.through = state["through"]
+        self.stats = state["stats"]
+        self.rows = state["rows"]
+        self._csv_bytes = state["csv_bytes"]
+        # an update that stopped between appending the CSV and saving the state is rolled back
+        if os.path.exists(self.coeffs_path) and os.path.getsize(self.coeffs_path) > self._csv_bytes:
+            logger.warning("%s has rows from an unfinished update, truncated", self.coeffs_path)
+            with open(self.coeffs_path, "r+b") as handle:
+                handle.truncate(self._csv_bytes)
+
+    def _save(self) -> None:
+        state = {"through": self.through, "stats": self.stats, "rows": self.rows, "csv_bytes": self._csv_bytes}
+        # write then rename so an interrupted run never leaves a half written state
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "wb") as handle:
+            pickle.dump(state, handle)
+        os.replace(tmp_path, self.state_path)
+
+    def pull_start(self, wells: Iterable[str], start_date: str) -> str:
+        """
+        Start date for a SCADA pull (LocalDate > start) that covers every day the wells still need.
+
+        Args:
+            wells (Iterable[str]): Wells of the run
+            start_date (str): Start of a full pull, used while any well has no history
+
+        Returns:
+            str: YYYY-MM-DD
+        """
+        start = pd.Timestamp(start_date).date()
+        through = [self.through.get(well) for well in wells]
+        if not through or any(day is None for day in through):
+            return start.isoformat()
+        return max(start, min(through)).isoformat()
+
+    def new_days(
+        self, well_dfs: Dict[str, pd.DataFrame], until: Optional[datetime.date] = None
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Rows of each well on days after its last fitted day and before until.
+
+        Args:
+            well_dfs (Dict[str, pd.DataFrame]): Hourly data per well with a datetime index
+            until (datetime.date): First day not fitted yet, defaults to today
+
+        Returns:
+            Dict[str, pd.DataFrame]: Wells with new complete days
+        """
+        until = pd.Timestamp(until or datetime.date.today())
+        new = {}
+        for well, df in well_dfs.items():
+            days = df.index.normalize()
+            keep = days < until
+            if well in self.through:
+                keep &= days > pd.Timestamp(self.through[well])
+            if keep.any():
+                new[well] = df[keep]
+        return new
+
+    def update(
+        self,
+        well_dfs: Dict[str, pd.DataFrame],
+        fit: Callable[[Dict[str, pd.DataFrame]], pd.DataFrame],
+        until: Optional[datetime.date] = None,
+    ) -> pd.DataFrame:
+        """
+        Fit the new days, append the kept fits to the CSV and fold them into the running sums.
+
+        Args:
+            well_dfs (Dict[str, pd.DataFrame]): Hourly data per well, only the new days are used
+            fit (Callable): Daily fit returning Well, Date, Slope and Intercept, e.g.
+                            functools.partial(bhp_vs_whp.fit_daily_coefficients, y="WHP")
+            until (datetime.date): First day not fitted yet, defaults to today
+
+        Returns:
+            pd.DataFrame: The fits added by this update
+        """
+        new = self.new_days(well_dfs, until)
+        if not new:
+            logger.info("%s: no new days to fit", self.coeffs_path)
+            return pd.DataFrame(columns=daily_fit.COEFF_COLUMNS)
+
+        fits = fit(new)
+        # placeholder rows only register the well in the running sums
+        self.stats = coeffs_process.update_coefficient_sketches(fits, self.stats)
+        added = fits[fits["Date"].notna()]
+        if not added.empty:
+            added = added.set_axis(pd.RangeIndex(self.rows, self.rows + len(added)))
+            # the first update replaces the CSV of a full run, later ones append
+            added.to_csv(self.coeffs_path, mode="a" if self.rows else "w", header=self.rows == 0)
+            self.rows += len(added)
+        self._csv_bytes = os.path.getsize(self.coeffs_path) if os.path.exists(self.coeffs_path) else 0
+
+        for well, df in new.items():
+            self.through[well] = df.index.normalize().max().date()
+        self._save()
+        logger.info("%s: %d new daily fits from %d wells", self.coeffs_path, len(added), len(new))
+        return added
+
+    def processed(self, method: str = "mean") -> pd.DataFrame:
+        """process_coefficients output over the whole history, from the running sums."""
+        if self.stats is None:
+            return pd.DataFrame(columns=["Well", "Mean Slope", "Mean Intercept"])
+        return coeffs_process.process_coefficient_sketches(self.stats, method)
+
+    def coefficients(self) -> pd.DataFrame:
+        """Every stored daily fit, read back from the CSV."""
+        if self.rows == 0:
+            return pd.DataFrame(columns=daily_fit.COEFF_COLUMNS)
+        coeffs = pd.read_csv(self.coeffs_path, index_col=0)
+        coeffs["Date"] = pd.to_datetime(coeffs["Date"]).dt.date
+        return coeffs
@@ -0,0 +1,222 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from process_data import profiling
+
+logger = logging.getLogger(__name__)
+
+REPORT_COLUMNS = ["stage", "status", "wall_s", "cpu_s", "rows_in", "rows_out", "peak_mb", "depth"]
+
+
+def count_rows(value) -> Optional[int]:
+    """Rows in a frame or array, summed over the values of a dict or list of them. None if not countable."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if hasattr(value, "shape") and getattr(value, "ndim", 0):
+        return int(value.shape[0])
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        counts = [count_rows(item) for item in value]
+        counts = [count for count in counts if count is not None]
+        return sum(counts) if counts else None
+    return None
+
+
+class RunReport:
+    """Timing, row counts and memory peaks of the stages of one run."""
+
+    def __init__(self, report_dir: str, memory: bool = True):
+        self.report_dir = report_dir
+        self.memory = memory
+        self.records: List[Dict] = []
+        # peak memory of each open stage, carried over when a nested stage resets the tracemalloc peak
+        self._peaks: List[int] = []
+        self._started_tracemalloc = False
+
+    def start(self) -> None:
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def stop(self) -> None:
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+    def _enter(self) -> None:
+        if tracemalloc.is_tracing():
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._peaks.append(0)
+
+    def _exit(self) -> Optional[float]:
+        if not tracemalloc.is_tracing() or not self._peaks:
+            return None
+        peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+        if self._peaks:
+            # the enclosing stage saw at least this much
+            self._peaks[-1] = max(self._peaks[-1], peak)
+        return peak / 1e6
+
+    def add(self, record: Dict) -> None:
+        self.records.append(record)
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.records, columns=REPORT_COLUMNS)
+
+    def write(self) -> str:
+        """Write run_report.json and run_report.csv to report_dir and return the JSON path."""
+        os.makedirs(self.report_dir, exist_ok=True)
+        json_path = os.path.join(self.report_dir, "run_report.json")
+        with open(json_path, "w") as handle:
+            json.dump(self.records, handle, indent=1)
+        self.to_frame().to_csv(os.path.join(self.report_dir, "run_report.csv"), index=False)
+        return json_path
+
+
+_report: Optional[RunReport] = None
+_report_thread: Optional[int] = None
+_depth = 0
+
+
+@contextmanager
+def run(report_dir: str = "results", memory: bool = True):
+    """
+    Collect stage metrics for the duration of a run and write the report at the end.
+
+    Stages outside a run are not recorded, so the instrumented functions cost nothing when
+    called on their own.
+
+    Args:
+        report_dir (str): Folder for run_report.json and run_report.csv
+        memory (bool): Track the tracemalloc peak of each stage, slows allocation heavy code down
+
+    Yields:
+        RunReport: The report being collected
+    """
+    global _report, _report_thread
+    previous = _report, _report_thread
+    _report = RunReport(report_dir, memory)
+    _report_thread = threading.get_ident()
+    _report.start()
+    try:
+        yield _report
+    finally:
+        report = _report
+        _report, _report_thread = previous
+        report.stop()
+        logger.info("run report written to %s", report.write())
+
+
+@contextmanager
+def stage(name: str, inputs=None):
+    """
+    Record wall time, CPU time, rows and peak memory of a block of work.
+
+    Set the rows_out key of the yielded dict to record output rows, e.g. stats["rows_out"] = len(df).
+    Stages selected in process_data.profiling are profiled as well, also outside a run. Only stages
+    on the thread that started the run are recorded, the nesting depth and memory peaks of stages
+    running side by side on other threads would be mixed up.
+
+    Args:
+        name (str): Stage name in the report
+        inputs: Stage inputs, used for rows_in
+    """
+    global _depth
+    stats = {"rows_out": None}
+    if _report is None or threading.get_ident() != _report_thread:
+        with profiling.profile(name):
+            yield stats
+        return
+
+    record = {"stage": name, "status": "ran", "rows_in": count_rows(inputs), "depth": _depth}
+    _report._enter()
+    _depth += 1
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        with profiling.profile(name):
+            yield stats
+    except Exception:
+        record["status"] = "failed"
+        raise
+    finally:
+        record["wall_s"] = time.perf_counter() - wall
+        record["cpu_s"] = time.process_time() - cpu
+        record["peak_mb"] = _report._exit()
+        record["rows_out"] = stats["rows_out"]
+        _depth -= 1
+        _report.add(record)
+        logger.debug("%s took %.2f s", name, record["wall_s"])
+
+
+def skipped(name: str) -> None:
+    """Record a stage that did not run, e.g. because its cached result was reused."""
+    if _report is not None:
+        _report.add({"stage": name, "status": "cached", "depth": _depth})
+
+
+def instrumented(name: Optional[str] = None) -> Callable:
+    """
+    Decorator recording a function as a stage, rows_in from its arguments and rows_out from its result.
+
+    Args:
+        name (str): Stage name, defaults to module.function
+    """
+
+    def decorator(func: Callable) -> Callable:
+        stage_name = name or f"{func.__module__.split('.')[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _report is None and not profiling.selected(stage_name):
+                return func(*args, **kwargs)
+            with stage(stage_name, inputs=[*args, *kwargs.values()]) as stats:
+                result = func(*args, **kwargs)
+                stats["rows_out"] = count_rows(result)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per log line, for log collectors."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def configure_logging(level: int = logging.INFO, json_format: Optional[bool] = None) -> None:
+    """
+    Send log messages to the console, as plain messages like the old prints or as JSON lines.
+
+    Args:
+        level (int): Logging level
+        json_format (bool): JSON lines, defaults to the HPI_LOG_JSON environment variable
+    """
+    if json_format is None:
+        json_format = os.environ.get("HPI_LOG_JSON", "") not in ("", "0")
+    handler = logging.StreamHandler()
+    handler.setFormatter(JSONFormatter() if json_format else logging.Formatter("%(message)s"))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
@@ -0,0 +1,276 @@
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from process_data.instrument import instrumented
+
+# the three well test points each IPR is anchored on
+SCENARIOS = ("newest", "lowest", "median")
+
+IPR_COLUMNS = ["well", "scenario", "qtest", "pwf", "pres", "qmax"]
+
+
+def vogel_qmax(qtest, pwf, pres):
+    """
+    Vogel max flow of a well from a single test point. Works on scalars or arrays.
+
+    Args:
+        qtest: Tested fluid rate at pwf, bpd
+        pwf: Flowing bottomhole pressure during the test, psi
+        pres: Reservoir pressure, psi
+
+    Returns:
+        Vogel max theoretical fluid rate, bpd
+    """
+    ratio = np.asarray(pwf, dtype=float) / np.asarray(pres, dtype=float)
+    return np.asarray(qtest, dtype=float) / (1 - 0.2 * ratio - 0.8 * ratio**2)
+
+
+def vogel_rate(qmax, pres, bhp):
+    """
+    Fluid rate at a bottomhole pressure on a Vogel curve. Works on scalars or arrays,
+    which are broadcast against each other.
+
+    BHP is clipped to [0, pres], so pressures above reservoir pressure return zero rate.
+
+    Args:
+        qmax: Vogel max fluid rate, bpd
+        pres: Reservoir pressure, psi
+        bhp: Flowing bottomhole pressure, psi
+
+    Returns:
+        Fluid rate at bhp, bpd
+    """
+    pres = np.asarray(pres, dtype=float)
+    ratio = np.clip(np.asarray(bhp, dtype=float), 0, pres) / pres
+    return np.asarray(qmax, dtype=float) * (1 - 0.2 * ratio - 0.8 * ratio**2)
+
+
+def vogel_bhp(qmax, pres, rate):
+    """
+    Closed form inverse of vogel_rate: the bottomhole pressure a well flows the given
+    rate at. Works on scalars or arrays, which are broadcast against each other.
+
+    Rate is clipped to [0, qmax], so rates above qmax return zero BHP.
+
+    Args:
+        qmax: Vogel max fluid rate, bpd
+        pres: Reservoir pressure, psi
+        rate: Fluid rate, bpd
+
+    Returns:
+        Flowing bottomhole pressure, psi
+    """
+    qmax = np.asarray(qmax, dtype=float)
+    fraction = np.clip(np.asarray(rate, dtype=float), 0, qmax) / qmax
+    # 0.8 x^2 + 0.2 x - (1 - q/qmax) = 0, positive root
+    ratio = (-0.2 + np.sqrt(0.04 + 3.2 * (1 - fraction))) / 1.6
+    return np.asarray(pres, dtype=float) * ratio
+
+
+def select_test_points(well_data: pd.DataFrame) -> dict:
+    """
+    Pick the well test each IPR scenario is anchored on.
+
+    newest is the most recent test, lowest is the test with the lowest BHP and median
+    is the test whose BHP is closest to the median BHP.
+
+    Args:
+        well_data (pd.DataFrame): Tests for a single well with 'WtTotalFluid', 'BHP' and 'days_since'
+
+    Returns:
+        dict: scenario name -> (fluid rate, bhp) of the anchoring test
+    """
+    newest = well_data.sort_values(by="days_since")
+    lowest = newest.sort_values(by="BHP")
+
+    median_bhp = lowest["BHP"].median()
+    median_row = lowest.iloc[(lowest["BHP"] - median_bhp).abs().argsort()[:1]]
+
+    return {
+        "newest": (newest["WtTotalFluid"].iloc[0], newest["BHP"].iloc[0]),
+        "lowest": (lowest["WtTotalFluid"].iloc[0], lowest["BHP"].iloc[0]),
+        "median": (median_row["WtTotalFluid"].values[0], median_row["BHP"].values[0]),
+    }
+
+
+@instrumented()
+def fit_ipr_params(RP_guess: pd.DataFrame, resp_modifier: float) -> pd.DataFrame:
+    """
+    Build the compact IPR table: one Vogel curve per well and scenario, stored as
+    its parameters instead of sampled points.
+
+    Args:
+        RP_guess (pd.DataFrame): Merged test data with the 'Optimal_RP' column from calc_optimal_RP
+        resp_modifier (float): psi added to the optimal reservoir pressure
+
+    Returns:
+        pd.DataFrame: Columns well, scenario, qtest, pwf, pres, qmax
+    """
+    df = RP_guess.copy()
+    df["days_since"] = (pd.to_datetime("today") - pd.to_datetime(df["WtDate"])).dt.days
+    df = df.dropna(subset=["BHP", "WtTotalFluid", "Optimal_RP"])
+
+    rows = []
+    for well, well_data in df.groupby("well", sort=True):
+        pres = well_data["Optimal_RP"].iloc[0] + resp_modifier
+        for scenario, (qtest, pwf) in select_test_points(well_data).items():
+            rows.append({"well": well, "scenario": scenario, "qtest": qtest, "pwf": pwf, "pres": pres})
+
+    ipr_params = pd.DataFrame(rows, columns=IPR_COLUMNS[:-1])
+    ipr_params["qmax"] = vogel_qmax(ipr_params["qtest"], ipr_params["pwf"], ipr_params["pres"])
+    return ipr_params
+
+
+def evaluate_ipr(ipr_params: pd.DataFrame, well: str, bhp, scenario: str = "newest"):
+    """
+    Evaluate one well's IPR at any bottomhole pressure.
+
+    Args:
+        ipr_params (pd.DataFrame): Compact IPR table from fit_ipr_params
+        well (str): Well name
+        bhp: Bottomhole pressure(s), psi
+        scenario (str): One of SCENARIOS
+
+    Returns:
+        Fluid rate(s) at bhp, bpd. NaN if the well has no IPR.
+    """
+    row = ipr_params[(ipr_params["well"] == well) & (ipr_params["scenario"] == scenario)]
+    if row.empty:
+        return np.full(np.shape(bhp), np.nan)
+    return vogel_rate(row["qmax"].iloc[0], row["pres"].iloc[0], bhp)
+
+
+def ipr_matrix(ipr_params: pd.DataFrame, bhp_grid, scenario: str = "newest") -> pd.DataFrame:
+    """
+    Dense well x BHP view of the IPRs for bulk interpolation.
+
+    Args:
+        ipr_params (pd.DataFrame): Compact IPR table from fit_ipr_params
+        bhp_grid: 1-D array of bottomhole pressures, psi
+        scenario (str): One of SCENARIOS
+
+    Returns:
+        pd.DataFrame: float32 fluid rates indexed by well with one column per grid BHP
+    """
+    params = ipr_params[ipr_params["scenario"] == scenario]
+    bhp_grid = np.asarray(bhp_grid, dtype=float)
+    rates = vogel_rate(
+        params["qmax"].to_numpy()[:, None], params["pres"].to_numpy()[:, None], bhp_grid[None, :]
+    ).astype(np.float32)
+    return pd.DataFrame(rates, index=pd.Index(params["well"], name="well"), columns=bhp_grid)
+
+
+class VogelLookup:
+    """
+    Exact, vectorized rate-at-BHP and BHP-at-rate lookups for every well and scenario
+    in a compact IPR table.
+    """
+
+    def __init__(self, ipr_params: pd.DataFrame):
+        qmax = ipr_params.pivot(index="well", columns="scenario", values="qmax")
+        pres = ipr_params.pivot(index="well", columns="scenario", values="pres")
+
+        self.wells = qmax.index
+        self.scenarios = [scenario for scenario in SCENARIOS if scenario in qmax.columns]
+        self.qmax = qmax[self.scenarios].to_numpy(dtype=float)
+        self.pres = pres[self.scenarios].to_numpy(dtype=float)
+
+    def _params(self, wells, scenario: str):
+        well_idx = self.wells.get_indexer(np.atleast_1d(np.asarray(wells)))
+        scenario_idx = self.scenarios.index(scenario)
+        qmax = np.where(well_idx >= 0, self.qmax[well_idx, scenario_idx], np.nan)
+        pres = np.where(well_idx >= 0, self.pres[well_idx, scenario_idx], np.nan)
+        return qmax, pres
+
+    def rate_at(self, wells, bhp, scenario: str = "newest") -> np.ndarray:
+        """
+        Fluid rate for each (well, bhp) pair. Unknown wells return NaN.
+
+        Args:
+            wells: Well name or array of well names
+            bhp: Bottomhole pressure(s), psi, broadcast against wells
+            scenario (str): One of SCENARIOS
+
+        Returns:
+            np.ndarray: Fluid rates, bpd
+        """
+        qmax, pres = self._params(wells, scenario)
+        return vogel_rate(qmax, pres, bhp)
+
+    def bhp_at(self, wells, rate, scenario: str = "newest") -> np.ndarray:
+        """
+        Bottomhole pressure for each (well, rate) pair. Unknown wells return NaN.
+
+        Args:
+            wells: Well name or array of well names
+            rate: Fluid rate(s), bpd, broadcast against wells
+            scenario (str): One of SCENARIOS
+
+        Returns:
+            np.ndarray: Bottomhole pressures, psi
+        """
+        qmax, pres = self._params(wells, scenario)
+        return vogel_bhp(qmax, pres, rate)
+
+    def rate_table(self, wells, bhp) -> np.ndarray:
+        """
+        Fluid rate for each (well, bhp) pair under every scenario at once.
+
+        Args:
+            wells: Array of well names
+            bhp: Array of bottomhole pressures, psi, same length as wells
+
+        Returns:
+            np.ndarray: (len(wells), len(scenarios)) fluid rates, bpd
+        """
+        well_idx = self.wells.get_indexer(np.asarray(wells))
+        known = (well_idx >= 0)[:, None]
+        qmax = np.where(known, self.qmax[well_idx], np.nan)
+        pres = np.where(known, self.pres[well_idx], np.nan)
+        return vogel_rate(qmax, pres, np.asarray(bhp, dtype=float)[:, None])
+
+
+def expand_ipr_table(ipr_params: pd.DataFrame, step: int = 10) -> pd.DataFrame:
+    """
+    Sample the compact IPRs into the legacy long table (one row per well every `step` psi
+    from 0 to reservoir pressure) for consumers that still expect ipr_data.csv.
+
+    Args:
+        ipr_params (pd.DataFrame): Compact IPR table from fit_ipr_params
+        step (int): psi between samples
+
+    Returns:
+        pd.DataFrame: Columns well, BHP, Fluid_newest, Fluid_lowest, Fluid_median
+    """
+    wide = ipr_params.pivot(index="well", columns="scenario", values="qmax")
+    pres = ipr_params.groupby("well")["pres"].first()
+
+    frames = []
+    for well, qmax in wide.iterrows():
+        bhp = np.arange(0, int(pres[well]), step)
+        frame = pd.DataFrame({"well": well, "BHP": bhp})
+        for scenario in SCENARIOS:
+            frame[f"Fluid_{scenario}"] = vogel_rate(qmax.get(scenario, np.nan), pres[well], bhp)
+        frames.append(frame)
+
+    if not frames:
+        return pd.DataFrame(columns=["well", "BHP"] + [f"Fluid_{scenario}" for scenario in SCENARIOS])
+    return pd.concat(frames, ignore_index=True)
+
+
+def ipr_curve(qmax: float, pres: float, step: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sample a Vogel curve for plotting.
+
+    Args:
+        qmax (float): Vogel max fluid rate, bpd
+        pres (float): Reservoir pressure, psi
+        step (int): psi between samples
+
+    Returns:
+        Tuple of (fluid rates, bhps)
+    """
+    bhp = np.arange(0, int(pres), step)
+    return vogel_rate(qmax, pres, bhp), bhp
@@ -0,0 +1,33 @@
+import importlib
+from types import ModuleType
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    Lets a module keep its usual top level alias, e.g. plt = lazy.module("matplotlib.pyplot"),
+    while runs that never plot do not pay for importing matplotlib. A missing optional dependency
+    only raises when the code that needs it runs.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def load(self) -> ModuleType:
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def module(name: str) -> LazyModule:
+    """Module name, imported when one of its attributes is first used."""
+    return LazyModule(name)
@@ -0,0 +1,190 @@
+import json
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from process_data.ipr import SCENARIOS
+
+# quantity axis of the dense array and the lookup table columns each one is read from
+QUANTITIES = ("bhp", "liquid", "oil")
+TABLE_COLUMNS = {
+    "bhp": lambda scenario: "bhp",
+    "liquid": lambda scenario: f"Fluid_{scenario}_interpolated",
+    "oil": lambda scenario: f"Oil_{scenario}_ipr",
+}
+
+
+class PFLookupEngine:
+    """
+    In-memory power fluid lookup tables backed by one dense float32 array of shape
+    (quantity, well, pf_pres, scenario), queried with linear interpolation along the
+    uniform power fluid pressure grid.
+    """
+
+    def __init__(self, values: np.ndarray, wells, pf_min: float, pf_step: float, scenarios=SCENARIOS):
+        self.values = values
+        self.wells = pd.Index(wells)
+        self.pf_min = float(pf_min)
+        self.pf_step = float(pf_step)
+        self.scenarios = list(scenarios)
+        self._well_pos = {well: i for i, well in enumerate(self.wells)}
+
+    @property
+    def pf_grid(self) -> np.ndarray:
+        return self.pf_min + self.pf_step * np.arange(self.values.shape[2])
+
+    @classmethod
+    def from_lookup_table(cls, lookup_table: pd.DataFrame) -> "PFLookupEngine":
+        """
+        Build the engine from bhp_lookup output after assign_liquid_rate and, optionally, calc_oil_rate.
+
+        Args:
+            lookup_table (pd.DataFrame): Long table with Well, pf_pres, bhp and the Fluid_*_interpolated
+                                         and Oil_*_ipr columns. Missing quantities are stored as NaN.
+
+        Returns:
+            PFLookupEngine: Engine over the table's wells and power fluid pressure grid
+
+        Raises:
+            ValueError: If the power fluid pressures are not a uniform grid.
+        """
+        pf_grid = np.sort(lookup_table["pf_pres"].unique()).astype(float)
+        steps = np.diff(pf_grid)
+        if len(pf_grid) > 1 and not np.allclose(steps, steps[0]):
+            raise ValueError("pf_pres values must form a uniform grid")
+        pf_step = steps[0] if len(pf_grid) > 1 else 1.0
+
+        wells = pd.Index(lookup_table["Well"].unique())
+        values = np.full((len(QUANTITIES), len(wells), len(pf_grid), len(SCENARIOS)), np.nan, dtype=np.float32)
+
+        well_idx = wells.get_indexer(lookup_table["Well"])
+        pf_idx = np.rint((lookup_table["pf_pres"].to_numpy(dtype=float) - pf_grid[0]) / pf_step).astype(int)
+
+        for q, quantity in enumerate(QUANTITIES):
+            for s, scenario in enumerate(SCENARIOS):
+                column = TABLE_COLUMNS[quantity](scenario)
+                if column in lookup_table.columns:
+                    values[q, well_idx, pf_idx, s] = lookup_table[column].to_numpy(dtype=np.float32)
+
+        return cls(values, wells, pf_grid[0], pf_step)
+
+    def save(self, path) -> None:
+        """
+        Write the dense array to `<path>.npy` and its well/grid metadata to `<path>.json`.
+
+        Args:
+            path (str or Path): Output path without suffix
+        """
+        path = Path(path)
+        np.save(path.with_suffix(".npy"), np.ascontiguousarray(self.values))
+        meta = {
+            "wells": list(self.wells),
+            "pf_min": self.pf_min,
+            "pf_step": self.pf_step,
+            "scenarios": self.scenarios,
+            "quantities": list(QUANTITIES),
+        }
+        path.with_suffix(".json").write_text(json.dumps(meta, indent=2))
+
+    @classmethod
+    def load(cls, path, mmap: bool = True) -> "PFLookupEngine":
+        """
+        Load an engine written by save, memory-mapping the array by default.
+
+        Args:
+            path (str or Path): Path given to save, without suffix
+            mmap (bool): Memory-map the array read-only instead of reading it into memory
+
+        Returns:
+            PFLookupEngine
+        """
+        path = Path(path)
+        meta = json.loads(path.with_suffix(".json").read_text())
+        values = np.load(path.with_suffix(".npy"), mmap_mode="r" if mmap else None)
+        return cls(values, meta["wells"], meta["pf_min"], meta["pf_step"], meta["scenarios"])
+
+    def _interp(self, quantity: str, wells, pf_pres, scenario: str) -> np.ndarray:
+        q = QUANTITIES.index(quantity)
+        s = self.scenarios.index(scenario)
+        num_pf = self.values.shape[2]
+
+        if isinstance(wells, str):
+            # single well queries skip the pandas indexer, which dominates their cost
+            well_idx = np.array([self._well_pos.get(wells, -1)])
+        else:
+            wells = np.atleast_1d(np.asarray(wells))
+            well_idx = self.wells.get_indexer(wells.ravel()).reshape(wells.shape)
+        well_idx, pf_pres = np.broadcast_arrays(well_idx, np.asarray(pf_pres, dtype=float))
+        known = well_idx >= 0
+        safe_idx = np.where(known, well_idx, 0)
+
+        # position on the uniform grid, clamped to its ends
+        pos = np.clip((pf_pres - self.pf_min) / self.pf_step, 0, num_pf - 1)
+        lower = np.minimum(np.floor(pos).astype(int), max(num_pf - 2, 0))
+        upper = np.minimum(lower + 1, num_pf - 1)
+        frac = pos - lower
+
+        grid = self.values[q, :, :, s]
+        result = grid[safe_idx, lower] * (1 - frac) + grid[safe_idx, upper] * frac
+        return np.where(known, result, np.nan)
+
+    def bhp_at(self, wells, pf_pres, scenario: str = "newest") -> np.ndarray:
+        """
+        Expected bottomhole pressure, psi, for each well at each power fluid pressure.
+
+        Args:
+            wells: Well name or array of well names, broadcast against pf_pres
+            pf_pres: Power fluid pressure(s), psi
+            scenario (str): One of SCENARIOS. BHP is the same for every scenario.
+
+        Returns:
+            np.ndarray: NaN for unknown wells
+        """
+        return self._interp("bhp", wells, pf_pres, scenario)
+
+    def liquid_at(self, wells, pf_pres, scenario: str = "newest") -> np.ndarray:
+        """
+        Expected liquid rate, bpd, for each well at each power fluid pressure.
+
+        Args:
+            wells: Well name or array of well names, broadcast against pf_pres
+            pf_pres: Power fluid pressure(s), psi
+            scenario (str): One of SCENARIOS
+
+        Returns:
+            np.ndarray: NaN for unknown wells
+        """
+        return self._interp("liquid", wells, pf_pres, scenario)
+
+    def oil_at(self, wells, pf_pres, scenario: str = "newest") -> np.ndarray:
+        """
+        Expected oil rate, bopd, for each well at each power fluid pressure.
+
+        Args:
+            wells: Well name or array of well names, broadcast against pf_pres
+            pf_pres: Power fluid pressure(s), psi
+            scenario (str): One of SCENARIOS
+
+        Returns:
+            np.ndarray: NaN for unknown wells
+        """
+        return self._interp("oil", wells, pf_pres, scenario)
+
+    def pad_total_oil_at(self, pf_pres, scenario: str = "newest", wells: Optional[list] = None) -> np.ndarray:
+        """
+        Summed oil rate, bopd, across the pad with every jet pump at the same power fluid pressure.
+
+        Args:
+            pf_pres: Power fluid pressure(s), psi
+            scenario (str): One of SCENARIOS
+            wells (list): Wells to sum over, defaults to every well in the engine
+
+        Returns:
+            np.ndarray: One total per power fluid pressure
+        """
+        wells = self.wells if wells is None else pd.Index(wells)
+        pf_pres = np.atleast_1d(np.asarray(pf_pres, dtype=float))
+        oil = self.oil_at(np.asarray(wells)[:, None], pf_pres[None, :], scenario)
+        return np.nansum(oil, axis=0)
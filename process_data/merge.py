@@ -2,7 +2,10 @@ from typing import Dict, List
 
 import pandas as pd
 
+from process_data.instrument import instrumented
 
+
+@instrumented()
 def merge_data(well_list: List[str], raw_tag_data: Dict[str, pd.DataFrame], well_tests: pd.DataFrame) -> pd.DataFrame:
     """
     Merges well test data with corresponding tag data for each well in the provided list.
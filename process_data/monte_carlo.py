@@ -0,0 +1,290 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from process_data.header_scenario import NO_IMPACT_SLOPE
+from process_data.ipr import vogel_qmax, vogel_rate
+
+
+def _ragged(groups: Dict[str, np.ndarray], wells: pd.Index) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Flatten per well sample arrays into values plus per well offsets and counts."""
+    arrays = [np.asarray(groups.get(well, []), dtype=float) for well in wells]
+    counts = np.array([len(array) for array in arrays], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+    values = np.concatenate(arrays) if counts.sum() else np.zeros(1)
+    return values, offsets, counts
+
+
+def _bootstrap(rng, offsets, counts, num_draws) -> np.ndarray:
+    """Indices of num_draws samples with replacement from every well's slice of a ragged array."""
+    picks = np.floor(rng.random((num_draws, len(counts))) * counts).astype(np.int64)
+    return offsets + picks
+
+
+def _take(values, index, counts) -> np.ndarray:
+    """Gather bootstrapped values, NaN for wells without any samples."""
+    return np.where(counts > 0, values[np.minimum(index, len(values) - 1)], np.nan)
+
+
+def _simulate_batch(inputs: Dict[str, np.ndarray], target: Tuple[str, float], pres_sd: float, rng) -> None:
+    num_draws = inputs["out"].shape[0]
+    coeff_counts = inputs["coeff_counts"]
+    wc_counts = inputs["wc_counts"]
+
+    # slope and intercept are drawn together from the same day's fit
+    day = _bootstrap(rng, inputs["coeff_offsets"], coeff_counts, num_draws)
+    slope = _take(inputs["slopes"], day, coeff_counts)
+    intercept = _take(inputs["intercepts"], day, coeff_counts)
+    watercut = _take(inputs["watercuts"], _bootstrap(rng, inputs["wc_offsets"], wc_counts, num_draws), wc_counts)
+
+    pwf = inputs["pwf"][None, :]
+    pres = inputs["pres"][None, :] + rng.normal(0, pres_sd, (num_draws, pwf.shape[1]))
+    pres = np.maximum(pres, pwf + 1)
+    qmax = vogel_qmax(inputs["qtest"][None, :], pwf, pres)
+
+    oil_fraction = (100 - watercut) / 100
+    kind, value = target
+    if kind == "pf":
+        # oil at a power fluid pressure, BHP = slope * PF_Pres + intercept
+        inputs["out"][:] = vogel_rate(qmax, pres, slope * value + intercept) * oil_fraction
+    else:
+        # oil change for a header pressure change, HeaderP = slope * BHP + intercept as in header_pressure_impact
+        new_bhp = pwf + value / slope
+        inputs["out"][:] = (vogel_rate(qmax, pres, new_bhp) - vogel_rate(qmax, pres, pwf)) * oil_fraction
+
+
+def _run_shared_batch(spec: dict, start: int, stop: int, target: Tuple[str, float], pres_sd: float, seed) -> None:
+    """Process pool entry point: attach to the shared inputs and write draws start:stop of the output."""
+    blocks = {name: shared_memory.SharedMemory(name=shm_name) for name, (shm_name, _, _) in spec.items()}
+    try:
+        inputs = {
+            name: np.ndarray(shape, dtype=dtype, buffer=blocks[name].buf) for name, (_, shape, dtype) in spec.items()
+        }
+        inputs["out"] = inputs["out"][start:stop]
+        _simulate_batch(inputs, target, pres_sd, np.random.default_rng(seed))
+        del inputs
+    finally:
+        for block in blocks.values():
+            block.close()
+
+
+def simulate_pf_oil(
+    daily_pf_coeffs: pd.DataFrame,
+    ipr_params: pd.DataFrame,
+    test_data: pd.DataFrame,
+    pf_pres: float,
+    num_draws: int = 100_000,
+    pres_sd: float = 100.0,
+    scenario: str = "newest",
+    batch_size: int = 25_000,
+    processes: Optional[int] = None,
+    seed: Optional[int] = None,
+    return_draws: bool = False,
+):
+    """
+    Monte Carlo estimate of each well's and the pad's oil rate at a power fluid pressure.
+
+    Each draw samples a day's BHP vs PF fit (slope and intercept together) from the daily
+    coefficients, a reservoir pressure around the optimal RP + resp_modifier in ipr_params and a
+    water cut from the well's tests. The IPR is re-anchored on the scenario's test point with the
+    sampled reservoir pressure, so the draws carry the spread of all three inputs into oil.
+
+    Draws run in batches on a process pool with the inputs and output in shared memory.
+
+    Percentiles follow the reserves convention: P90 is the low case exceeded by 90% of draws,
+    P10 the high case exceeded by 10%.
+
+    Args:
+        daily_pf_coeffs (pd.DataFrame): bhp_pf.plot_grid_BHP_PF_Pres_DailyFit output, one fit per well and day
+        ipr_params (pd.DataFrame): Compact IPR table from ipr.fit_ipr_params
+        test_data (pd.DataFrame): Merged test data with 'well' and 'WtWaterCut'
+        pf_pres (float): Power fluid pressure to evaluate, psi
+        num_draws (int): Number of draws
+        pres_sd (float): Standard deviation of the reservoir pressure guess, psi
+        scenario (str): IPR scenario whose test point anchors the curve
+        batch_size (int): Draws per batch
+        processes (int): Worker processes, defaults to the CPU count. 1 runs in this process.
+        seed (int): Seed for reproducible draws
+        return_draws (bool): Also return the (draws, wells) oil array
+
+    Returns:
+        pd.DataFrame: P90, P50, P10 and mean oil rate, bopd, for each well and a 'Pad' total row.
+                      With return_draws, a tuple of that frame and the draws.
+    """
+    coeffs = daily_pf_coeffs.dropna(subset=["Slope", "Intercept"])
+    # same filter coeffs_process applies before averaging
+    coeffs = coeffs[coeffs["Slope"] < 0.9]
+    return _simulate(
+        coeffs,
+        ipr_params,
+        test_data,
+        ("pf", pf_pres),
+        num_draws,
+        pres_sd,
+        scenario,
+        batch_size,
+        processes,
+        seed,
+        return_draws,
+    )
+
+
+def simulate_header_impact(
+    daily_coeffs_header: pd.DataFrame,
+    ipr_params: pd.DataFrame,
+    test_data: pd.DataFrame,
+    header_delta: float,
+    num_draws: int = 100_000,
+    pres_sd: float = 100.0,
+    scenario: str = "newest",
+    batch_size: int = 25_000,
+    processes: Optional[int] = None,
+    seed: Optional[int] = None,
+    min_count: int = 3,
+    return_draws: bool = False,
+):
+    """
+    Monte Carlo estimate of each well's and the pad's oil rate change for a header pressure change,
+    the spread around header_scenario.header_pressure_impact.
+
+    Each draw samples one of the daily BHP vs HeaderP fits header_slopes aggregates, a reservoir
+    pressure and a water cut as in simulate_pf_oil, and moves BHP from the test point by
+    header_delta / slope. Wells with min_count kept fits or fewer, which header_slopes gives the
+    no impact placeholder, are left out.
+
+    Args:
+        daily_coeffs_header (pd.DataFrame): bhp_vs_whp.fit_daily_coefficients(..., y="HeaderP") output
+        ipr_params (pd.DataFrame): Compact IPR table from ipr.fit_ipr_params
+        test_data (pd.DataFrame): Merged test data with 'well' and 'WtWaterCut'
+        header_delta (float): Header pressure change, psi
+        num_draws (int): Number of draws
+        pres_sd (float): Standard deviation of the reservoir pressure guess, psi
+        scenario (str): IPR scenario whose test point anchors the curve
+        batch_size (int): Draws per batch
+        processes (int): Worker processes, defaults to the CPU count. 1 runs in this process.
+        seed (int): Seed for reproducible draws
+        min_count (int): Fewest kept fits a well needs, as in header_slopes
+        return_draws (bool): Also return the (draws, wells) oil change array
+
+    Returns:
+        pd.DataFrame: P90, P50, P10 and mean oil rate change, bopd, for each well and a 'Pad' total row.
+                      With return_draws, a tuple of that frame and the draws.
+    """
+    coeffs = daily_coeffs_header[daily_coeffs_header["Date"].notna() & (daily_coeffs_header["Slope"] < NO_IMPACT_SLOPE)]
+    coeffs = coeffs.dropna(subset=["Slope", "Intercept"])
+    coeffs = coeffs[coeffs.groupby("Well")["Slope"].transform("size") > min_count]
+    return _simulate(
+        coeffs,
+        ipr_params,
+        test_data,
+        ("header", header_delta),
+        num_draws,
+        pres_sd,
+        scenario,
+        batch_size,
+        processes,
+        seed,
+        return_draws,
+    )
+
+
+def _simulate(
+    coeffs: pd.DataFrame,
+    ipr_params: pd.DataFrame,
+    test_data: pd.DataFrame,
+    target: Tuple[str, float],
+    num_draws: int,
+    pres_sd: float,
+    scenario: str,
+    batch_size: int,
+    processes: Optional[int],
+    seed: Optional[int],
+    return_draws: bool,
+):
+    """Draws of the daily fits in coeffs, the reservoir pressure and the water cut, evaluated for target."""
+    params = ipr_params[ipr_params["scenario"] == scenario].set_index("well")
+    wells = params.index
+
+    coeff_groups = coeffs.groupby("Well")
+    slopes, coeff_offsets, coeff_counts = _ragged({w: g["Slope"].to_numpy() for w, g in coeff_groups}, wells)
+    intercepts, _, _ = _ragged({w: g["Intercept"].to_numpy() for w, g in coeff_groups}, wells)
+
+    watercut = pd.to_numeric(test_data["WtWaterCut"], errors="coerce")
+    wc_groups = watercut.groupby(test_data["well"])
+    watercuts, wc_offsets, wc_counts = _ragged({w: g.dropna().to_numpy() for w, g in wc_groups}, wells)
+
+    inputs = {
+        "slopes": slopes,
+        "intercepts": intercepts,
+        "coeff_offsets": coeff_offsets,
+        "coeff_counts": coeff_counts,
+        "watercuts": watercuts,
+        "wc_offsets": wc_offsets,
+        "wc_counts": wc_counts,
+        "qtest": params["qtest"].to_numpy(dtype=float),
+        "pwf": params["pwf"].to_numpy(dtype=float),
+        "pres": params["pres"].to_numpy(dtype=float),
+        "out": np.empty((num_draws, len(wells))),
+    }
+
+    bounds = [(start, min(start + batch_size, num_draws)) for start in range(0, num_draws, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(bounds))
+
+    if processes == 1:
+        for (start, stop), batch_seed in zip(bounds, seeds):
+            batch = dict(inputs, out=inputs["out"][start:stop])
+            _simulate_batch(batch, target, pres_sd, np.random.default_rng(batch_seed))
+        draws = inputs["out"]
+    else:
+        blocks = {}
+        try:
+            spec = {}
+            for name, array in inputs.items():
+                blocks[name] = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                np.ndarray(array.shape, dtype=array.dtype, buffer=blocks[name].buf)[:] = array
+                spec[name] = (blocks[name].name, array.shape, array.dtype)
+
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                futures = [
+                    pool.submit(_run_shared_batch, spec, start, stop, target, pres_sd, batch_seed)
+                    for (start, stop), batch_seed in zip(bounds, seeds)
+                ]
+                for future in futures:
+                    future.result()
+
+            draws = np.ndarray(inputs["out"].shape, dtype=float, buffer=blocks["out"].buf).copy()
+        finally:
+            for block in blocks.values():
+                block.close()
+                block.unlink()
+
+    summary = summarize_draws(pd.DataFrame(draws, columns=wells))
+    return (summary, draws) if return_draws else summary
+
+
+def summarize_draws(draws: pd.DataFrame) -> pd.DataFrame:
+    """
+    P90/P50/P10 and mean of Monte Carlo draws per well plus the pad total.
+
+    Args:
+        draws (pd.DataFrame): One row per draw, one column per well. Wells with no valid draws are dropped.
+
+    Returns:
+        pd.DataFrame: Indexed by well and 'Pad' with columns P90, P50, P10 and mean
+    """
+    draws = draws.dropna(axis=1, how="all")
+    draws = draws.assign(Pad=draws.sum(axis=1))
+    values = draws.to_numpy()
+
+    return pd.DataFrame(
+        {
+            "P90": np.nanpercentile(values, 10, axis=0),
+            "P50": np.nanpercentile(values, 50, axis=0),
+            "P10": np.nanpercentile(values, 90, axis=0),
+            "mean": np.nanmean(values, axis=0),
+        },
+        index=pd.Index(draws.columns, name="well"),
+    )
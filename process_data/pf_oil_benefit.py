@@ -1,8 +1,12 @@
 from typing import Any, Tuple
 
-import matplotlib.pyplot as plt
 import pandas as pd
 
+from process_data import aggregate, lazy
+from process_data.instrument import instrumented
+
+plt = lazy.module("matplotlib.pyplot")
+
 
 def mean_of_interquartile_range(series: pd.Series) -> float:
     """
@@ -14,32 +18,49 @@ def mean_of_interquartile_range(series: pd.Series) -> float:
     Returns:
         float: The mean value of the interquartile range.
     """
-    q1 = series.quantile(0.25)
-    q3 = series.quantile(0.75)
-    iqr_data = series[(series >= q1) & (series <= q3)]
-    return iqr_data.mean()
+    return aggregate.series_stat(series, method="iqr_mean")
 
 
-def calc_oil_rate(liq_lookup_table: pd.DataFrame, test_data: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+def average_well_tests(test_data: pd.DataFrame, method: str = "mean") -> pd.DataFrame:
     """
-    Pivot the test data to return average values of the test after removing top and bottom quartile.
-    Merge the average well test data into the lookup table and calculate the oil rate.
+    Average oil rate and water cut of each well's tests.
 
     Args:
-        liq_lookup_table (pd.DataFrame): DataFrame with columns "Well", "pf_pres", "bhp", "Fluid_newest_interpolated".
         test_data (pd.DataFrame): DataFrame with all the test columns taken from the merged test data function.
+        method (str): Aggregation from aggregate.METHODS, the plain mean by default. iqr_mean or
+                      trimmed_mean are less sensitive to outlier tests.
 
     Returns:
-        pd.DataFrame: Updated liq_lookup_table with the addition of watercut column and calculated oil rate.
+        pd.DataFrame: Columns well, WtOilVol and WtWaterCut.
     """
-
     test_data["WtOilVol"] = pd.to_numeric(test_data["WtOilVol"], errors="coerce")
     test_data["WtWaterCut"] = pd.to_numeric(test_data["WtWaterCut"], errors="coerce")
 
     # Drop rows with NaN values in the relevant columns
     test_data = test_data.dropna(subset=["WtOilVol", "WtWaterCut"])
 
-    avgeraged_data = test_data.groupby("well").agg({"WtOilVol": "mean", "WtWaterCut": "mean"}).reset_index()
+    return aggregate.grouped_stats(test_data, "well", ["WtOilVol", "WtWaterCut"], method=method).reset_index()
+
+
+@instrumented()
+def calc_oil_rate(
+    liq_lookup_table: pd.DataFrame, test_data: pd.DataFrame, method: str = "mean"
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Average each well's tests, the plain mean unless method asks for e.g. the interquartile mean.
+    Merge the average well test data into the lookup table and calculate the oil rate.
+
+    Args:
+        liq_lookup_table (pd.DataFrame): DataFrame with columns "Well", "pf_pres", "bhp", "Fluid_newest_interpolated".
+        test_data (pd.DataFrame): DataFrame with all the test columns taken from the merged test data function.
+        method (str): How each well's tests are averaged, see average_well_tests. Defaults to the
+                      mean the published PF benefit numbers use.
+
+    Returns:
+        pd.DataFrame: Updated liq_lookup_table with the addition of watercut column and calculated oil rate.
+    """
+
+    avgeraged_data = average_well_tests(test_data, method=method)
 
     updated_liq_lookup_table = pd.merge(liq_lookup_table, avgeraged_data, how="left", left_on="Well", right_on="well")
 
@@ -62,12 +83,13 @@ def calc_oil_rate(liq_lookup_table: pd.DataFrame, test_data: pd.DataFrame) -> Tu
     return updated_liq_lookup_table, summed_df
 
 
-def plot_oil_rates(summed_df: pd.DataFrame):
+def plot_oil_rates(summed_df: pd.DataFrame, filename: str = "plots/pf_oil_benefit.png"):
     """
     Plot the oil rates against pf_pres.
 
     Args:
         summed_df (pd.DataFrame): DataFrame with summed oil rates and pf_pres.
+        filename (str): Where to save the plot.
     """
     fig, axs = plt.subplots(1, 3, figsize=(20, 5))
 
@@ -90,4 +112,4 @@ def plot_oil_rates(summed_df: pd.DataFrame):
     axs[2].grid(True)
 
     plt.tight_layout()
-    plt.savefig("plots/pf_oil_benefit.png")
+    plt.savefig(filename)
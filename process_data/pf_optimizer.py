@@ -0,0 +1,262 @@
+import heapq
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from process_data.lookup_engine import PFLookupEngine
+
+# bpd * psi in one hydraulic horsepower
+BPD_PSI_PER_HP = 58776
+
+
+def calibrate_nozzle_coeffs(well_dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Fit each jet pump's power fluid rate to the nozzle relation PF_Rate = coeff * sqrt(PF_Pres - BHP)
+    using the median ratio over the SCADA history.
+
+    Args:
+        well_dfs (Dict[str, pd.DataFrame]): jp_data.query_tag_list output with BHP, PF_Pres and PF_Rate
+
+    Returns:
+        pd.DataFrame: Columns Well, nozzle_coeff and the median PF_Rate and PF_Pres the fit was made at
+    """
+    rows = []
+    for well, df in well_dfs.items():
+        if not {"BHP", "PF_Pres", "PF_Rate"}.issubset(df.columns):
+            continue
+        # same filters as the BHP vs PF fits, pump running on power fluid
+        df = df[(df["BHP"] != 0) & (df["PF_Rate"] > 500) & (df["PF_Pres"] > 1500) & (df["PF_Pres"] > df["BHP"])]
+        if df.empty:
+            continue
+        ratio = df["PF_Rate"] / np.sqrt(df["PF_Pres"] - df["BHP"])
+        rows.append(
+            {
+                "Well": well,
+                "nozzle_coeff": ratio.median(),
+                "PF_Rate": df["PF_Rate"].median(),
+                "PF_Pres": df["PF_Pres"].median(),
+            }
+        )
+    return pd.DataFrame(rows, columns=["Well", "nozzle_coeff", "PF_Rate", "PF_Pres"])
+
+
+def _option_table(engine: PFLookupEngine, nozzle_coeffs: pd.DataFrame, scenario: str, wells):
+    pf_grid = engine.pf_grid
+    coeffs = nozzle_coeffs.set_index("Well")["nozzle_coeff"]
+
+    missing = [well for well in wells if well not in coeffs.index]
+    if missing:
+        raise ValueError(f"No nozzle coefficient for wells: {missing}")
+
+    wells_col = np.asarray(wells)[:, None]
+    oil = engine.oil_at(wells_col, pf_grid[None, :], scenario)
+    bhp = engine.bhp_at(wells_col, pf_grid[None, :], scenario)
+    pf_rate = coeffs.loc[wells].to_numpy()[:, None] * np.sqrt(np.clip(pf_grid[None, :] - bhp, 0, None))
+    hhp = pf_rate * pf_grid[None, :] / BPD_PSI_PER_HP
+    return pf_grid, oil, bhp, pf_rate, hhp
+
+
+def allocatable_wells(engine: PFLookupEngine, nozzle_coeffs: pd.DataFrame, scenario: str = "newest") -> list:
+    """
+    Engine wells optimize_pf_allocation can place: a nozzle coefficient and at least one setpoint
+    with both an oil rate and a power fluid rate.
+
+    Args:
+        engine (PFLookupEngine): Lookup engine built from the oil lookup table
+        nozzle_coeffs (pd.DataFrame): calibrate_nozzle_coeffs output
+        scenario (str): IPR scenario the oil curves come from
+
+    Returns:
+        list: Wells in engine order
+    """
+    wells = [well for well in engine.wells if well in set(nozzle_coeffs["Well"])]
+    if not wells:
+        return []
+    _, oil, _, pf_rate, _ = _option_table(engine, nozzle_coeffs, scenario, wells)
+    usable = (~np.isnan(oil) & np.isfinite(pf_rate)).any(axis=1)
+    return [well for well, ok in zip(wells, usable) if ok]
+
+
+def _upper_hull(cost: np.ndarray, value: np.ndarray) -> list:
+    """Indices of the upper concave hull of (cost, value), starting at the cheapest option."""
+    order = np.lexsort((-value, cost))
+    hull = []
+    for k in order:
+        if not np.isfinite(value[k]):
+            continue
+        if hull and value[k] <= value[hull[-1]]:
+            continue
+        while len(hull) >= 2:
+            a, b = hull[-2], hull[-1]
+            # drop b if it sits on or below the segment from a to k
+            if (value[b] - value[a]) * (cost[k] - cost[a]) <= (value[k] - value[a]) * (cost[b] - cost[a]):
+                hull.pop()
+            else:
+                break
+        hull.append(k)
+    return hull
+
+
+def _is_concave(cost: np.ndarray, value: np.ndarray, hull: list) -> bool:
+    """True if every option off the hull is dominated by a cheaper, higher oil hull option."""
+    hull_cost = cost[hull]
+    hull_value = value[hull]
+    finite = np.isfinite(value)
+    # best hull option that costs no more than each option
+    pos = np.searchsorted(hull_cost, cost[finite], side="right") - 1
+    best_value = np.where(pos >= 0, hull_value[np.maximum(pos, 0)], -np.inf)
+    return bool(np.all(best_value >= value[finite]))
+
+
+def _greedy(cost: np.ndarray, value: np.ndarray, budget: float, hulls: list) -> np.ndarray:
+    choice = np.array([hull[0] for hull in hulls])
+    remaining = budget - cost[np.arange(len(hulls)), choice].sum()
+
+    heap = []
+    for i, hull in enumerate(hulls):
+        if len(hull) > 1:
+            d_cost = cost[i, hull[1]] - cost[i, hull[0]]
+            d_value = value[i, hull[1]] - value[i, hull[0]]
+            heapq.heappush(heap, (-d_value / max(d_cost, 1e-12), i, 1))
+
+    while heap:
+        _, i, step = heapq.heappop(heap)
+        hull = hulls[i]
+        d_cost = cost[i, hull[step]] - cost[i, hull[step - 1]]
+        if d_cost > remaining:
+            # every later hull option of the well costs more than this one, so it stays where it is.
+            # The leftover pass below may still move it to a cheaper option off the hull.
+            continue
+        remaining -= d_cost
+        choice[i] = hull[step]
+        if step + 1 < len(hull):
+            d_cost = cost[i, hull[step + 1]] - cost[i, hull[step]]
+            d_value = value[i, hull[step + 1]] - value[i, hull[step]]
+            heapq.heappush(heap, (-d_value / max(d_cost, 1e-12), i, step + 1))
+
+    # spend what is left on the best single well upgrade that still fits, hull or not
+    for i in range(len(hulls)):
+        extra = cost[i] - cost[i, choice[i]]
+        fits = (extra <= remaining) & (value[i] > value[i, choice[i]])
+        if fits.any():
+            k = int(np.argmax(np.where(fits, value[i], -np.inf)))
+            remaining -= extra[k]
+            choice[i] = k
+
+    return choice
+
+
+def _dynamic_program(cost: np.ndarray, value: np.ndarray, budget: float, num_bins: int) -> np.ndarray:
+    num_wells, num_levels = cost.shape
+    unit = budget / num_bins
+    # round costs up so every allocation the DP accepts is feasible in real units
+    weights = np.ceil(cost / unit - 1e-9).astype(int)
+
+    best = np.zeros(num_bins + 1)
+    picks = np.zeros((num_wells, num_bins + 1), dtype=int)
+    for i in range(num_wells):
+        new_best = np.full(num_bins + 1, -np.inf)
+        for k in range(num_levels):
+            w = weights[i, k]
+            if not np.isfinite(value[i, k]) or w > num_bins:
+                continue
+            candidate = np.full(num_bins + 1, -np.inf)
+            candidate[w:] = best[: num_bins + 1 - w] + value[i, k]
+            better = candidate > new_best
+            new_best[better] = candidate[better]
+            picks[i, better] = k
+        best = new_best
+
+    if not np.isfinite(best[-1]):
+        raise ValueError("No allocation fits within the limit")
+
+    choice = np.zeros(num_wells, dtype=int)
+    b = num_bins
+    for i in range(num_wells - 1, -1, -1):
+        choice[i] = picks[i, b]
+        b -= weights[i, choice[i]]
+    return choice
+
+
+def optimize_pf_allocation(
+    engine: PFLookupEngine,
+    nozzle_coeffs: pd.DataFrame,
+    limit: float,
+    constraint: str = "pf_rate",
+    scenario: str = "newest",
+    wells=None,
+    method: str = "auto",
+    num_bins: int = 2000,
+) -> pd.DataFrame:
+    """
+    Choose each jet pump's power fluid pressure to maximize pad oil under a total power fluid
+    rate or pump horsepower limit, using the per well oil vs pf_pres curves in the lookup engine.
+
+    The greedy method walks each well's concave hull of (cost, oil) options, always taking the
+    step with the best marginal oil per unit of cost, then spends any leftover on single well
+    upgrades. When every curve is concave its oil is within one hull step of the optimum, the
+    step the leftover could not pay for, and often equal to it. The dp method solves the
+    multiple choice knapsack exactly with costs rounded up to limit / num_bins. auto uses greedy
+    when every curve is concave and dp otherwise.
+
+    Args:
+        engine (PFLookupEngine): Lookup engine built from the oil lookup table
+        nozzle_coeffs (pd.DataFrame): calibrate_nozzle_coeffs output
+        limit (float): Total power fluid rate, bpd, or hydraulic horsepower available to the pad
+        constraint (str): "pf_rate" or "hhp"
+        scenario (str): IPR scenario the oil curves come from
+        wells (list): Wells to allocate across, defaults to every engine well with an oil curve
+        method (str): "auto", "greedy" or "dp"
+        num_bins (int): Cost resolution of the dp method
+
+    Returns:
+        pd.DataFrame: One row per well with the chosen pf_pres and the bhp, oil, pf_rate and hhp there
+
+    Raises:
+        ValueError: If the constraint or method is unknown, a well has no nozzle coefficient
+                    or even the lowest setpoints exceed the limit.
+    """
+    if constraint not in ("pf_rate", "hhp"):
+        raise ValueError(f"Unknown constraint {constraint}")
+    if method not in ("auto", "greedy", "dp"):
+        raise ValueError(f"Unknown method {method}")
+
+    if wells is None:
+        has_oil = ~np.isnan(engine.oil_at(np.asarray(engine.wells)[:, None], engine.pf_grid[None, :], scenario)).all(
+            axis=1
+        )
+        wells = list(engine.wells[has_oil])
+    wells = list(wells)
+
+    pf_grid, oil, bhp, pf_rate, hhp = _option_table(engine, nozzle_coeffs, scenario, wells)
+    cost = pf_rate if constraint == "pf_rate" else hhp
+    value = np.where(np.isnan(oil) | np.isnan(cost), -np.inf, oil)
+    cost = np.nan_to_num(cost, nan=np.inf)
+
+    rows = np.arange(len(wells))
+    hulls = [_upper_hull(cost[i], value[i]) for i in rows]
+    if any(not hull for hull in hulls):
+        raise ValueError("Every well needs at least one setpoint with an oil rate")
+    if sum(cost[i, hull[0]] for i, hull in enumerate(hulls)) > limit:
+        raise ValueError("Even the lowest cost setpoints exceed the limit")
+
+    if method == "auto":
+        concave = all(_is_concave(cost[i], value[i], hulls[i]) for i in rows)
+        method = "greedy" if concave else "dp"
+
+    if method == "greedy":
+        choice = _greedy(cost, value, limit, hulls)
+    else:
+        choice = _dynamic_program(cost, value, limit, num_bins)
+
+    return pd.DataFrame(
+        {
+            "Well": wells,
+            "pf_pres": pf_grid[choice],
+            "bhp": bhp[rows, choice],
+            "oil": oil[rows, choice],
+            "pf_rate": pf_rate[rows, choice],
+            "hhp": hhp[rows, choice],
+        }
+    )
@@ -1,8 +1,31 @@
 import numpy as np
 import pandas as pd
 
+from process_data import ipr
+from process_data.instrument import instrumented
 
-def bhp_lookup(slope_df):
+
+def pf_pressure_grid(pf_min: float = 1800, pf_max: float = 3300, pf_step: float = 50) -> np.ndarray:
+    """
+    Power fluid pressures from pf_min to pf_max (inclusive) every pf_step psi.
+
+    Args:
+        pf_min (float): First power fluid pressure, psi
+        pf_max (float): Last power fluid pressure, psi, included when it falls on the grid
+        pf_step (float): psi between grid points
+
+    Returns:
+        np.ndarray: Power fluid pressure grid
+    """
+    if pf_step <= 0:
+        raise ValueError("pf_step must be positive")
+
+    num_points = int(np.floor((pf_max - pf_min) / pf_step + 1e-9)) + 1
+    return pf_min + pf_step * np.arange(max(num_points, 0))
+
+
+@instrumented()
+def bhp_lookup(slope_df, pf_min=1800, pf_max=3300, pf_step=50):
     """
     Using the line fit average taken from the power fluid pressure versus
     bottom hole pressure data, create an estimated bottom hole pressure for a given power fluid pressure
@@ -10,88 +33,115 @@ def bhp_lookup(slope_df):
     Args:
         slope_df (df): dataframe with each well and their respective slope and intercept
                         for the bhp vs pf fit
+        pf_min (float): First power fluid pressure in the lookup, psi
+        pf_max (float): Last power fluid pressure in the lookup, psi
+        pf_step (float): psi between power fluid pressures
 
     Returns:
         Dataframe with an expected BHP for each powerfluid pressure
     """
+    pf_grid = pf_pressure_grid(pf_min, pf_max, pf_step)
 
-    new_rows = []
+    slope = slope_df["Mean Slope"].to_numpy(dtype=float)
+    intercept = slope_df["Mean Intercept"].to_numpy(dtype=float)
 
-    for index, row in slope_df.iterrows():
-        well = row["Well"]
-        slope = row["Mean Slope"]
-        intercept = row["Mean Intercept"]
+    # wells x pf grid in one broadcast, flattened well-major like the table it replaces
+    bhp = slope[:, None] * pf_grid[None, :] + intercept[:, None]
 
-        # Generate pf_pres values from 1800 to 3300 with increments of 50
-        for pf_pres in range(1800, 3350, 50):
-            bhp = slope * pf_pres + intercept
-            new_rows.append({"Well": well, "pf_pres": pf_pres, "bhp": bhp})
-
-    # Create a new DataFrame from the new rows
-    bhp_lookup = pd.DataFrame(new_rows)
+    bhp_lookup = pd.DataFrame(
+        {
+            "Well": np.repeat(slope_df["Well"].to_numpy(), len(pf_grid)),
+            "pf_pres": np.tile(pf_grid, len(slope_df)),
+            "bhp": bhp.ravel(),
+        }
+    )
 
     return bhp_lookup
 
 
-def interpolate_fluid_newest(well, bhp_value, ipr_df):
-    # Filter the ipr_lookup dataframe for the specific well
-    well_data = ipr_df[ipr_df["well"] == well]
-
-    well_data["BHP"] = pd.to_numeric(well_data["BHP"], errors="coerce")
-    well_data["Fluid_newest"] = pd.to_numeric(well_data["Fluid_newest"], errors="coerce")
-
-    well_data = well_data.dropna(subset=["BHP", "Fluid_newest"])
-
-    if well_data.empty:
-        return np.nan
-
-    interpolated_value = np.interp(bhp_value, well_data["BHP"], well_data["Fluid_newest"])
-
-    return interpolated_value
-
-
-def interpolate_fluid_lowest(well, bhp_value, ipr_df):
-    # Filter the ipr_lookup dataframe for the specific well
-    well_data = ipr_df[ipr_df["well"] == well]
-
-    well_data["BHP"] = pd.to_numeric(well_data["BHP"], errors="coerce")
-    well_data["Fluid_lowest"] = pd.to_numeric(well_data["Fluid_lowest"], errors="coerce")
-
-    well_data = well_data.dropna(subset=["BHP", "Fluid_lowest"])
-
-    if well_data.empty:
-        return np.nan
-
-    interpolated_value = np.interp(bhp_value, well_data["BHP"], well_data["Fluid_lowest"])
-
-    return interpolated_value
-
-
-def interpolate_fluid_median(well, bhp_value, ipr_df):
-    # Filter the ipr_lookup dataframe for the specific well
-    well_data = ipr_df[ipr_df["well"] == well]
-
-    well_data["BHP"] = pd.to_numeric(well_data["BHP"], errors="coerce")
-    well_data["Fluid_median"] = pd.to_numeric(well_data["Fluid_median"], errors="coerce")
-
-    well_data = well_data.dropna(subset=["BHP", "Fluid_median"])
-
-    if well_data.empty:
-        return np.nan
-
-    interpolated_value = np.interp(bhp_value, well_data["BHP"], well_data["Fluid_median"])
-
-    return interpolated_value
+class IPRIndex:
+    """
+    Sampled IPR table indexed once for vectorized interpolation.
 
+    Every well's points are sorted by BHP and laid end to end on a single axis, each
+    well shifted by its own offset, so one np.interp call answers queries for all wells.
+    """
 
+    FLUID_COLUMNS = ["Fluid_newest", "Fluid_lowest", "Fluid_median"]
+
+    def __init__(self, ipr_df: pd.DataFrame):
+        ipr_df = ipr_df.copy()
+        ipr_df["BHP"] = pd.to_numeric(ipr_df["BHP"], errors="coerce")
+
+        self.wells = pd.Index(ipr_df["well"].dropna().unique())
+        self.curves = {}
+
+        for column in self.FLUID_COLUMNS:
+            if column not in ipr_df.columns:
+                continue
+            curve = pd.DataFrame(
+                {
+                    "well_idx": self.wells.get_indexer(ipr_df["well"]),
+                    "BHP": ipr_df["BHP"],
+                    "fluid": pd.to_numeric(ipr_df[column], errors="coerce"),
+                }
+            )
+            curve = curve[curve["well_idx"] >= 0].dropna().sort_values(["well_idx", "BHP"])
+            self.curves[column] = self._index_curve(curve)
+
+    def _index_curve(self, curve: pd.DataFrame) -> dict:
+        bounds = curve.groupby("well_idx")["BHP"].agg(["min", "max"]).reindex(range(len(self.wells)))
+        # spacing between wells on the shared axis, wider than any single well's BHP span
+        spacing = float(np.nanmax(bounds["max"] - bounds["min"])) + 1 if not curve.empty else 1.0
+        offsets = np.arange(len(self.wells)) * spacing - bounds["min"].to_numpy()
+
+        return {
+            "x": curve["BHP"].to_numpy() + offsets[curve["well_idx"].to_numpy()],
+            "y": curve["fluid"].to_numpy(),
+            "min": bounds["min"].to_numpy(),
+            "max": bounds["max"].to_numpy(),
+            "offsets": offsets,
+        }
+
+    def interpolate(self, wells, bhp, column: str) -> np.ndarray:
+        """
+        Interpolate fluid rate for each (well, bhp) pair, clamped to each well's sampled range.
+
+        Args:
+            wells: Array of well names
+            bhp: Array of bottomhole pressures, same length as wells
+            column (str): One of FLUID_COLUMNS
+
+        Returns:
+            np.ndarray: Interpolated fluid rates, NaN for wells without points
+        """
+        bhp = np.asarray(bhp, dtype=float)
+        result = np.full(bhp.shape, np.nan)
+        curve = self.curves.get(column)
+        if curve is None or curve["x"].size == 0:
+            return result
+
+        well_idx = self.wells.get_indexer(np.asarray(wells))
+        valid = well_idx >= 0
+        valid[valid] = ~np.isnan(curve["min"][well_idx[valid]])
+
+        idx = well_idx[valid]
+        clamped = np.clip(bhp[valid], curve["min"][idx], curve["max"][idx])
+        result[valid] = np.interp(clamped + curve["offsets"][idx], curve["x"], curve["y"])
+        return result
+
+
+@instrumented()
 def assign_liquid_rate(ipr_lookup, bhp_lookup):
     """
     Take the bottom hole calculation data and assign a liquid rate for each
     bottom hole pressure
 
     Args:
-        ipr_lookup (df): table for each well with three different estimated liquid rates
-        for a given bottom hole pressure [Fluid_newest, Fluid_lowest, Fluid_median]
+        ipr_lookup (df): either the compact IPR table from ipr.fit_ipr_params (well, scenario,
+        qtest, pwf, pres, qmax), which is evaluated exactly, or the legacy sampled table for each
+        well with three different estimated liquid rates for a given bottom hole pressure
+        [Fluid_newest, Fluid_lowest, Fluid_median]
 
         bhp_lookup(df): dataframe that serves as a table of expected bhp for a given
         powerfluid rate
@@ -101,16 +151,15 @@ def assign_liquid_rate(ipr_lookup, bhp_lookup):
         to a power fluid pressure
     """
 
-    bhp_lookup["Fluid_newest_interpolated"] = bhp_lookup.apply(
-        lambda row: interpolate_fluid_newest(row["Well"], row["bhp"], ipr_lookup), axis=1
-    )
-
-    bhp_lookup["Fluid_lowest_interpolated"] = bhp_lookup.apply(
-        lambda row: interpolate_fluid_lowest(row["Well"], row["bhp"], ipr_lookup), axis=1
-    )
+    if "qmax" in ipr_lookup.columns:
+        vogel = ipr.VogelLookup(ipr_lookup)
+        rates = vogel.rate_table(bhp_lookup["Well"], bhp_lookup["bhp"])
+        for i, scenario in enumerate(vogel.scenarios):
+            bhp_lookup[f"Fluid_{scenario}_interpolated"] = rates[:, i]
+        return bhp_lookup
 
-    bhp_lookup["Fluid_median_interpolated"] = bhp_lookup.apply(
-        lambda row: interpolate_fluid_median(row["Well"], row["bhp"], ipr_lookup), axis=1
-    )
+    ipr_index = IPRIndex(ipr_lookup)
+    for column in ipr_index.FLUID_COLUMNS:
+        bhp_lookup[f"{column}_interpolated"] = ipr_index.interpolate(bhp_lookup["Well"], bhp_lookup["bhp"], column)
 
     return bhp_lookup
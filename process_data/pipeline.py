@@ -0,0 +1,181 @@
+import glob
+import hashlib
+import inspect
+import json
+import logging
+import os
+import pickle
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from process_data import instrument
+from process_data.plot_cache import fingerprint
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = "results/.pipeline"
+# library code the stage functions call, a change anywhere in it reruns every stage
+CODE_PACKAGES = ["process_data", "pull_data"]
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Stage:
+    """
+    One step of a pipeline: func is called with its inputs and params as keyword arguments.
+
+    A single output is the function's return value, several outputs are returned as a tuple in
+    the order declared. sources are files read by the stage (their content is part of the cache
+    key) and writes are files it produces, the stage reruns if any of them is missing. The key also
+    covers the code of CODE_PACKAGES, so a library fix is not served from an older cache.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable,
+        inputs: Iterable[str] = (),
+        outputs: Iterable[str] = (),
+        params: Optional[Dict[str, Any]] = None,
+        sources: Iterable[str] = (),
+        writes: Iterable[str] = (),
+    ):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = dict(params or {})
+        self.sources = list(sources)
+        self.writes = list(writes)
+
+    def key(self, input_hashes: Dict[str, str]) -> str:
+        """Cache key from the stage and library code, params, source files and the content of its inputs."""
+        try:
+            code = inspect.getsource(self.func)
+        except (OSError, TypeError):
+            code = f"{self.func.__module__}.{self.func.__qualname__}"
+        source_hashes = [_file_hash(path) for path in self.sources]
+        return fingerprint(
+            self.name, code, _code_hash(), self.params, [input_hashes[name] for name in self.inputs], source_hashes
+        )
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _code_hash() -> str:
+    """Hash of every module in CODE_PACKAGES."""
+    digest = hashlib.sha1()
+    for package in CODE_PACKAGES:
+        for path in sorted(glob.glob(os.path.join(_ROOT, package, "*.py"))):
+            digest.update(os.path.basename(path).encode())
+            digest.update(_file_hash(path).encode())
+    return digest.hexdigest()
+
+
+class Pipeline:
+    """
+    Runs stages in order, skipping stages whose inputs, params, source files and code are unchanged.
+
+    Every artifact is stored once under its content hash in cache_dir/objects and the manifest maps
+    each stage key to the hashes of its outputs. Because downstream keys are built from the content
+    of their inputs, a stage that reruns but produces the same output does not trigger the stages
+    after it. Changing resp_modifier, for example, only reruns the IPR stage and what uses its output.
+    """
+
+    def __init__(self, stages: List[Stage], cache_dir: str = CACHE_DIR):
+        self.stages = list(stages)
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, "objects")
+        self.manifest_path = os.path.join(cache_dir, "manifest.json")
+        self.manifest: Dict[str, Dict[str, str]] = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as handle:
+                self.manifest = json.load(handle)
+
+        # artifact name -> content hash, filled in as the pipeline runs
+        self.artifacts: Dict[str, str] = {}
+        self._loaded: Dict[str, Any] = {}
+
+        produced = set()
+        for stage in self.stages:
+            missing = [name for name in stage.inputs if name not in produced]
+            if missing:
+                raise ValueError(f"Stage {stage.name} needs {missing} before any stage produces them")
+            produced.update(stage.outputs)
+
+    def _object_path(self, artifact_hash: str) -> str:
+        return os.path.join(self.objects_dir, f"{artifact_hash}.pkl")
+
+    def _store(self, value) -> str:
+        artifact_hash = fingerprint(value)
+        path = self._object_path(artifact_hash)
+        if not os.path.exists(path):
+            os.makedirs(self.objects_dir, exist_ok=True)
+            with open(f"{path}.tmp", "wb") as handle:
+                pickle.dump(value, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f"{path}.tmp", path)
+        return artifact_hash
+
+    def load(self, name: str):
+        """Value of an artifact from the last run, read from the cache on first use."""
+        if name not in self._loaded:
+            with open(self._object_path(self.artifacts[name]), "rb") as handle:
+                self._loaded[name] = pickle.load(handle)
+        return self._loaded[name]
+
+    def _save_manifest(self) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(f"{self.manifest_path}.tmp", "w") as handle:
+            json.dump(self.manifest, handle, indent=1, sort_keys=True)
+        os.replace(f"{self.manifest_path}.tmp", self.manifest_path)
+
+    def _is_cached(self, stage: Stage, key: str) -> bool:
+        outputs = self.manifest.get(key)
+        if outputs is None:
+            return False
+        return all(os.path.exists(self._object_path(outputs[name])) for name in stage.outputs) and all(
+            os.path.exists(path) for path in stage.writes
+        )
+
+    def run(self, force: Iterable[str] = ()) -> Dict[str, str]:
+        """
+        Run the pipeline.
+
+        Args:
+            force (Iterable[str]): Stage names to rerun even if cached
+
+        Returns:
+            Dict[str, str]: Content hash of every artifact, load the values with load
+        """
+        force = set(force)
+        for stage in self.stages:
+            key = stage.key(self.artifacts)
+            if stage.name not in force and self._is_cached(stage, key):
+                logger.info("%s: unchanged, skipped", stage.name)
+                instrument.skipped(stage.name)
+                for name in stage.outputs:
+                    if self.artifacts.get(name) != self.manifest[key][name]:
+                        self._loaded.pop(name, None)
+                    self.artifacts[name] = self.manifest[key][name]
+                continue
+
+            logger.info("%s: running", stage.name)
+            kwargs = {name: self.load(name) for name in stage.inputs}
+            with instrument.stage(stage.name, inputs=kwargs) as stats:
+                result = stage.func(**kwargs, **stage.params)
+                values = (result,) if len(stage.outputs) == 1 else tuple(result or ())
+                stats["rows_out"] = instrument.count_rows(list(values))
+            if len(values) != len(stage.outputs):
+                raise ValueError(f"Stage {stage.name} returned {len(values)} values for outputs {stage.outputs}")
+
+            for name, value in zip(stage.outputs, values):
+                self.artifacts[name] = self._store(value)
+                self._loaded[name] = value
+            self.manifest[key] = {name: self.artifacts[name] for name in stage.outputs}
+            self._save_manifest()
+
+        return dict(self.artifacts)
@@ -0,0 +1,164 @@
+import functools
+import glob
+import hashlib
+import json
+import math
+import os
+import pickle
+import sys
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from process_data import lazy
+
+Image = lazy.module("PIL.Image")
+
+MANIFEST = "plots/.manifest.json"
+
+
+def _update_hash(digest, part) -> None:
+    if isinstance(part, (pd.DataFrame, pd.Series)):
+        if isinstance(part, pd.DataFrame):
+            layout = (part.shape, list(part.columns), list(part.dtypes))
+        else:
+            layout = (part.shape, part.name, part.dtype)
+        digest.update(repr((type(part).__name__, layout)).encode())
+        try:
+            digest.update(pd.util.hash_pandas_object(part, index=True).to_numpy().tobytes())
+        except TypeError:
+            # unhashable cells, e.g. lists, fall back to the pickled frame
+            digest.update(pickle.dumps(part))
+    elif isinstance(part, np.ndarray):
+        digest.update(repr((part.dtype, part.shape)).encode())
+        digest.update(np.ascontiguousarray(part).tobytes())
+    elif isinstance(part, (list, tuple)):
+        digest.update(f"{type(part).__name__}{len(part)}".encode())
+        for item in part:
+            _update_hash(digest, item)
+    elif isinstance(part, dict):
+        for key in sorted(part, key=repr):
+            _update_hash(digest, key)
+            _update_hash(digest, part[key])
+    elif part is None or isinstance(part, (str, bytes, bool, int, float, np.generic, pd.Timestamp)):
+        digest.update(repr(part).encode())
+    else:
+        # other objects, e.g. a PFLookupEngine, by value rather than their id based repr
+        digest.update(pickle.dumps(part))
+
+
+def fingerprint(*parts) -> str:
+    """
+    Content hash of a figure's inputs: frames and series by value (index included), arrays by their
+    bytes, containers item by item, scalars by repr and any other object by its pickle.
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        _update_hash(digest, part)
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _package_hash(directory: str) -> str:
+    # once per process, every panel's key needs it
+    digest = hashlib.sha1()
+    for path in sorted(glob.glob(os.path.join(directory, "*.py"))):
+        digest.update(os.path.basename(path).encode())
+        with open(path, "rb") as handle:
+            digest.update(handle.read())
+    return digest.hexdigest()
+
+
+def _source_hash(func: Callable) -> str:
+    """
+    Hash of the code of the plot function's package, as pipeline._code_hash, so editing the plot or
+    a helper it draws with, e.g. plot_density, re-renders its figures.
+    """
+    name = f"{func.__module__}.{func.__qualname__}"
+    path = getattr(sys.modules.get(func.__module__), "__file__", None)
+    if path is None:
+        return hashlib.sha1(name.encode()).hexdigest()
+    return fingerprint(name, _package_hash(os.path.dirname(os.path.abspath(path))))
+
+
+class PlotCache:
+    """
+    Manifest of the content hash each figure in plots/ was rendered from.
+
+    A figure is current when its file exists and the hash of the plot function's package code and
+    the arguments it is called with matches the manifest, so reruns only redraw wells whose data or
+    parameters changed.
+    """
+
+    def __init__(self, manifest_path: str = MANIFEST):
+        self.manifest_path = manifest_path
+        self.entries: Dict[str, str] = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as handle:
+                self.entries = json.load(handle)
+
+    def key(self, func: Callable, *args) -> str:
+        return fingerprint(_source_hash(func), *args)
+
+    def is_current(self, path: str, key: str) -> bool:
+        return self.entries.get(path) == key and os.path.exists(path)
+
+    def record(self, path: str, key: str) -> None:
+        self.entries[path] = key
+
+    def save(self) -> None:
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # write then rename so an interrupted run never leaves a half written manifest
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as handle:
+            json.dump(self.entries, handle, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def compose_grid(self, panel_paths: List[str], out_path: str, num_columns: Optional[int] = None) -> bool:
+        """
+        Paste the grid image together from cached panels, unless it is already built from the same ones.
+
+        Args:
+            panel_paths (List[str]): Panel PNGs in grid order, recorded in this cache
+            out_path (str): Grid image to write
+            num_columns (int): Columns in the grid, defaults to ceil(sqrt(number of panels))
+
+        Returns:
+            bool: True if the grid was rebuilt
+        """
+        key = fingerprint([self.entries.get(path) for path in panel_paths], num_columns)
+        if self.is_current(out_path, key):
+            return False
+        compose_grid(panel_paths, out_path, num_columns)
+        self.record(out_path, key)
+        self.save()
+        return True
+
+
+def compose_grid(panel_paths: List[str], out_path: str, num_columns: Optional[int] = None) -> None:
+    """
+    Paste per well panel images into one grid image, laid out like the matplotlib grid plots.
+
+    Args:
+        panel_paths (List[str]): Panel PNGs in grid order, all the same size
+        out_path (str): Grid image to write
+        num_columns (int): Columns in the grid, defaults to ceil(sqrt(number of panels))
+    """
+    if not panel_paths:
+        return
+    num_columns = num_columns or int(math.ceil(math.sqrt(len(panel_paths))))
+    num_rows = int(math.ceil(len(panel_paths) / num_columns))
+
+    with Image.open(panel_paths[0]) as first:
+        width, height = first.size
+    grid = Image.new("RGB", (num_columns * width, num_rows * height), "white")
+    for i, path in enumerate(panel_paths):
+        with Image.open(path) as panel:
+            grid.paste(panel.convert("RGB"), ((i % num_columns) * width, (i // num_columns) * height))
+    grid.save(out_path)
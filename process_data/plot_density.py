@@ -0,0 +1,119 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+DENSITY_MODES = (None, "hexbin", "hist2d", "lttb")
+
+
+def lttb(t: np.ndarray, y: np.ndarray, num_out: int) -> np.ndarray:
+    """
+    Largest Triangle Three Buckets decimation of a time series.
+
+    The series is split into num_out - 2 buckets and from each bucket the point forming the largest
+    triangle with the previously kept point and the average of the next bucket is kept. Spikes and
+    the overall shape survive, which a plain every nth point sample would lose.
+
+    Args:
+        t (np.ndarray): Sorted x values, e.g. timestamps as int64
+        y (np.ndarray): Values
+        num_out (int): Number of points to keep, at least 3
+
+    Returns:
+        np.ndarray: Indices of the kept points, first and last included
+    """
+    t = np.asarray(t, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(t)
+    if num_out >= n or num_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, num_out - 1).astype(int)
+    keep = np.empty(num_out, dtype=int)
+    keep[0] = 0
+    keep[-1] = n - 1
+    a = 0
+    for b in range(num_out - 2):
+        start, stop = edges[b], edges[b + 1]
+        next_stop = edges[b + 2] if b + 2 < len(edges) else n
+        # the last bucket looks ahead to the final point
+        next_start = stop if b + 2 < len(edges) else n - 1
+        avg_t = t[next_start:next_stop].mean()
+        avg_y = y[next_start:next_stop].mean()
+
+        area = np.abs((t[a] - avg_t) * (y[start:stop] - y[a]) - (t[a] - t[start:stop]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        keep[b + 1] = a
+    return keep
+
+
+def density_scatter(
+    ax,
+    x,
+    y,
+    c,
+    mode: Optional[str] = None,
+    t=None,
+    cmap: str = "viridis",
+    gridsize: int = 60,
+    max_points: int = 2000,
+):
+    """
+    Scatter x vs y colored by c, optionally as a binned density layer or a decimated scatter.
+
+    None draws every point, as the grid plots always have. hexbin and hist2d bin the points and
+    color each bin by the mean of c, so the colorbar keeps its meaning (date, PF rate). lttb keeps
+    max_points points picked on y along t. Every mode except None is rasterized, so a year of
+    hourly points costs one image in the figure instead of a marker each.
+
+    Args:
+        ax (matplotlib.axes.Axes): Axes to draw on
+        x, y, c (array-like): Point coordinates and color values
+        mode (str): One of DENSITY_MODES
+        t (array-like): Time of each point for lttb, defaults to the point order
+        cmap (str): Colormap
+        gridsize (int): Bins across x for hexbin and hist2d
+        max_points (int): Points kept by lttb
+
+    Returns:
+        The mappable to pass to plt.colorbar
+
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+    if mode not in DENSITY_MODES:
+        raise ValueError(f"Unknown density mode {mode}, expected one of {DENSITY_MODES}")
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    c = np.asarray(c, dtype=float)
+
+    if mode is None:
+        return ax.scatter(x, y, c=c, cmap=cmap)
+
+    valid = np.isfinite(x) & np.isfinite(y) & np.isfinite(c)
+    x, y, c = x[valid], y[valid], c[valid]
+
+    if mode == "hexbin":
+        return ax.hexbin(x, y, C=c, reduce_C_function=np.mean, gridsize=gridsize, cmap=cmap, mincnt=1, rasterized=True)
+
+    if mode == "hist2d":
+        x_edges = np.linspace(x.min(), x.max(), gridsize + 1) if len(x) else np.linspace(0, 1, gridsize + 1)
+        y_edges = np.linspace(y.min(), y.max(), gridsize + 1) if len(y) else np.linspace(0, 1, gridsize + 1)
+        counts, _, _ = np.histogram2d(x, y, bins=[x_edges, y_edges])
+        sums, _, _ = np.histogram2d(x, y, bins=[x_edges, y_edges], weights=c)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_c = np.where(counts > 0, sums / counts, np.nan)
+        return ax.pcolormesh(x_edges, y_edges, np.ma.masked_invalid(mean_c.T), cmap=cmap, rasterized=True)
+
+    if t is None:
+        t = np.arange(valid.size)
+    if isinstance(t, pd.DatetimeIndex):
+        t = t.asi8
+    t = np.asarray(t)
+    if np.issubdtype(t.dtype, np.datetime64):
+        t = t.astype("datetime64[ns]").astype("int64")
+    t = t[valid]
+    order = np.argsort(t, kind="stable")
+    keep = order[lttb(t[order], y[order], max_points)]
+    return ax.scatter(x[keep], y[keep], c=c[keep], cmap=cmap, rasterized=True)
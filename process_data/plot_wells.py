@@ -1,12 +1,16 @@
 # plot_wells.py
 
 import math
+import os
 import pickle
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
+from process_data import lazy, render
+
+plt = lazy.module("matplotlib.pyplot")
+
 
 def load_well_dataframes(pickle_file):
     """
@@ -23,41 +27,70 @@ def load_well_dataframes(pickle_file):
     return well_dfs
 
 
-def plot_wells(well_dfs):
+def _plot_well(well, df):
+    figure = render.ReusableFigure.get("well", figsize=(10, 5))
+    figure.ax.grid(True)
+    figure.lines([(df.index, df[column], column) for column in df.columns])
+    figure.save(f"plots/{well}_plot.png", f"Data for Well: {well}", "Datetime", "Value")  # Save the plot as a PNG file
+
+
+def plot_wells(well_dfs, max_workers=1, cache=None):
     """
     Generate and save a line plot for each well's data.
 
     Args:
         well_dfs (dict of pandas.DataFrame): A dictionary containing well identifiers as keys and their corresponding data as pandas DataFrames.
+        max_workers (int): Rendering processes, None for the CPU count. 1 renders in this process.
+        cache (PlotCache): Skip wells whose figure is already rendered from the same data, None renders all.
 
     Saves:
         PNG files: Each plot is saved as a PNG file in a directory named 'plots'.
     """
-    for well, df in well_dfs.items():
-        plt.figure(figsize=(10, 5))
-        for column in df.columns:
-            plt.plot(df.index, df[column], label=column)
-        plt.title(f"Data for Well: {well}")
-        plt.xlabel("Datetime")
-        plt.ylabel("Value")
-        plt.legend()
-        plt.grid(True)
-        plt.tight_layout()
-        plt.savefig(f"plots/{well}_plot.png")  # Save the plot as a PNG file
-        # plt.show()
-        plt.close()
-
-
-def plot_grid(well_dfs):
+    paths = [f"plots/{well}_plot.png" for well in well_dfs]
+    render.render_jobs(_plot_well, well_dfs.items(), max_workers, paths, cache)
+
+
+def _draw_well_data(ax, well, df):
+    for column in df.columns:
+        ax.plot(df.index, df[column], label=column)
+    ax.set_title(f"Data for Well: {well}")
+    ax.set_xlabel("Datetime")
+    ax.set_ylabel("Value")
+    ax.legend()
+    ax.grid(True)
+
+
+def _plot_grid_panel(well, df):
+    # one grid cell on its own, the same size as in the matplotlib grid
+    fig, ax = plt.subplots(figsize=(7, 5))
+    _draw_well_data(ax, well, df)
+    fig.tight_layout()
+    fig.savefig(f"plots/panels/{well}_grid_panel.png")
+    plt.close(fig)
+
+
+def plot_grid(well_dfs, cache=None, max_workers=1):
     """
     Create a grid of plots for all wells, each subplot representing one well.
 
+    With a cache, every well is rendered as its own panel, only wells whose data changed are
+    redrawn, and the grid image is pasted together from the panels.
+
     Args:
         well_dfs (dict of pandas.DataFrame): A dictionary where each key is a well identifier and each value is a DataFrame with the well's data.
+        cache (PlotCache): Manifest of rendered panels, None draws the grid in one matplotlib figure.
+        max_workers (int): Rendering processes for the panels, None for the CPU count.
 
     Saves:
         PNG file: A single image file containing all the plots in a grid layout.
     """
+    if cache is not None:
+        os.makedirs("plots/panels", exist_ok=True)
+        paths = [f"plots/panels/{well}_grid_panel.png" for well in well_dfs]
+        render.render_jobs(_plot_grid_panel, well_dfs.items(), max_workers, paths, cache)
+        cache.compose_grid(paths, "plots/well_data_grid_plot.png")
+        return
+
     # Determine the number of rows and columns for the subplot grid
     num_wells = len(well_dfs)
     num_columns = int(math.ceil(math.sqrt(num_wells)))
@@ -69,14 +102,7 @@ def plot_grid(well_dfs):
 
     # Iterate over the well DataFrames and their corresponding axes
     for i, (well, df) in enumerate(well_dfs.items()):
-        ax = axs[i]
-        for column in df.columns:
-            ax.plot(df.index, df[column], label=column)
-        ax.set_title(f"Data for Well: {well}")
-        ax.set_xlabel("Datetime")
-        ax.set_ylabel("Value")
-        ax.legend()
-        ax.grid(True)
+        _draw_well_data(axs[i], well, df)
 
     # If there are any leftover subplots, turn them off
     for j in range(i + 1, len(axs)):
@@ -95,127 +121,122 @@ def plot_grid(well_dfs):
     plt.close(fig)
 
 
-def plot_liquid_rate(well_dfs, tests):
+def _well_tests(tests, well, df):
+    """Tests of one well inside the date range of its SCADA data."""
+    return tests[(tests["well"] == well) & (tests["WtDate"].between(df.index.min(), df.index.max()))]
+
+
+def _plot_well_liquid(well, df, test_data):
+    figure = render.ReusableFigure.get("liquid", figsize=(10, 5))
+    figure.ax.grid(True)
+    figure.lines([(df.index, df[column], column) for column in df.columns])
+
+    if not test_data.empty:
+        figure.scatter(test_data["WtDate"], test_data["WtTotalFluid"], label="WtTotalFluid", color="red", zorder=5)
+    else:
+        figure.scatter(None, None)
+
+    figure.save(f"plots/{well}_plot_liquid.png", f"Data for Well: {well}", "Datetime", "Value")
+
+
+def plot_liquid_rate(well_dfs, tests, max_workers=1, cache=None):
     """
     Plot liquid rate data for each well along with test data points.
 
     Args:
         well_dfs (dict of pandas.DataFrame): Dictionary with well identifiers as keys and their data as pandas DataFrames.
         tests (pandas.DataFrame): DataFrame containing test data with columns 'WtDate', 'well', and 'WtTotalFluid'.
+        max_workers (int): Rendering processes, None for the CPU count. 1 renders in this process.
+        cache (PlotCache): Skip wells whose figure is already rendered from the same data, None renders all.
 
     Saves:
         PNG files: Each plot is saved as a PNG file in a directory named 'plots'.
     """
     tests["WtDate"] = tests["WtDate"].dt.tz_localize(None)
+    jobs = []
     for well, df in well_dfs.items():
-        plt.figure(figsize=(10, 5))
         df.index = df.index.tz_localize(None)
+        jobs.append((well, df, _well_tests(tests, well, df)))
 
-        for column in df.columns:
-            plt.plot(df.index, df[column], label=column)
+    paths = [f"plots/{well}_plot_liquid.png" for well, _, _ in jobs]
+    render.render_jobs(_plot_well_liquid, jobs, max_workers, paths, cache)
 
-        test_data = tests[(tests["well"] == well) & (tests["WtDate"].between(df.index.min(), df.index.max()))]
 
-        if not test_data.empty:
-            plt.scatter(test_data["WtDate"], test_data["WtTotalFluid"], color="red", label="WtTotalFluid", zorder=5)
+def _plot_well_liquid2(well, df, test_data):
+    # the secondary y-axis holds the WtTotalFluid data and shares the x-axis
+    figure = render.ReusableFigure.get("liquid2", figsize=(10, 5), twin=True)
+    figure.ax.grid(True)
+    figure.lines([(df.index, df[column], column) for column in df.columns])
 
-        plt.title(f"Data for Well: {well}")
-        plt.xlabel("Datetime")
-        plt.ylabel("Value")
-        plt.legend()
-        plt.grid(True)
-        plt.tight_layout()
-        plt.savefig(f"plots/{well}_plot_liquid.png")  # Save the plot as a PNG file
-        # plt.show()
-        plt.close()
+    if not test_data.empty:
+        # Plot the WtTotalFluid data on the secondary y-axis
+        figure.scatter(
+            test_data["WtDate"], test_data["WtTotalFluid"], label="WtTotalFluid", ax=figure.ax2, color="red", zorder=5
+        )
+        figure.ax2.set_ylabel("WtTotalFluid")  # Label for the secondary y-axis
+    else:
+        figure.scatter(None, None, ax=figure.ax2)
+        figure.ax2.set_ylabel("")
 
+    # the legend combines both y-axes
+    figure.save(f"plots/{well}_plot_liquid2.png", f"Data for Well: {well}", "Datetime", "Value", legend_loc="upper left")
 
-def plot_liquid_rate2(well_dfs, tests):
+
+def plot_liquid_rate2(well_dfs, tests, max_workers=1, cache=None):
     """
     Plot liquid rate data for each well with a secondary axis for test data points.
 
     Args:
         well_dfs (dict of pandas.DataFrame): Dictionary with well identifiers as keys and their data as pandas DataFrames.
         tests (pandas.DataFrame): DataFrame containing test data with columns 'WtDate', 'well', and 'WtTotalFluid'.
+        max_workers (int): Rendering processes, None for the CPU count. 1 renders in this process.
+        cache (PlotCache): Skip wells whose figure is already rendered from the same data, None renders all.
 
     Saves:
         PNG files: Each plot is saved as a PNG file in a directory named 'plots', showing dual y-axes for well data and test data.
     """
     tests["WtDate"] = tests["WtDate"].dt.tz_localize(None)
 
+    jobs = []
     for well, df in well_dfs.items():
-        plt.figure(figsize=(10, 5))
         df.index = df.index.tz_localize(None)
-
-        # Create the primary y-axis for the liquid rate data
-        ax1 = plt.gca()  # Get the current axes instance
-
-        for column in df.columns:
-            ax1.plot(df.index, df[column], label=column)
-
-        # Set labels and title for the primary y-axis
-        ax1.set_xlabel("Datetime")
-        ax1.set_ylabel("Value")
-        ax1.set_title(f"Data for Well: {well}")
-        ax1.grid(True)
-
-        # Create the secondary y-axis for the WtTotalFluid data
-        ax2 = ax1.twinx()  # Create a second y-axis that shares the same x-axis
-
         # Filter the test data for the current well and within the date range
-        test_data = tests[(tests["well"] == well) & (tests["WtDate"].between(df.index.min(), df.index.max()))]
+        jobs.append((well, df, _well_tests(tests, well, df)))
 
-        if not test_data.empty:
-            # Plot the WtTotalFluid data on the secondary y-axis
-            ax2.scatter(test_data["WtDate"], test_data["WtTotalFluid"], color="red", label="WtTotalFluid", zorder=5)
-            ax2.set_ylabel("WtTotalFluid")  # Label for the secondary y-axis
+    paths = [f"plots/{well}_plot_liquid2.png" for well, _, _ in jobs]
+    render.render_jobs(_plot_well_liquid2, jobs, max_workers, paths, cache)
 
-        # Add legends for both y-axes
-        lines_1, labels_1 = ax1.get_legend_handles_labels()
-        lines_2, labels_2 = ax2.get_legend_handles_labels()
-        ax1.legend(lines_1 + lines_2, labels_1 + labels_2, loc="upper left")
 
-        plt.tight_layout()
+def _plot_well_whp_liquid(well, test_data):
+    figure = render.ReusableFigure.get("whp_liquid", figsize=(10, 5))
+    figure.ax.grid(True)
 
-        # Save the plot as a PNG file
-        plt.savefig(f"plots/{well}_plot_liquid2.png")
+    if not test_data.empty:
+        figure.scatter(test_data["TubingPress"], test_data["WtTotalFluid"])
+    else:
+        figure.scatter(None, None)
 
-        # Uncomment the next line if you want to display the plot
-        # plt.show()
+    figure.save(
+        f"plots/{well}_whp_liq.png", f"Data for Well: {well}", "wellhead pressure during test", "Total Fluid", legend=False
+    )
 
-        plt.close()
 
-
-def plot_whp_vs_liquid(well_dfs, tests):
+def plot_whp_vs_liquid(well_dfs, tests, max_workers=1, cache=None):
     """
     Plot wellhead pressure versus total fluid for each well during test periods.
 
     Args:
         well_dfs (dict of pandas.DataFrame): Dictionary with well identifiers as keys and their data as pandas DataFrames.
         tests (pandas.DataFrame): DataFrame containing test data with columns 'WtDate', 'well', 'TubingPress', and 'WtTotalFluid'.
+        max_workers (int): Rendering processes, None for the CPU count. 1 renders in this process.
+        cache (PlotCache): Skip wells whose figure is already rendered from the same data, None renders all.
 
     Saves:
         PNG files: Each plot is saved as a PNG file in a directory named 'plots'.
     """
-    # Initialize a DataFrame to store the coefficients
-    # coefficients_list = []
-
     tests["WtDate"] = tests["WtDate"].dt.tz_localize(None)
 
-    # well dfs, just informs what to plot
-    for well, df in well_dfs.items():
-        plt.figure(figsize=(10, 5))
-        test_data = tests[(tests["well"] == well) & (tests["WtDate"].between(df.index.min(), df.index.max()))]
-
-        if not test_data.empty:
-            plt.scatter(test_data["TubingPress"], test_data["WtTotalFluid"])
-
-        plt.title(f"Data for Well: {well}")
-        plt.xlabel("wellhead pressure during test")
-        plt.ylabel("Total Fluid")
-        plt.legend()
-        plt.grid(True)
-        plt.tight_layout()
-        plt.savefig(f"plots/{well}_whp_liq.png")  # Save the plot as a PNG file
-        # plt.show()
-        plt.close()
+    # well dfs, just informs what to plot, only the tests are sent to the workers
+    jobs = [(well, _well_tests(tests, well, df)) for well, df in well_dfs.items()]
+    paths = [f"plots/{well}_whp_liq.png" for well, _ in jobs]
+    render.render_jobs(_plot_well_whp_liquid, jobs, max_workers, paths, cache)
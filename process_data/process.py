@@ -1,38 +1,57 @@
+import logging
 import pickle
 from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
 
+from process_data.instrument import instrumented
 
+logger = logging.getLogger(__name__)
+
+
+@instrumented()
 def proc_scada(raw_data, tag_dict: Dict[str, List[str]]) -> Dict[str, pd.DataFrame]:
     """
-    Processes SCADA data from a pickle file, filters and pivots it based on tags from tag_dict,
-    and saves the processed dataframes to a pickle file.
+    Splits the long SCADA query result into one pivoted DataFrame per well.
+
+    Rows are grouped by tag once and each well's frame is built from its own tags, so the raw data
+    is neither copied nor scanned again for every well.
 
     Args:
-        pkl_path (str): The file path to the pickle file containing raw SCADA data.
+        raw_data (pd.DataFrame): Long SCADA data with datetime, tag and value columns, e.g. from pull_tags.query_tag.
         tag_dict (Dict[str, Tuple[str, str, str]]): A dictionary mapping well names to tuples of tags
             (BHP tag, header pressure tag, WHP tag).
 
     Returns:
-        None: This function does not return anything but saves the processed dataframes to 'well_dataframes.pkl'.
+        Dict[str, pd.DataFrame]: BHP, HeaderP and WHP columns per well, indexed by datetime. Wells
+                                 without data are left out, an empty dict if the data could not be pivoted.
     """
     try:
-        # raw_data = pd.read_pickle(pkl_path)
-        data_copy = raw_data.copy()
-        data_copy["datetime"] = pd.to_datetime(data_copy["datetime"])
+        tags = {tag for well_tags in tag_dict.values() for tag in well_tags}
+        rows = raw_data["tag"].isin(tags)
+        data = raw_data if rows.all() else raw_data[rows]
+        datetimes = pd.DatetimeIndex(pd.to_datetime(data["datetime"]), name="datetime")
+        values = data["value"].to_numpy()
+
+        series = {}
+        for tag, index in data.groupby("tag", sort=False, observed=True).indices.items():
+            tag_series = pd.Series(values[index], index=datetimes[index])
+            if not tag_series.index.is_unique:
+                raise ValueError(f"Tag {tag} has duplicate timestamps, cannot reshape")
+            series[tag] = tag_series
 
         well_dataframes = {}
 
         for well_name, (bhp_tag, header_pressure_tag, whp_tag) in tag_dict.items():
-            filtered_data = data_copy[data_copy["tag"].isin([bhp_tag, header_pressure_tag, whp_tag])]
-            if not filtered_data.empty:
-                pivoted_data = filtered_data.pivot(index="datetime", columns="tag", values="value")
+            present = sorted({bhp_tag, header_pressure_tag, whp_tag} & series.keys())
+            if present:
+                pivoted_data = pd.concat([series[tag] for tag in present], axis=1, keys=present, names=["tag"])
+                pivoted_data = pivoted_data.sort_index()
                 column_mapping = {bhp_tag: "BHP", header_pressure_tag: "HeaderP", whp_tag: "WHP"}
                 pivoted_data.rename(columns=column_mapping, inplace=True)
                 well_dataframes[well_name] = pivoted_data
 
         return well_dataframes
     except Exception as e:
-        print(f"An error occurred: {e}")
+        logger.error("An error occurred: %s", e)
         return {}
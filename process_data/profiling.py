@@ -0,0 +1,205 @@
+import cProfile
+import logging
+import os
+import pstats
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = "results/profiles"
+PROFILERS = ("cprofile", "pyinstrument")
+
+# stage names to profile, "all" profiles every stage; None means profiling is off
+_selected: Optional[Set[str]] = None
+_profile_dir = PROFILE_DIR
+_profiler = "cprofile"
+# one profiler per stage, reused so a stage called once per well accumulates all its calls
+_profilers: Dict[str, object] = {}
+_active: Optional[str] = None
+
+
+def configure(
+    stages: Optional[Iterable[str]] = None, profile_dir: Optional[str] = None, profiler: Optional[str] = None
+) -> None:
+    """
+    Choose the stages to profile, by default from the environment.
+
+    HPI_PROFILE is a comma separated list of stage names as they appear in the run report, e.g.
+    "ipr,calc_PI_RP.calc_optimal_RP", or "all". HPI_PROFILE_DIR and HPI_PROFILER override the output
+    folder and the profiler.
+
+    Args:
+        stages (Iterable[str]): Stage names, "all" for every stage, empty to turn profiling off
+        profile_dir (str): Folder for the .pstats and .folded files
+        profiler (str): "cprofile" or "pyinstrument", the sampling profiler if it is installed
+    """
+    global _selected, _profile_dir, _profiler
+    if stages is None:
+        stages = [name.strip() for name in os.environ.get("HPI_PROFILE", "").split(",") if name.strip()]
+    stages = set(stages)
+    _selected = stages or None
+    _profile_dir = profile_dir or os.environ.get("HPI_PROFILE_DIR", PROFILE_DIR)
+    _profiler = profiler or os.environ.get("HPI_PROFILER", "cprofile")
+    if _profiler not in PROFILERS:
+        raise ValueError(f"Unknown profiler {_profiler}, use one of {PROFILERS}")
+    if _profiler == "pyinstrument":
+        try:
+            import pyinstrument  # noqa: F401
+        except ImportError:
+            logger.warning("pyinstrument is not installed, profiling with cProfile")
+            _profiler = "cprofile"
+    _profilers.clear()
+
+
+def selected(name: str) -> bool:
+    """True if the stage is profiled."""
+    return _selected is not None and ("all" in _selected or name in _selected)
+
+
+@contextmanager
+def profile(name: str):
+    """
+    Profile a block of work if its stage is selected, writing the results when the block ends.
+
+    A stage nested in a profiled stage is part of the outer profile, only one profiler runs at a time.
+    """
+    global _active
+    if _active is not None or not selected(name):
+        yield
+        return
+
+    _active = name
+    profiler = _profilers.get(name)
+    if profiler is None:
+        profiler = _profilers[name] = _new_profiler()
+    _start(profiler)
+    try:
+        yield
+    finally:
+        _stop(profiler)
+        _active = None
+        _write(name, profiler)
+
+
+def _new_profiler():
+    if _profiler == "pyinstrument":
+        from pyinstrument import Profiler
+
+        return Profiler(interval=0.001)
+    return cProfile.Profile()
+
+
+def _start(profiler) -> None:
+    if isinstance(profiler, cProfile.Profile):
+        profiler.enable()
+    else:
+        profiler.start()
+
+
+def _stop(profiler) -> None:
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+    else:
+        profiler.stop()
+
+
+def _file_stem(name: str) -> str:
+    safe = "".join(char if char.isalnum() or char in "._-" else "_" for char in name)
+    return os.path.join(_profile_dir, safe)
+
+
+def _write(name: str, profiler) -> None:
+    os.makedirs(_profile_dir, exist_ok=True)
+    stem = _file_stem(name)
+    if isinstance(profiler, cProfile.Profile):
+        profiler.dump_stats(f"{stem}.pstats")
+        stacks = collapse_pstats(pstats.Stats(profiler))
+    else:
+        session = profiler.last_session
+        with open(f"{stem}.html", "w") as handle:
+            handle.write(profiler.output_html())
+        stacks = collapse_pyinstrument(session.root_frame())
+    write_folded(stacks, f"{stem}.folded")
+    logger.info("profile of %s written to %s", name, stem)
+
+
+def _label(func) -> str:
+    filename, line, function = func
+    if filename == "~":
+        # builtins, e.g. <method 'sort' of 'list' objects>
+        return function
+    return f"{function} ({os.path.basename(filename)}:{line})"
+
+
+def collapse_pstats(stats: pstats.Stats, max_depth: int = 64, min_time: float = 1e-5) -> Dict[str, float]:
+    """
+    Collapsed stacks from a cProfile result, for flamegraph.pl or speedscope.
+
+    cProfile only keeps caller -> callee edges, not whole stacks, so a function's time is split over
+    its callers in proportion to the time each call edge took. Recursive calls are cut at the first
+    repeat.
+
+    Args:
+        stats (pstats.Stats): Profile to collapse
+        max_depth (int): Deepest stack written
+        min_time (float): Branches taking less time than this, in seconds, are dropped
+
+    Returns:
+        Dict[str, float]: Self time in seconds of each "root;caller;...;function" stack
+    """
+    entries = stats.stats
+    callees: Dict[tuple, List[tuple]] = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller in callers:
+            callees.setdefault(caller, []).append(func)
+    roots = [func for func, entry in entries.items() if not entry[4] or all(c not in entries for c in entry[4])]
+
+    stacks: Dict[str, float] = {}
+
+    def walk(func, path: List[str], seen: Set[tuple], scale: float) -> None:
+        self_time = entries[func][2]
+        path = path + [_label(func)]
+        stack = ";".join(path)
+        stacks[stack] = stacks.get(stack, 0.0) + self_time * scale
+        if len(path) >= max_depth:
+            return
+        for callee in callees.get(func, []):
+            if callee in seen:
+                continue
+            callee_total = entries[callee][3]
+            edge_total = entries[callee][4][func][3]
+            if callee_total <= 0 or edge_total * scale < min_time:
+                continue
+            walk(callee, path, seen | {callee}, scale * edge_total / callee_total)
+
+    for root in roots:
+        walk(root, [], {root}, 1.0)
+    return stacks
+
+
+def collapse_pyinstrument(frame, path: Optional[List[str]] = None, stacks: Optional[Dict[str, float]] = None):
+    """Collapsed stacks of a pyinstrument frame tree, self time in seconds per stack."""
+    stacks = {} if stacks is None else stacks
+    if frame is None:
+        return stacks
+    path = (path or []) + [f"{frame.function} ({frame.file_path_short}:{frame.line_no})"]
+    self_time = frame.time - sum(child.time for child in frame.children)
+    if self_time > 0:
+        stack = ";".join(path)
+        stacks[stack] = stacks.get(stack, 0.0) + self_time
+    for child in frame.children:
+        collapse_pyinstrument(child, path, stacks)
+    return stacks
+
+
+def write_folded(stacks: Dict[str, float], path: str) -> None:
+    """Write collapsed stacks with microsecond counts, the input of flamegraph.pl and speedscope."""
+    with open(path, "w") as handle:
+        for stack, seconds in sorted(stacks.items()):
+            count = int(round(seconds * 1e6))
+            if count > 0:
+                handle.write(f"{stack} {count}\n")
+
+
+configure()
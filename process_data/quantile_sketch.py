@@ -0,0 +1,227 @@
+import math
+import pickle
+import random
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class KLLSketch:
+    """
+    Mergeable streaming quantile sketch (Karnin, Lang, Liberty 2016).
+
+    Items live in a stack of compactors. An item at level h stands for 2**h original values.
+    When a level overflows it is sorted and every other item is promoted to the next level,
+    which keeps memory at O(k) while the rank error stays around 1.7 / k. The count, sum,
+    min and max are tracked exactly.
+    """
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None):
+        self.k = k
+        self.levels: List[List[float]] = [[]]
+        self.n = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._rng = random.Random(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(int(math.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _size(self) -> int:
+        return sum(len(items) for items in self.levels)
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(level) for level in range(len(self.levels)))
+
+    def _compress(self) -> None:
+        while self._size() > self._max_size():
+            for level, items in enumerate(self.levels):
+                if len(items) >= self._capacity(level):
+                    if level + 1 == len(self.levels):
+                        self.levels.append([])
+                    items.sort()
+                    # an odd item out stays behind so no weight is lost
+                    keep = [items.pop()] if len(items) % 2 else []
+                    offset = self._rng.randint(0, 1)
+                    self.levels[level + 1].extend(items[offset::2])
+                    self.levels[level] = keep
+                    break
+
+    def update(self, value: float) -> None:
+        """Add one value. NaN is ignored."""
+        self.update_many([value])
+
+    def update_many(self, values: Iterable[float]) -> None:
+        """Add a batch of values. NaNs are ignored."""
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        self.n += int(values.size)
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0].extend(values.tolist())
+        self._compress()
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """
+        Fold another sketch into this one, e.g. one built by a different worker.
+
+        Args:
+            other (KLLSketch): Sketch to merge in, left unchanged
+
+        Returns:
+            KLLSketch: self
+        """
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.n += other.n
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _weighted(self):
+        values = np.concatenate([np.asarray(items, dtype=float) for items in self.levels])
+        weights = np.concatenate([np.full(len(items), 2.0**level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        return values[order], weights[order]
+
+    def quantile(self, q):
+        """
+        Approximate quantile(s) of everything added so far.
+
+        Args:
+            q (float or array): Quantile(s) in [0, 1]
+
+        Returns:
+            float or np.ndarray: NaN if the sketch is empty
+        """
+        if self.n == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        values, weights = self._weighted()
+        cumulative = np.cumsum(weights)
+        target = np.asarray(q, dtype=float) * cumulative[-1]
+        idx = np.minimum(np.searchsorted(cumulative, target, side="left"), len(values) - 1)
+        result = values[idx]
+        # the exact extremes are known
+        result = np.where(np.asarray(q) <= 0, self.min, np.where(np.asarray(q) >= 1, self.max, result))
+        return float(result) if np.ndim(q) == 0 else result
+
+    def mean(self) -> float:
+        """Exact mean of everything added so far."""
+        return self.total / self.n if self.n else np.nan
+
+    def range_mean(self, lower: float, upper: float) -> float:
+        """
+        Approximate mean of the values between the lower and upper quantiles (inclusive).
+
+        Args:
+            lower (float): Lower quantile, 0.25 for the interquartile mean
+            upper (float): Upper quantile, 0.75 for the interquartile mean
+
+        Returns:
+            float: NaN if the sketch is empty
+        """
+        if self.n == 0:
+            return np.nan
+        low, high = self.quantile([lower, upper])
+        values, weights = self._weighted()
+        inside = (values >= low) & (values <= high)
+        return float(np.average(values[inside], weights=weights[inside])) if inside.any() else np.nan
+
+
+class StreamingWellStats:
+    """
+    Per well KLL sketches for a set of columns, updated batch by batch and mergeable across workers.
+    """
+
+    def __init__(self, columns: List[str], k: int = 200):
+        self.columns = list(columns)
+        self.k = k
+        self.sketches: Dict[str, Dict[str, KLLSketch]] = {}
+
+    def _well_sketches(self, well: str) -> Dict[str, KLLSketch]:
+        if well not in self.sketches:
+            self.sketches[well] = {column: KLLSketch(self.k) for column in self.columns}
+        return self.sketches[well]
+
+    def register(self, wells: Iterable[str]) -> "StreamingWellStats":
+        """Track wells even before they have any values, so they show up in summaries."""
+        for well in wells:
+            self._well_sketches(well)
+        return self
+
+    def update(self, df: pd.DataFrame, by: str = "Well") -> "StreamingWellStats":
+        """
+        Add new rows, e.g. the latest daily coefficients or well tests.
+
+        Args:
+            df (pd.DataFrame): Rows with the group column and the tracked columns
+            by (str): Column holding the well name
+
+        Returns:
+            StreamingWellStats: self
+        """
+        for well, group in df.groupby(by, sort=False):
+            sketches = self._well_sketches(well)
+            for column in self.columns:
+                sketches[column].update_many(pd.to_numeric(group[column], errors="coerce").to_numpy())
+        return self
+
+    def merge(self, other: "StreamingWellStats") -> "StreamingWellStats":
+        """
+        Fold in the stats of another worker.
+
+        Args:
+            other (StreamingWellStats): Stats over the same columns
+
+        Returns:
+            StreamingWellStats: self
+        """
+        for well, sketches in other.sketches.items():
+            own = self._well_sketches(well)
+            for column in self.columns:
+                own[column].merge(sketches[column])
+        return self
+
+    def summary(self, method: str = "iqr_mean", trim: float = 0.1) -> pd.DataFrame:
+        """
+        Per well statistic from the sketches, in the same layout as aggregate.grouped_stats.
+
+        Args:
+            method (str): mean, median, iqr_mean, trimmed_mean or count
+            trim (float): Fraction cut from each tail for trimmed_mean
+
+        Returns:
+            pd.DataFrame: Indexed by well, one column per tracked column
+        """
+        stats = {
+            "mean": lambda sketch: sketch.mean(),
+            "median": lambda sketch: sketch.quantile(0.5),
+            "iqr_mean": lambda sketch: sketch.range_mean(0.25, 0.75),
+            "trimmed_mean": lambda sketch: sketch.range_mean(trim, 1 - trim),
+            "count": lambda sketch: sketch.n,
+        }
+        if method not in stats:
+            raise ValueError(f"Unknown method {method}")
+
+        wells = sorted(self.sketches)
+        data = {column: [stats[method](self.sketches[well][column]) for well in wells] for column in self.columns}
+        return pd.DataFrame(data, index=pd.Index(wells))
+
+    def save(self, path) -> None:
+        with open(path, "wb") as handle:
+            pickle.dump(self, handle)
+
+    @staticmethod
+    def load(path) -> "StreamingWellStats":
+        with open(path, "rb") as handle:
+            return pickle.load(handle)
@@ -0,0 +1,253 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from process_data import lazy
+from process_data.plot_cache import PlotCache, compose_grid
+
+matplotlib = lazy.module("matplotlib")
+plt = lazy.module("matplotlib.pyplot")
+
+logger = logging.getLogger(__name__)
+
+
+def use_agg() -> None:
+    """Switch matplotlib to the non interactive Agg backend, plots are only ever saved to file."""
+    matplotlib.use("Agg", force=True)
+
+
+class ReusableFigure:
+    """
+    One figure kept open and redrawn for every well instead of building a new figure each time.
+
+    Lines and scatters are created on first use and afterwards only get new data (set_data and
+    set_offsets), unused ones are hidden, and the limits are recomputed from the visible data
+    before saving. Figures are shared per process through get, so every worker of render_jobs
+    builds each kind of figure once.
+    """
+
+    _figures: Dict[str, "ReusableFigure"] = {}
+
+    def __init__(self, figsize=(10, 5), twin: bool = False):
+        self.fig, self.ax = plt.subplots(figsize=figsize)
+        self.ax2 = self.ax.twinx() if twin else None
+        self._lines: Dict[object, list] = {}
+        self._scatters: Dict[object, object] = {}
+        self._texts: Dict[object, object] = {}
+        self._laid_out = False
+
+    @classmethod
+    def get(cls, name: str, figsize=(10, 5), twin: bool = False) -> "ReusableFigure":
+        """The process wide figure for one kind of plot, created on first use."""
+        if name not in cls._figures:
+            cls._figures[name] = cls(figsize, twin)
+        return cls._figures[name]
+
+    @classmethod
+    def close_all(cls) -> None:
+        for figure in cls._figures.values():
+            plt.close(figure.fig)
+        cls._figures.clear()
+
+    def lines(self, series: List[Tuple], ax=None) -> list:
+        """
+        Show one line per (x, y, label, style) tuple, style being a dict of plot keywords used when
+        the line is first created. Extra lines from a previous well are hidden.
+        """
+        ax = ax or self.ax
+        lines = self._lines.setdefault(ax, [])
+        for i, (x, y, label, *style) in enumerate(series):
+            if i < len(lines):
+                lines[i].set_data(x, y)
+            else:
+                # the first plot call also sets the axis units, e.g. dates
+                lines.append(ax.plot(x, y, **(style[0] if style else {}))[0])
+            lines[i].set_label(label)
+            lines[i].set_visible(True)
+        for line in lines[len(series) :]:
+            line.set_visible(False)
+            line.set_label("_hidden")
+        return lines[: len(series)]
+
+    def scatter(self, x, y, label: Optional[str] = None, ax=None, **style):
+        """Show a scatter of x and y, or hide the axes' scatter when x is None."""
+        ax = ax or self.ax
+        scatter = self._scatters.get(ax)
+        if x is None:
+            if scatter is not None:
+                scatter.set_visible(False)
+                scatter.set_label("_hidden")
+            return scatter
+
+        if scatter is None:
+            scatter = self._scatters[ax] = ax.scatter(x, y, **style)
+        else:
+            scatter.set_offsets(np.column_stack([ax.convert_xunits(np.asarray(x)), ax.convert_yunits(np.asarray(y))]))
+        scatter.set_visible(True)
+        scatter.set_label(label if label is not None else "_nolegend_")
+        return scatter
+
+    def text(self, x, y, s: str, ax=None, **style):
+        ax = ax or self.ax
+        if ax not in self._texts:
+            self._texts[ax] = ax.text(x, y, s, **style)
+        self._texts[ax].set_text(s)
+        return self._texts[ax]
+
+    def _rescale(self, ax) -> None:
+        ax.relim(visible_only=True)
+        # relim skips collections, add the scatter points by hand
+        scatter = self._scatters.get(ax)
+        if scatter is not None and scatter.get_visible() and len(scatter.get_offsets()):
+            ax.update_datalim(scatter.get_offsets())
+        ax.autoscale_view()
+
+    def save(
+        self,
+        path: str,
+        title: str,
+        xlabel: str,
+        ylabel: str,
+        legend: bool = True,
+        legend_loc: str = "best",
+        relayout: bool = False,
+    ):
+        """
+        Reset the limits to the new data, relabel and save.
+
+        The tight layout is worked out for the first well and kept, it costs a full extra draw.
+        relayout=True recomputes it, e.g. when tick labels get much wider.
+        """
+        axes = [self.ax] if self.ax2 is None else [self.ax, self.ax2]
+        for ax in axes:
+            self._rescale(ax)
+        self.ax.set_title(title)
+        self.ax.set_xlabel(xlabel)
+        self.ax.set_ylabel(ylabel)
+        if self.ax.get_legend() is not None:
+            self.ax.get_legend().remove()
+        if legend:
+            handles, labels = [], []
+            for ax in axes:
+                ax_handles, ax_labels = ax.get_legend_handles_labels()
+                handles += ax_handles
+                labels += ax_labels
+            self.ax.legend(handles, labels, loc=legend_loc)
+        if relayout or not self._laid_out:
+            self.fig.tight_layout()
+            self._laid_out = True
+        self.fig.savefig(path)
+
+
+def _call(job: Tuple[Callable, tuple]) -> Tuple[bool, object]:
+    # one bad well is logged and skipped, as the plotting loops always did, instead of stopping the rest
+    func, args = job
+    try:
+        return True, func(*args)
+    except Exception:
+        logger.exception("%s failed for %s", func.__name__, args[0] if args else "job")
+        return False, None
+
+
+def render_jobs(
+    func: Callable,
+    jobs: Iterable[tuple],
+    max_workers: Optional[int] = 1,
+    paths: Optional[List[str]] = None,
+    cache: Optional[PlotCache] = None,
+) -> List:
+    """
+    Render one figure per job on a process pool running the Agg backend.
+
+    func must be a module level function so it can be pickled, and each job is the tuple of
+    arguments for one call, e.g. (well, df). Results come back in job order.
+
+    On Windows the workers re-import the calling script, so scripts that render in parallel
+    need an if __name__ == "__main__" guard. The default max_workers=1 renders in this process,
+    more workers are opt in.
+
+    A job that raises is logged and its result is None, the other jobs still render.
+
+    With a cache, jobs whose file in paths is still current are skipped (their result is None)
+    and the manifest is updated after rendering.
+
+    Args:
+        func (Callable): Plot function that creates, saves and closes one figure
+        jobs (Iterable[tuple]): Arguments for each call
+        max_workers (int): Worker processes, None for the CPU count
+        paths (List[str]): File each job writes, required with a cache
+        cache (PlotCache): Manifest of rendered figures
+
+    Returns:
+        list: func's return value for each job, None for jobs that failed
+    """
+    jobs = [(func, tuple(args)) for args in jobs]
+    if cache is None:
+        return [result for _, result in _render(jobs, max_workers)]
+
+    keys = [cache.key(func, *args) for _, args in jobs]
+    stale = [i for i, (path, key) in enumerate(zip(paths, keys)) if not cache.is_current(path, key)]
+    results = [None] * len(jobs)
+    for i, (ok, result) in zip(stale, _render([jobs[i] for i in stale], max_workers)):
+        results[i] = result
+        # a failed figure stays stale so the next run tries it again
+        if ok:
+            cache.record(paths[i], keys[i])
+    if stale:
+        cache.save()
+    return results
+
+
+def render_grid(
+    func: Callable,
+    jobs: Iterable[tuple],
+    paths: List[str],
+    grid_path: str,
+    max_workers: Optional[int] = 1,
+    cache: Optional[PlotCache] = None,
+) -> List:
+    """
+    Render the panels of a grid image with render_jobs and paste them together, see plot_cache.compose_grid.
+
+    Panels without an image, e.g. a well that failed to draw, are left out of the grid. With a cache
+    only changed panels are redrawn and the grid is only rebuilt when one of them was.
+
+    Args:
+        func (Callable): Plot function that draws one panel
+        jobs (Iterable[tuple]): Arguments for each panel in grid order
+        paths (List[str]): File each panel is saved to
+        grid_path (str): Grid image to write
+        max_workers (int): Worker processes, None for the CPU count
+        cache (PlotCache): Manifest of rendered panels
+
+    Returns:
+        list: func's return value for each panel, as render_jobs
+    """
+    results = render_jobs(func, jobs, max_workers, paths, cache)
+    paths = [path for path in paths if os.path.exists(path)]
+    if cache is None:
+        compose_grid(paths, grid_path)
+    else:
+        cache.compose_grid(paths, grid_path)
+    return results
+
+
+def _render(jobs: List[Tuple[Callable, tuple]], max_workers: Optional[int]) -> List[Tuple[bool, object]]:
+    if not jobs:
+        return []
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    if max_workers == 1:
+        use_agg()
+        try:
+            return [_call(job) for job in jobs]
+        finally:
+            ReusableFigure.close_all()
+
+    # a few jobs per task keeps the pickling overhead down without starving workers at the end
+    chunksize = max(1, len(jobs) // (max_workers * 4))
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=use_agg) as pool:
+        return list(pool.map(_call, jobs, chunksize=chunksize))
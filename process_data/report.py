@@ -0,0 +1,137 @@
+import logging
+import os
+from typing import Dict, List
+
+import pandas as pd
+
+from process_data import lazy
+
+logger = logging.getLogger(__name__)
+
+# optional dependency, only needed when a report is written
+xlsxwriter = lazy.module("xlsxwriter")
+
+DATE_FORMAT = "yyyy-mm-dd"
+DATETIME_FORMAT = "yyyy-mm-dd hh:mm"
+# Excel limits
+MAX_ROWS = 1048576
+MAX_SHEET_NAME = 31
+
+
+def sheet_table(df: pd.DataFrame) -> pd.DataFrame:
+    """The table as it goes on a sheet: a named or non default index becomes the first columns."""
+    if isinstance(df.index, pd.RangeIndex) and df.index.name is None:
+        return df
+    return df.reset_index()
+
+
+def sidecar_path(workbook_path: str, sheet: str) -> str:
+    """Parquet copy of a sheet, <workbook without .xlsx>_sheets/<sheet>.parquet."""
+    return os.path.join(f"{os.path.splitext(workbook_path)[0]}_sheets", f"{sheet}.parquet")
+
+
+def _rows(df: pd.DataFrame, chunk_rows: int = 10000):
+    # plain Python values for xlsxwriter, missing values become empty cells, a chunk at a time
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start : start + chunk_rows].astype(object)
+        yield from chunk.where(chunk.notna(), None).to_numpy().tolist()
+
+
+def _has_time(values: pd.Series) -> bool:
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        return False
+    values = values.dropna()
+    return bool((values.dt.normalize() != values).any())
+
+
+def _write_sheet(workbook, name: str, df: pd.DataFrame, header_format, time_format) -> None:
+    worksheet = workbook.add_worksheet(name)
+    worksheet.write_row(0, 0, [str(column) for column in df.columns], header_format)
+    worksheet.freeze_panes(1, 0)
+    # dates get the workbook's date format, timestamps with a time of day keep it
+    timed = [i for i, column in enumerate(df.columns) if _has_time(df[column])]
+    # constant_memory flushes each row once the next one starts, so rows are written in order
+    for row, values in enumerate(_rows(df), start=1):
+        worksheet.write_row(row, 0, values)
+        for col in timed:
+            if values[col] is not None:
+                worksheet.write_datetime(row, col, values[col], time_format)
+
+
+def write_report(path: str, sheets: Dict[str, pd.DataFrame], sidecar: bool = True) -> List[str]:
+    """
+    Write result tables to an xlsx workbook, one sheet per table, with a constant memory streaming writer.
+
+    Only the row being written is held by the writer, so large lookup tables do not blow up memory
+    the way building the workbook in pandas does. With sidecar each sheet is also saved as Parquet
+    next to the workbook, read_sheet picks it up instead of parsing the workbook.
+
+    Needs xlsxwriter, and pyarrow for the sidecar.
+
+    Args:
+        path (str): Workbook to write, replaced if it exists
+        sheets (Dict[str, pd.DataFrame]): Tables by sheet name, names are cut to Excel's 31 characters
+        sidecar (bool): Also write the Parquet copies
+
+    Returns:
+        List[str]: Sheet names as written
+    """
+    tables = {}
+    for name, df in sheets.items():
+        if df is None:
+            continue
+        sheet = name[:MAX_SHEET_NAME]
+        if sheet in tables:
+            raise ValueError(f"Sheet name {sheet} is used twice in {path}")
+        df = sheet_table(df)
+        if len(df) >= MAX_ROWS:
+            logger.warning("%s: %s cut to %d rows, the Parquet sidecar has all of them", path, sheet, MAX_ROWS - 1)
+        tables[sheet] = df
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    workbook = xlsxwriter.Workbook(
+        path,
+        {
+            "constant_memory": True,
+            "default_date_format": DATE_FORMAT,
+            "remove_timezone": True,
+        },
+    )
+    header_format = workbook.add_format({"bold": True})
+    time_format = workbook.add_format({"num_format": DATETIME_FORMAT})
+    try:
+        for sheet, df in tables.items():
+            _write_sheet(workbook, sheet, df.iloc[: MAX_ROWS - 1], header_format, time_format)
+    finally:
+        workbook.close()
+
+    if sidecar:
+        for sheet, df in tables.items():
+            sheet_path = sidecar_path(path, sheet)
+            os.makedirs(os.path.dirname(sheet_path), exist_ok=True)
+            df.to_parquet(sheet_path, index=False)
+    logger.info("%s: %d sheets written", path, len(tables))
+    return list(tables)
+
+
+def read_sheet(workbook_path: str, sheet: str) -> pd.DataFrame:
+    """
+    One sheet of a workbook, from its Parquet sidecar when that is at least as new as the workbook.
+
+    Workbooks edited by hand after the report was written, or built without write_report, are read
+    with pd.read_excel.
+
+    Args:
+        workbook_path (str): xlsx workbook
+        sheet (str): Sheet name
+
+    Returns:
+        pd.DataFrame: The sheet's table
+    """
+    sheet_path = sidecar_path(workbook_path, sheet)
+    if os.path.exists(sheet_path) and (
+        not os.path.exists(workbook_path) or os.path.getmtime(sheet_path) >= os.path.getmtime(workbook_path)
+    ):
+        return pd.read_parquet(sheet_path)
+    logger.debug("%s: no current sidecar for %s, reading the workbook", workbook_path, sheet)
+    return pd.read_excel(workbook_path, sheet_name=sheet)
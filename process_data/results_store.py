@@ -0,0 +1,221 @@
+import datetime
+import glob
+import json
+import logging
+import os
+import uuid
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from process_data import lazy
+from well_config import well_pad
+
+logger = logging.getLogger(__name__)
+
+# optional dependency, only needed once results are stored or read
+pa = lazy.module("pyarrow")
+pq = lazy.module("pyarrow.parquet")
+ds = lazy.module("pyarrow.dataset")
+
+DATASET_DIR = os.path.join("results", "dataset")
+# artifact first, so reading one artifact only lists its own folder
+PARTITIONS = ["artifact", "pad", "run_date"]
+RUN_COLUMNS = ["run_id", "run_time", "analysis"]
+WELL_COLUMNS = ["Well", "well"]
+NO_PAD = "all"
+METADATA_KEY = b"hpi.run"
+
+
+def _typed(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Copy of df with one type per column: named indexes become columns, date objects become
+    timestamps and other object columns strings, so every append of an artifact has the same schema.
+    """
+    named = any(name is not None for name in df.index.names)
+    df = df.reset_index(drop=not named)
+    df.columns = [str(column) for column in df.columns]
+    for column in df.columns:
+        values = df[column]
+        if values.dtype != object:
+            continue
+        present = values.dropna()
+        if len(present) and present.map(lambda value: isinstance(value, (datetime.date, pd.Timestamp))).all():
+            df[column] = pd.to_datetime(values)
+        else:
+            df[column] = values.astype("string")
+    return df
+
+
+def _pads(df: pd.DataFrame, pad: Optional[str]) -> pd.Series:
+    for column in WELL_COLUMNS:
+        if column in df.columns:
+            pads = df[column].map(lambda well: well_pad(well) if isinstance(well, str) else None)
+            return pads.replace("", None).fillna(pad or NO_PAD)
+    return pd.Series(pad or NO_PAD, index=df.index)
+
+
+class ResultsStore:
+    """
+    Append only Parquet dataset of result tables, hive partitioned as
+    artifact=<name>/pad=<letter>/run_date=<date>/<run id>-<n>.parquet.
+
+    Every write adds new files and never replaces old ones, so each run's results stay next to the
+    earlier ones. Rows carry the run_id, run_time and analysis of the run that wrote them, and the
+    run's params are kept in the Parquet file metadata. The pad of a row comes from its Well or
+    well column, tables without one go to pad=all.
+
+    Needs pyarrow.
+    """
+
+    def __init__(
+        self,
+        root: str = DATASET_DIR,
+        run_date: Optional[str] = None,
+        analysis: str = "",
+        params: Optional[Dict] = None,
+        run_id: Optional[str] = None,
+    ):
+        self.root = root
+        self.run_date = run_date or datetime.date.today().isoformat()
+        self.analysis = analysis
+        self.params = dict(params or {})
+        self.run_time = pd.Timestamp.now(tz="UTC").floor("s")
+        self.run_id = run_id or f"{self.run_time:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self._files = 0
+
+    def _schema(self, artifact: str):
+        """Schema of an earlier file of the artifact, None for a new artifact."""
+        earlier = next(glob.iglob(os.path.join(self.root, f"artifact={artifact}", "*", "*", "*.parquet")), None)
+        return pq.read_schema(earlier) if earlier else None
+
+    def _conform(self, table, artifact: str):
+        # columns get the type they were first stored with, e.g. a column that is all NaN this run
+        schema = self._schema(artifact)
+        if schema is None:
+            return table
+        for i, field in enumerate(table.schema):
+            index = schema.get_field_index(field.name)
+            if index < 0 or schema.field(index).type == field.type:
+                continue
+            try:
+                table = table.set_column(i, field.name, table.column(i).cast(schema.field(index).type))
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as error:
+                logger.warning("%s: column %s kept as %s, %s", artifact, field.name, field.type, error)
+        return table
+
+    def write(self, df: pd.DataFrame, artifact: str, pad: Optional[str] = None) -> List[str]:
+        """
+        Append a result table to the dataset.
+
+        Args:
+            df (pd.DataFrame): Result table, long format with one row per well and key
+            artifact (str): Table name, e.g. merged_tests
+            pad (str): Pad of rows without a well, defaults to all
+
+        Returns:
+            List[str]: Files written, one per pad
+        """
+        if df is None or df.empty:
+            return []
+        df = _typed(df)
+        pads = _pads(df, pad)
+        df = df.assign(run_id=self.run_id, run_time=self.run_time, analysis=self.analysis)
+        metadata = {
+            METADATA_KEY: json.dumps(
+                {
+                    "run_id": self.run_id,
+                    "run_time": self.run_time.isoformat(),
+                    "analysis": self.analysis,
+                    "params": self.params,
+                },
+                default=str,
+            ).encode()
+        }
+
+        paths = []
+        for pad_name, rows in df.groupby(pads, sort=True):
+            table = pa.Table.from_pandas(rows, preserve_index=False)
+            table = self._conform(table, artifact)
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+            folder = os.path.join(self.root, f"artifact={artifact}", f"pad={pad_name}", f"run_date={self.run_date}")
+            os.makedirs(folder, exist_ok=True)
+            self._files += 1
+            path = os.path.join(folder, f"{self.run_id}-{self._files}.parquet")
+            pq.write_table(table, path)
+            paths.append(path)
+        logger.debug("%s: %d rows stored in %d files", artifact, len(df), len(paths))
+        return paths
+
+    def write_tables(self, tables: Dict[str, pd.DataFrame], pad: Optional[str] = None) -> None:
+        """Append several result tables, keyed by artifact name."""
+        for artifact, df in tables.items():
+            self.write(df, artifact, pad)
+
+
+def _in(field: str, values: Optional[Iterable]):
+    if values is None:
+        return None
+    return ds.field(field).isin([str(value) for value in values])
+
+
+def read_results(
+    artifact: str,
+    root: str = DATASET_DIR,
+    pads: Optional[Iterable[str]] = None,
+    run_dates: Optional[Iterable[str]] = None,
+    run_ids: Optional[Iterable[str]] = None,
+    columns: Optional[List[str]] = None,
+    filter=None,
+) -> pd.DataFrame:
+    """
+    Read one artifact of the results dataset.
+
+    pads and run_dates only open the matching partition folders, run_ids and filter (a
+    pyarrow.dataset expression, e.g. ds.field("Well") == "MPB-28") are pushed down to the files.
+
+    Args:
+        artifact (str): Table name used when writing
+        root (str): Dataset folder
+        pads (Iterable[str]): Pad letters to read, all if None
+        run_dates (Iterable[str]): Run dates to read, YYYY-MM-DD, all if None
+        run_ids (Iterable[str]): Runs to read, all if None
+        columns (List[str]): Columns to read, all if None. pad and run_date are columns too.
+        filter: Extra pyarrow.dataset expression
+
+    Returns:
+        pd.DataFrame: Rows of every matching run with pad, run_date and the run columns
+    """
+    folder = os.path.join(root, f"artifact={artifact}")
+    if not os.path.isdir(folder):
+        raise FileNotFoundError(f"No results stored for {artifact} in {root}")
+    partitioning = ds.partitioning(pa.schema([("pad", pa.string()), ("run_date", pa.string())]), flavor="hive")
+    dataset = ds.dataset(folder, format="parquet", partitioning=partitioning)
+
+    expression = None
+    for condition in (_in("pad", pads), _in("run_date", run_dates), _in("run_id", run_ids), filter):
+        if condition is not None:
+            expression = condition if expression is None else expression & condition
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+
+def list_runs(root: str = DATASET_DIR) -> pd.DataFrame:
+    """
+    Runs stored in the dataset, one row per run and artifact.
+
+    Returns:
+        pd.DataFrame: artifact, run_id, run_time, analysis, run_date, pads and rows
+    """
+    runs = []
+    for folder in sorted(glob.glob(os.path.join(root, "artifact=*"))):
+        artifact = os.path.basename(folder).split("=", 1)[1]
+        table = read_results(artifact, root, columns=["run_id", "run_time", "analysis", "run_date", "pad"])
+        if table.empty:
+            continue
+        grouped = table.groupby(["run_id", "run_time", "analysis", "run_date"], sort=True)
+        summary = grouped["pad"].agg(pads=lambda pads: ",".join(sorted(set(pads))), rows="size").reset_index()
+        summary.insert(0, "artifact", artifact)
+        runs.append(summary)
+    if not runs:
+        return pd.DataFrame(columns=["artifact", "run_id", "run_time", "analysis", "run_date", "pads", "rows"])
+    return pd.concat(runs, ignore_index=True)
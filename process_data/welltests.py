@@ -54,7 +54,8 @@ class FDCProcessor:
             "WtrLift",
             "WtTotalFluid",
         ]:
-            df[column] = df[column].str.replace(",", "").fillna(0).astype(float)
+            # thousands separators make these text, columns with only small values are read as numbers
+            df[column] = pd.to_numeric(df[column].astype("string").str.replace(",", "")).astype(float).fillna(0)
 
         # Store the result in the instance variable
         # df = df[df["well"] == well]
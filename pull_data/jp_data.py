@@ -1,13 +1,19 @@
+import logging
 import multiprocessing
 import os
 from pathlib import Path
 from typing import Any, Dict, List
 
 import pandas as pd
-from databricks import sql
-from dotenv import load_dotenv
 
-load_dotenv()
+from process_data import lazy
+from process_data.instrument import instrumented
+
+logger = logging.getLogger(__name__)
+
+# only queries need these, importing the module stays fast and works without them installed
+sql = lazy.module("databricks.sql")
+dotenv = lazy.module("dotenv")
 
 
 def gen_tag_dict(dict_path: Path = Path("pull_data/pw_jetpump_tags.csv")) -> Dict[str, List[str]]:
@@ -36,13 +42,13 @@ def gen_tag_dict(dict_path: Path = Path("pull_data/pw_jetpump_tags.csv")) -> Dic
         tag_dict = {row["Well"]: (row["BHG"], row["PF Pres"], row["PF Rate"]) for index, row in df.iterrows()}
         return tag_dict
     except FileNotFoundError:
-        print(f"Error: The file {dict_path} does not exist.")
+        logger.error("Error: The file %s does not exist.", dict_path)
         raise
     except pd.errors.EmptyDataError:
-        print("Error: The CSV file is empty.")
+        logger.error("Error: The CSV file is empty.")
         raise
     except pd.errors.ParserError:
-        print("Error: There was an issue parsing the CSV file.")
+        logger.error("Error: There was an issue parsing the CSV file.")
         raise
 
 
@@ -69,6 +75,7 @@ def get_tags(wells: List[str], tag_dict: Dict[str, List[str]]) -> Dict[str, List
     return tags
 
 
+@instrumented()
 def query_tag_list(
     tags: Dict[str, List[str]], tag_dict: Dict[str, List[str]], start_date: str
 ) -> Dict[str, pd.DataFrame]:
@@ -93,13 +100,14 @@ def query_tag_list(
 
     try:
         # Establish connection using Databricks SQL
+        dotenv.load_dotenv()
         connection = sql.connect(
             server_hostname="dbc-42b811e2-2a82.cloud.databricks.com",
             http_path=os.getenv("DATABRICKS_http_path"),
             access_token=os.getenv("DATABRICKS_API_TOKEN"),
         )
 
-        print("Starting query")
+        logger.info("Starting query")
         cursor = connection.cursor()
 
         # Prepare the list of tags for the IN clause
@@ -128,7 +136,7 @@ def query_tag_list(
         cursor.close()
         connection.close()
 
-        print(f"Query complete for tags: {tag_list_str}")
+        logger.info("Query complete for tags: %s", tag_list_str)
         col_names = ["datetime", "tag", "value"]
         raw = pd.DataFrame(result, columns=col_names)
         raw["datetime"] = pd.to_datetime(raw["datetime"])
@@ -145,7 +153,7 @@ def query_tag_list(
                 well_dfs[well] = well_df_pivoted
 
     except Exception as e:
-        print(e)
-        print("Error querying tags")
+        logger.error(e)
+        logger.error("Error querying tags")
 
     return well_dfs
@@ -1,13 +1,19 @@
+import logging
 import multiprocessing
 import os
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
-from databricks import sql
-from dotenv import load_dotenv
 
-load_dotenv()
+from process_data import lazy
+from process_data.instrument import instrumented
+
+logger = logging.getLogger(__name__)
+
+# only queries need these, importing the module stays fast and works without them installed
+sql = lazy.module("databricks.sql")
+dotenv = lazy.module("dotenv")
 
 
 def gen_tag_dict(dict_path: Path = Path("pull_data/bhp_dict.csv")) -> Dict[str, List[str]]:
@@ -38,13 +44,13 @@ def gen_tag_dict(dict_path: Path = Path("pull_data/bhp_dict.csv")) -> Dict[str,
         }
         return tag_dict
     except FileNotFoundError:
-        print(f"Error: The file {dict_path} does not exist.")
+        logger.error("Error: The file %s does not exist.", dict_path)
         raise
     except pd.errors.EmptyDataError:
-        print("Error: The CSV file is empty.")
+        logger.error("Error: The CSV file is empty.")
         raise
     except pd.errors.ParserError:
-        print("Error: There was an issue parsing the CSV file.")
+        logger.error("Error: There was an issue parsing the CSV file.")
         raise
 
 
@@ -71,6 +77,7 @@ def get_tags(wells: List[str], tag_dict: Dict[str, List[str]]) -> Dict[str, List
     return tags
 
 
+@instrumented()
 def query_tag_WT_average(tags: Dict[str, List[str]], tag_dict: Dict[str, List[str]]) -> Dict[str, pd.DataFrame]:
     """
     Queries and processes time-weighted average values for specified tags over six-hour intervals. The
@@ -93,13 +100,14 @@ def query_tag_WT_average(tags: Dict[str, List[str]], tag_dict: Dict[str, List[st
 
     try:
         # Establish connection using Databricks SQL
+        dotenv.load_dotenv()
         connection = sql.connect(
             server_hostname="dbc-42b811e2-2a82.cloud.databricks.com",
             http_path=os.getenv("DATABRICKS_http_path"),
             access_token=os.getenv("DATABRICKS_API_TOKEN"),
         )
 
-        print("Starting query")
+        logger.info("Starting query")
         cursor = connection.cursor()
 
         # Prepare the list of tags for the IN clause
@@ -138,7 +146,7 @@ def query_tag_WT_average(tags: Dict[str, List[str]], tag_dict: Dict[str, List[st
         cursor.close()
         connection.close()
 
-        print(f"Query complete for tags: {tag_list_str}")
+        logger.info("Query complete for tags: %s", tag_list_str)
         col_names = ["datetime", "tag", "value"]
         raw = pd.DataFrame(result, columns=col_names)
         raw["datetime"] = pd.to_datetime(raw["datetime"])
@@ -155,12 +163,13 @@ def query_tag_WT_average(tags: Dict[str, List[str]], tag_dict: Dict[str, List[st
                 well_dfs[well] = well_df_pivoted
 
     except Exception as e:
-        print(e)
-        print("Error querying tags")
+        logger.error(e)
+        logger.error("Error querying tags")
 
     return well_dfs
 
 
+@instrumented()
 def query_tag(tags: Dict[str, List[str]], start_date: str) -> Optional[pd.DataFrame]:
     """
     Executes a SQL query to retrieve average values of specified tags over time intervals from a historian database.
@@ -186,12 +195,13 @@ def query_tag(tags: Dict[str, List[str]], start_date: str) -> Optional[pd.DataFr
     tag_list = tags
     raw = None
     try:
+        dotenv.load_dotenv()
         connection = sql.connect(
             server_hostname="dbc-42b811e2-2a82.cloud.databricks.com",
             http_path=os.getenv("DATABRICKS_http_path"),
             access_token=os.getenv("DATABRICKS_API_TOKEN"),
         )
-        print("Starting query")
+        logger.info("Starting query")
         cursor = connection.cursor()
         # Prepare the list of tags for the IN clause
         flat_tag_list = [tag for tags in tag_list.values() for tag in tags if tag is not None]
@@ -219,11 +229,11 @@ def query_tag(tags: Dict[str, List[str]], start_date: str) -> Optional[pd.DataFr
         cursor.close()
         connection.close()
 
-        print(f"Query complete for well {tag_list_str}")
+        logger.info("Query complete for well %s", tag_list_str)
         col_names = ["datetime", "tag", "value"]
         raw = pd.DataFrame(result, columns=col_names)
 
     except Exception as e:
-        print(e)
-        print("Error querying tags")
+        logger.error(e)
+        logger.error("Error querying tags")
     return raw
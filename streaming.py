@@ -0,0 +1,412 @@
+import gc
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from process_data import (
+    bhp_vs_whp,
+    calc_PI_RP,
+    coeffs_process,
+    header_scenario,
+    instrument,
+    ipr,
+    merge,
+    plot_cache,
+    process,
+    render,
+    welltests,
+)
+from process_data.results_store import ResultsStore
+from pull_data import pull_tags
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 25
+
+# (fitted pressure, daily coefficients CSV, processed coefficients CSV), header fits last
+FIT_FILES = [
+    ("WHP", "daily_bhp_whp_fit_coeffs.csv", "processed_daily_whp_bhp_coeffs.csv"),
+    ("HeaderP", "daily_bhp_header_fit_coeffs.csv", "processed_daily_header_bhp_coeffs.csv"),
+]
+GRID_FILES = {
+    "WHP": "well_data_grid_plotBHP_WHP_dailyfit.png",
+    "HeaderP": "well_data_grid_plotBHP_HeaderP_dailyfit.png",
+}
+PROCESSED_COLUMNS = ["Well", "Mean Slope", "Mean Intercept"]
+# results dataset artifact of each result CSV, the output names of pipelines.header_pipeline
+ARTIFACTS = {
+    "daily_bhp_whp_fit_coeffs.csv": "daily_coeffs",
+    "processed_daily_whp_bhp_coeffs.csv": "processed_daily_coeffs",
+    "daily_bhp_header_fit_coeffs.csv": "daily_coeffs_header",
+    "processed_daily_header_bhp_coeffs.csv": "processed_daily_coeffs_header",
+    "merged_tests.csv": "merged_test_data",
+    "res pressure.csv": "rp_calc",
+    "ipr_params.csv": "ipr_params",
+}
+
+_DONE = object()
+
+# pull(wells) -> (raw_scada_data, hourly long SCADA, tag_dict) for one chunk of wells
+ChunkPull = Callable[[List[str]], Tuple[Dict[str, pd.DataFrame], pd.DataFrame, Dict[str, Tuple[str, str, str]]]]
+
+
+def chunked(items: List[str], size: int) -> Iterator[List[str]]:
+    """Consecutive slices of items with at most size entries each."""
+    if size < 1:
+        raise ValueError("chunk size must be at least 1")
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def pull_header_chunk(
+    wells: List[str], start_date: str, tag_dict: Optional[Dict[str, Tuple[str, str, str]]] = None
+) -> Tuple[Dict[str, pd.DataFrame], pd.DataFrame, Dict[str, Tuple[str, str, str]]]:
+    """
+    Historian pull of pipelines.pull_header_scada for a chunk of wells, before proc_scada.
+
+    Args:
+        wells (List[str]): Wells of the chunk
+        start_date (str): Start of the hourly SCADA pull
+        tag_dict (Dict): Tags of every well, read from pull_data/bhp_dict.csv if None
+
+    Returns:
+        Tuple: Daily test time averages per well, hourly long SCADA data and the tag dict of the chunk's wells
+    """
+    tag_dict = tag_dict if tag_dict is not None else pull_tags.gen_tag_dict()
+    missing = [well for well in wells if well not in tag_dict]
+    if missing:
+        logger.warning("No tags for %s, skipped", ", ".join(missing))
+    chunk_tags = {well: tag_dict[well] for well in wells if well in tag_dict}
+    if not chunk_tags:
+        return {}, pd.DataFrame(columns=["datetime", "tag", "value"]), chunk_tags
+
+    raw_scada_data = pull_tags.query_tag_WT_average(chunk_tags, chunk_tags)
+    hourly = pull_tags.query_tag(chunk_tags, start_date)
+    return raw_scada_data, hourly, chunk_tags
+
+
+class CsvAppender:
+    """
+    Result CSVs written one chunk at a time.
+
+    The first write of a path in a run replaces the file and sets its columns, later chunks are
+    appended in the same column order. Row labels continue from the rows already written, so the
+    file reads like the one a single pass writes.
+    """
+
+    def __init__(self):
+        self.columns: Dict[str, pd.Index] = {}
+        self.rows: Dict[str, int] = {}
+
+    def write(self, df: pd.DataFrame, path: str, index: bool = True) -> None:
+        if df.empty:
+            return
+        first = path not in self.columns
+        if first:
+            self.columns[path] = df.columns
+            self.rows[path] = 0
+        else:
+            extra = df.columns.difference(self.columns[path])
+            if len(extra):
+                logger.warning("%s: columns %s not in the first chunk, dropped", path, list(extra))
+            df = df.reindex(columns=self.columns[path])
+        if index and isinstance(df.index, pd.RangeIndex):
+            df = df.set_axis(pd.RangeIndex(self.rows[path], self.rows[path] + len(df)))
+        df.to_csv(path, mode="w" if first else "a", header=first, index=index)
+        self.rows[path] += len(df)
+
+
+def process_header_chunk(
+    wells: List[str],
+    pulled: Tuple[Dict[str, pd.DataFrame], pd.DataFrame, Dict[str, Tuple[str, str, str]]],
+    well_tests: pd.DataFrame,
+    max_rp: int,
+    resp_modifier: float,
+    first: bool = True,
+    panel_dir: Optional[str] = None,
+    density: Optional[str] = None,
+) -> Dict:
+    """
+    One chunk of the header analysis: proc_scada -> daily fits -> merge -> reservoir pressure -> IPR.
+
+    Module level so fit workers in other processes can run it.
+
+    Args:
+        wells (List[str]): Wells of the chunk
+        pulled (Tuple): The chunk's pull, see ChunkPull
+        well_tests (pd.DataFrame): Well tests from welltests.FDCProcessor, at least the chunk's wells
+        max_rp (int): Max allowable reservoir pressure, psi
+        resp_modifier (float): Added to the optimal reservoir pressure for the IPRs
+        first (bool): The first chunk of the run
+        panel_dir (str): Folder for the daily fit panels, None makes no plot jobs
+        density (str): Scatter mode of the panels, see plot_density.density_scatter
+
+    Returns:
+        Dict: tables (result CSV name -> frame), impact (header_pressure_impact columns of the
+              chunk's wells or None), panels (bhp_vs_whp.plot_daily_fit_panel jobs) and fit_s
+    """
+    start = time.perf_counter()
+    raw_scada_data, hourly, tag_dict = pulled
+    well_scada_data = process.proc_scada(hourly, tag_dict=tag_dict)
+    del hourly, pulled
+
+    tables = {}
+    panels = []
+    for y, coeffs_name, processed_name in FIT_FILES:
+        if panel_dir is None:
+            coeffs = bhp_vs_whp.fit_daily_coefficients(well_scada_data, y)
+        else:
+            coeffs, jobs = bhp_vs_whp.daily_fit_panels(well_scada_data, y, panel_dir, density)
+            panels.extend(jobs)
+        tables[coeffs_name] = coeffs
+        tables[processed_name] = (
+            coeffs_process.process_coefficients(coeffs) if not coeffs.empty else pd.DataFrame(columns=PROCESSED_COLUMNS)
+        )
+    del well_scada_data
+
+    impact = None
+    merged_test_data = merge.merge_data([well for well in wells if well in raw_scada_data], raw_scada_data, well_tests)
+    if merged_test_data.empty:
+        logger.warning("%s: no well tests matched the SCADA data", ", ".join(wells))
+    else:
+        # only the first chunk has a row labelled 0, as in a single pass, calc_optimal_RP treats that
+        # row differently. CsvAppender relabels the rows when they are written.
+        offset = 0 if first else 1
+        merged_test_data.index = pd.RangeIndex(offset, offset + len(merged_test_data))
+        rp_calc = calc_PI_RP.calc_optimal_RP(merged_test_data.copy(), max_pres=max_rp)
+        ipr_params = ipr.fit_ipr_params(rp_calc, resp_modifier)
+        header_coeffs = header_scenario.header_slopes(tables[FIT_FILES[1][1]])
+        impact = header_scenario.header_pressure_impact(
+            np.arange(-100, 101, 10), header_coeffs, ipr_params, merged_test_data
+        )
+        tables["merged_tests.csv"] = merged_test_data
+        tables["res pressure.csv"] = rp_calc
+        tables["ipr_params.csv"] = ipr_params
+
+    return {"tables": tables, "impact": impact, "panels": panels, "fit_s": time.perf_counter() - start}
+
+
+def _put(target: queue.Queue, item, stop: threading.Event) -> bool:
+    """Put item on a bounded queue, giving up once stop is set. True if it was put."""
+    while not stop.is_set():
+        try:
+            target.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _fetch(pull: ChunkPull, chunks: List[List[str]], fetched: queue.Queue, stop: threading.Event) -> None:
+    """Fetch thread: pull the chunks in order onto fetched, then _DONE. An error is put on the queue instead."""
+    try:
+        for number, wells in enumerate(chunks, 1):
+            start = time.perf_counter()
+            pulled = pull(wells)
+            if not _put(fetched, (number, wells, pulled, time.perf_counter() - start), stop):
+                return
+            del pulled
+    except Exception as error:
+        _put(fetched, error, stop)
+        return
+    _put(fetched, _DONE, stop)
+
+
+def stream_header_analysis(
+    well_list: List[str],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_rp: int = 1800,
+    resp_modifier: float = 150,
+    test_path: str = r"fdc_test_data\Well Test 5-12-2024.csv",
+    start_date: str = "2024-3-1",
+    results_dir: str = "results",
+    plots_dir: Optional[str] = None,
+    workers: int = 1,
+    plot_workers: Optional[int] = None,
+    density: Optional[str] = None,
+    prefetch: int = 1,
+    store_dir: Optional[str] = None,
+    run_date: Optional[str] = None,
+    pull: Optional[ChunkPull] = None,
+) -> pd.DataFrame:
+    """
+    Header pressure impact analysis of pipelines.header_pipeline run chunk_size wells at a time,
+    with the historian pulls, the fits and the plots overlapped.
+
+    A fetch thread pulls the chunks onto a queue holding at most prefetch of them. Fit workers take
+    each chunk as soon as its pull is complete and run process_header_chunk. The results are
+    appended to the same CSVs the pipeline writes, in chunk order, and their daily fit panels go to
+    a render pool, so the next pull, the fits and the plots of earlier chunks run at the same time
+    and the run takes about as long as its slowest stage. Only the per well impact columns are
+    kept across chunks, so peak memory follows chunk_size * (prefetch + workers + 1) instead of
+    the well count. The fits, merges and IPRs are per well and give the same results as a single pass.
+
+    With a plots_dir the WHP and HeaderP daily fit grids are pasted together from the panels at the
+    end, the other pipeline plots need every well at once and are not drawn.
+
+    On Windows, scripts calling this with workers or plots need an if __name__ == "__main__" guard.
+
+    Args:
+        well_list (List[str]): Wells to analyze, see well_config
+        chunk_size (int): Wells pulled and processed at a time
+        max_rp (int): Max allowable reservoir pressure, psi
+        resp_modifier (float): Added to the optimal reservoir pressure for the IPRs
+        test_path (str): FDC well test export
+        start_date (str): Start of the hourly SCADA pull
+        results_dir (str): Folder for the result CSVs
+        plots_dir (str): Folder for the daily fit grids, None draws no plots
+        workers (int): Chunks fitted at once, more than 1 fits on a process pool
+        plot_workers (int): Rendering processes, defaults to the CPU count
+        density (str): None scatters every point of the panels, 'hexbin', 'hist2d' or 'lttb' draw a
+                       density layer or decimated scatter instead, see plot_density.density_scatter
+        prefetch (int): Pulled chunks waiting for a fit worker before the fetch thread pauses
+        store_dir (str): Also append each chunk's results to this Parquet dataset, see results_store
+        run_date (str): Run date partition of the stored results, defaults to today
+        pull (Callable): Chunk pull, defaults to pull_header_chunk from the historian
+
+    Returns:
+        pd.DataFrame: Oil rate change per header pressure delta and well, as header_pressure_impact.csv
+    """
+    os.makedirs(results_dir, exist_ok=True)
+
+    def results(name):
+        return os.path.join(results_dir, name)
+
+    if pull is None:
+        tag_dict = pull_tags.gen_tag_dict()
+
+        def pull(wells):
+            return pull_header_chunk(wells, start_date, tag_dict)
+
+    panel_dir = None
+    if plots_dir is not None:
+        panel_dir = os.path.join(plots_dir, "panels")
+        os.makedirs(panel_dir, exist_ok=True)
+
+    well_tests = welltests.FDCProcessor(test_path).get_welltests()
+    chunks = list(chunked(list(well_list), chunk_size))
+    csv = CsvAppender()
+    store = None
+    if store_dir is not None:
+        params = {
+            "well_list": list(well_list),
+            "max_rp": max_rp,
+            "resp_modifier": resp_modifier,
+            "test_path": test_path,
+            "start_date": start_date,
+            "chunk_size": chunk_size,
+        }
+        store = ResultsStore(store_dir, run_date=run_date, analysis="header", params=params)
+    impacts = []
+    panel_paths: Dict[str, List[str]] = {y: [] for y, _, _ in FIT_FILES}
+    timings = {"fetch": 0.0, "fit": 0.0}
+
+    fetched: queue.Queue = queue.Queue(maxsize=max(prefetch, 1))
+    stop = threading.Event()
+    fetcher = threading.Thread(target=_fetch, args=(pull, chunks, fetched, stop), name="streaming-fetch", daemon=True)
+    # one fit worker runs on a thread, the chunk data does not have to be pickled
+    fit_pool = ThreadPoolExecutor(max_workers=1) if workers <= 1 else ProcessPoolExecutor(max_workers=workers)
+    plot_pool = None
+    if panel_dir is not None:
+        plot_pool = ProcessPoolExecutor(max_workers=plot_workers, initializer=render.use_agg)
+    max_plots = 4 * (plot_workers or os.cpu_count() or 1)
+
+    pending: Dict[Future, int] = {}
+    finished: Dict[int, Dict] = {}
+    plots: set = set()
+    next_chunk = 1
+
+    def wait_plots(limit: int) -> None:
+        nonlocal plots
+        while len(plots) > limit:
+            done, plots = wait(plots, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()
+
+    def collect(return_when) -> None:
+        nonlocal next_chunk
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            finished[pending.pop(future)] = future.result()
+        # write in chunk order, a chunk that finished early waits for the ones before it
+        while next_chunk in finished:
+            result = finished.pop(next_chunk)
+            timings["fit"] += result["fit_s"]
+            for name, df in result["tables"].items():
+                csv.write(df, results(name), index=name != "ipr_params.csv")
+                if store is not None:
+                    store.write(df, ARTIFACTS[name])
+            if result["impact"] is not None:
+                impacts.append(result["impact"])
+            for job in result["panels"]:
+                panel_paths[job[3]].append(job[4])
+                plots.add(plot_pool.submit(bhp_vs_whp.plot_daily_fit_panel, *job))
+                wait_plots(max_plots)
+            logger.info("chunk %d of %d written", next_chunk, len(chunks))
+            next_chunk += 1
+
+    wall = time.perf_counter()
+    fetcher.start()
+    try:
+        with instrument.stage("streaming.header_analysis", inputs=list(well_list)) as stats:
+            while True:
+                item = fetched.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                number, wells, pulled, fetch_s = item
+                del item
+                timings["fetch"] += fetch_s
+                logger.info("chunk %d of %d pulled in %.1f s: %s", number, len(chunks), fetch_s, ", ".join(wells))
+                chunk_tests = well_tests[well_tests["well"].isin(wells)]
+                future = fit_pool.submit(
+                    process_header_chunk,
+                    wells,
+                    pulled,
+                    chunk_tests,
+                    max_rp,
+                    resp_modifier,
+                    number == 1,
+                    panel_dir,
+                    density,
+                )
+                pending[future] = number
+                del pulled
+                if len(pending) >= max(workers, 1):
+                    collect(FIRST_COMPLETED)
+            while pending:
+                collect(ALL_COMPLETED)
+            wait_plots(0)
+            stats["rows_out"] = csv.rows.get(results("merged_tests.csv"), 0)
+    finally:
+        stop.set()
+        fit_pool.shutdown(cancel_futures=True)
+        if plot_pool is not None:
+            plot_pool.shutdown(cancel_futures=True)
+        gc.collect()
+
+    if plots_dir is not None:
+        for y, name in GRID_FILES.items():
+            plot_cache.compose_grid(panel_paths[y], os.path.join(plots_dir, name))
+
+    impact = pd.concat(impacts, axis=1) if impacts else pd.DataFrame()
+    impact.to_csv(results("header_pressure_impact.csv"))
+    if store is not None and not impact.empty:
+        store.write(header_scenario.impact_by_well(impact), "header_impact")
+    logger.info(
+        "streamed %d wells in %d chunks: %.1f s, pulls %.1f s, fits %.1f s",
+        len(well_list),
+        len(chunks),
+        time.perf_counter() - wall,
+        timings["fetch"],
+        timings["fit"],
+    )
+    return impact
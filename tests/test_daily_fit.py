@@ -0,0 +1,82 @@
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from process_data import bhp_pf, bhp_vs_whp, process
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def polyfit_loop(well_dfs, x, y, dropna, keep, no_fit_slope):
+    """The per day np.polyfit loop of the DailyFit grids before the grouped fit, without the drawing."""
+    rows = []
+    for well, df in well_dfs.items():
+        # the loop raised a KeyError on a well without the y column, the grouped fit gives it no fit
+        df = df.reindex(columns=list(dict.fromkeys([*df.columns, y])))
+        df["Date"] = df.index.date
+        if df.dropna(subset=dropna).empty:
+            continue
+        kept = False
+        for date, group in df.groupby("Date"):
+            group = group.dropna(subset=dropna)
+            if len(group) > 1:
+                with warnings.catch_warnings():
+                    # constant x days are rank deficient
+                    warnings.simplefilter("ignore")
+                    slope, intercept = np.polyfit(group[x].values, group[y].values, 1)
+                if keep(slope):
+                    kept = True
+                    rows.append({"Well": well, "Date": date, "Slope": slope, "Intercept": intercept})
+        if not kept:
+            rows.append({"Well": well, "Date": pd.NaT, "Slope": no_fit_slope, "Intercept": np.nan})
+    return pd.DataFrame(rows, columns=["Well", "Date", "Slope", "Intercept"])
+
+
+def assert_same_fits(result, expected):
+    assert list(result["Well"]) == list(expected["Well"])
+    assert list(result["Date"].astype(str)) == list(expected["Date"].astype(str))
+    np.testing.assert_allclose(result["Slope"].astype(float), expected["Slope"].astype(float), rtol=1e-7)
+    np.testing.assert_allclose(result["Intercept"].astype(float), expected["Intercept"].astype(float), rtol=1e-7, atol=1e-6)
+
+
+@pytest.fixture(scope="module")
+def header_wells():
+    """Hourly BHP, HeaderP and WHP of the wells in header_data.pkl."""
+    tags = pd.read_csv(os.path.join(ROOT, "pull_data", "bhp_dict.csv"))
+    tag_dict = {row.wellname: (row.bhp_tag, row.headerP_tag, row.whp_tag) for row in tags.itertuples()}
+    return process.proc_scada(pd.read_pickle(os.path.join(ROOT, "header_data.pkl")), tag_dict)
+
+
+@pytest.mark.parametrize("y", ["WHP", "HeaderP"])
+def test_bhp_fits_match_polyfit_loop(header_wells, y):
+    well_dfs = bhp_vs_whp._daily_fit_wells(header_wells)
+    expected = polyfit_loop(well_dfs, "BHP", y, ["BHP", "WHP"], keep=lambda slope: slope >= 0.9, no_fit_slope=1000000)
+    result = bhp_vs_whp.fit_daily_coefficients(header_wells, y=y)
+    assert_same_fits(result, expected)
+
+
+def test_constant_bhp_day_is_kept(header_wells):
+    # polyfit's line through a day with a single BHP value can pass the 0.9 cut, the grouped fit keeps it too
+    fits = bhp_vs_whp.fit_daily_coefficients(header_wells, y="HeaderP")
+    day = fits[(fits["Well"] == "MPG-18") & (fits["Date"].astype(str) == "2024-03-21")]
+    assert len(day) == 1
+
+
+def test_pf_fits_match_polyfit_loop():
+    index = pd.date_range("2024-04-01", periods=24 * 5, freq="h")
+    rng = np.random.default_rng(0)
+    pf_pres = rng.uniform(2000, 3000, len(index))
+    bhp = 1500 - 0.2 * pf_pres + rng.normal(0, 5, len(index))
+    well = pd.DataFrame({"BHP": bhp, "PF_Pres": pf_pres, "PF_Rate": 1000.0}, index=index)
+    # one day at a constant PF pressure and one hour without BHP
+    well.loc["2024-04-02", "PF_Pres"] = 2500.0
+    well.iloc[80, well.columns.get_loc("BHP")] = np.nan
+    well_dfs = {"MPB-30": well, "MPB-31": well.assign(BHP=well["BHP"] + 0.1 * well["PF_Pres"])}
+
+    expected = polyfit_loop(
+        bhp_pf._daily_fit_wells(well_dfs), "PF_Pres", "BHP", ["BHP", "PF_Pres"], lambda slope: slope < 0, np.nan
+    )
+    assert_same_fits(bhp_pf.fit_daily_coefficients(well_dfs), expected)
@@ -0,0 +1,62 @@
+import datetime
+import logging
+
+import numpy as np
+import pandas as pd
+
+from process_data import coeffs_process, header_scenario
+from process_data.ipr import vogel_qmax
+
+
+def _daily_coeffs_header() -> pd.DataFrame:
+    # MPB-01 has five kept daily fits, MPB-02 only the placeholder and MPB-03 too few fits
+    days = [datetime.date(2024, 3, day) for day in range(1, 6)]
+    rows = [{"Well": "MPB-01", "Date": day, "Slope": 2.0 + i / 10, "Intercept": -500.0} for i, day in enumerate(days)]
+    rows.append({"Well": "MPB-02", "Date": pd.NaT, "Slope": header_scenario.NO_IMPACT_SLOPE, "Intercept": np.nan})
+    rows += [{"Well": "MPB-03", "Date": day, "Slope": 1.5, "Intercept": -300.0} for day in days[:2]]
+    return pd.DataFrame(rows)
+
+
+def _ipr_params() -> pd.DataFrame:
+    ipr_params = pd.DataFrame(
+        {
+            "well": ["MPB-01", "MPB-02", "MPB-03"],
+            "scenario": "newest",
+            "qtest": [800.0, 600.0, 400.0],
+            "pwf": [900.0, 1000.0, 700.0],
+            "pres": [1600.0, 1700.0, 1500.0],
+        }
+    )
+    ipr_params["qmax"] = vogel_qmax(ipr_params["qtest"], ipr_params["pwf"], ipr_params["pres"])
+    return ipr_params
+
+
+def _test_data() -> pd.DataFrame:
+    return pd.DataFrame(
+        {"well": ["MPB-01", "MPB-01", "MPB-02", "MPB-03"], "WtOilVol": 100.0, "WtWaterCut": [40.0, 60.0, 30.0, 20.0]}
+    )
+
+
+def test_header_slopes_from_kept_fits():
+    slopes = header_scenario.header_slopes(_daily_coeffs_header()).set_index("Well")
+    assert np.isclose(slopes.loc["MPB-01", "Mean Slope"], 2.2)
+    assert slopes.loc["MPB-01", "Mean Intercept"] == -500
+    assert (slopes.loc[["MPB-02", "MPB-03"], "Mean Slope"] == header_scenario.NO_IMPACT_SLOPE).all()
+
+
+def test_impact_from_daily_header_fits():
+    slopes = header_scenario.header_slopes(_daily_coeffs_header())
+    impact = header_scenario.header_pressure_impact(np.arange(-100, 101, 10), slopes, _ipr_params(), _test_data())
+    # more header pressure means more BHP and less oil, wells without a slope see no change
+    assert impact.loc[100, "MPB-01"] < 0 < impact.loc[-100, "MPB-01"]
+    assert np.allclose(impact.loc[0], 0)
+    assert np.allclose(impact[["MPB-02", "MPB-03"]], 0, atol=1e-3)
+
+
+def test_placeholder_slopes_warn(caplog):
+    # process_coefficients drops the slopes the header fit keeps
+    processed = coeffs_process.process_coefficients(_daily_coeffs_header())
+    with caplog.at_level(logging.WARNING, logger="process_data.header_scenario"):
+        impact = header_scenario.header_pressure_impact([-50, 50], processed, _ipr_params(), _test_data())
+    assert "No well has a header pressure slope" in caplog.text
+    assert np.allclose(impact.fillna(0), 0, atol=1e-3)
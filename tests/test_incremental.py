@@ -0,0 +1,81 @@
+import os
+
+import matplotlib
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipelines
+from benchmarks import synthetic
+from process_data import bhp_vs_whp, calc_PI_RP, header_scenario, process
+
+matplotlib.use("Agg")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def field():
+    """Small synthetic field, two months of hourly data on 12 wells."""
+    return synthetic.generate(12, 2, seed=3)
+
+
+def test_incremental_header_pipeline(field, tmp_path, monkeypatch):
+    long = synthetic.scada_long(field)
+    raw_daily = synthetic.wt_average(field)
+
+    def pull_header_scada(well_list, start_date, run_date):
+        # the historian has data up to the run date, query_tag pulls LocalDate > start_date
+        hours = long[(long["datetime"] > pd.Timestamp(start_date)) & (long["datetime"] < pd.Timestamp(run_date))]
+        return raw_daily, process.proc_scada(hours, field["header_tags"])
+
+    def calc_optimal_rp(df, max_pres=5000):
+        # reservoir pressure from the generator, calc_optimal_RP needs woffl
+        df = df.copy()
+        df["Optimal_RP"] = df["well"].map(field["wells"]["pres"])
+        df["PI"] = df["WtTotalFluid"] / (df["Optimal_RP"] - df["BHP"])
+        return df
+
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setattr(pipelines, "pull_header_scada", pull_header_scada)
+    monkeypatch.setattr(calc_PI_RP, "calc_optimal_RP", calc_optimal_rp)
+    test_path = str(tmp_path / "well_tests.csv")
+    synthetic.well_tests(field).to_csv(test_path, index=False)
+
+    def run(run_date):
+        pipeline = pipelines.header_pipeline(
+            list(field["header_tags"]),
+            test_path=test_path,
+            start_date="2023-12-31",
+            run_date=run_date,
+            results_dir=str(tmp_path / "results"),
+            plots_dir=str(tmp_path / "plots"),
+            incremental=True,
+        )
+        pipeline.run()
+        return pipeline
+
+    first = run("2024-02-01")
+    first_fits = first.load("daily_coeffs_header")
+    assert pd.to_datetime(first_fits["Date"]).max() < pd.Timestamp("2024-02-01")
+
+    second = run("2024-03-01")
+    new_fits = second.load("daily_coeffs_header")
+    # only the February days are fitted again
+    assert not new_fits.empty
+    assert (pd.to_datetime(new_fits["Date"]) >= pd.Timestamp("2024-02-01")).all()
+
+    # the stored history matches a full fit of both months
+    full = bhp_vs_whp.fit_daily_coefficients(process.proc_scada(long, field["header_tags"]), "HeaderP")
+    full = full[full["Date"].notna()]
+    history = pd.read_csv(tmp_path / "results" / "daily_bhp_header_fit_coeffs.csv", index_col=0)
+    assert len(history) == len(first_fits) + len(new_fits) == len(full)
+
+    # the impact comes from every stored fit, not only the new ones
+    impact = header_scenario.header_pressure_impact(
+        np.arange(-100, 101, 10),
+        header_scenario.header_slopes(pd.concat([first_fits, new_fits])),
+        second.load("ipr_params"),
+        second.load("merged_test_data"),
+    )
+    pd.testing.assert_frame_equal(second.load("header_impact"), impact)
@@ -0,0 +1,101 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+import pipelines
+from process_data import header_scenario, monte_carlo
+from process_data.ipr import vogel_qmax, vogel_rate
+
+WELLS = ["MPB-30", "MPB-31", "MPB-32"]
+DAYS = [datetime.date(2024, 4, day) for day in range(1, 9)]
+
+
+def _ipr_params() -> pd.DataFrame:
+    ipr_params = pd.DataFrame(
+        {"well": WELLS, "scenario": "newest", "qtest": [900.0, 700.0, 500.0], "pwf": [800.0, 900.0, 700.0]}
+    )
+    ipr_params["pres"] = [1700.0, 1800.0, 1600.0]
+    ipr_params["qmax"] = vogel_qmax(ipr_params["qtest"], ipr_params["pwf"], ipr_params["pres"])
+    return ipr_params
+
+
+def _test_data() -> pd.DataFrame:
+    return pd.DataFrame(
+        {"well": np.repeat(WELLS, 2), "WtOilVol": 100.0, "WtWaterCut": [40.0, 50.0, 20.0, 30.0, 60.0, 70.0]}
+    )
+
+
+def _daily_pf_coeffs(spread: float = 0.05) -> pd.DataFrame:
+    rng = np.random.default_rng(1)
+    return pd.DataFrame(
+        [
+            {"Well": well, "Date": day, "Slope": -0.3 + rng.normal(0, spread), "Intercept": 1500.0}
+            for well in WELLS
+            for day in DAYS
+        ]
+    )
+
+
+def test_seeded_draws_repeat():
+    args = (_daily_pf_coeffs(), _ipr_params(), _test_data(), 2500)
+    serial = monte_carlo.simulate_pf_oil(*args, num_draws=20_000, batch_size=5_000, processes=1, seed=7)
+    again = monte_carlo.simulate_pf_oil(*args, num_draws=20_000, batch_size=5_000, processes=1, seed=7)
+    pooled = monte_carlo.simulate_pf_oil(*args, num_draws=20_000, batch_size=5_000, processes=2, seed=7)
+
+    pd.testing.assert_frame_equal(serial, again)
+    # every batch has its own seed, so the pool gives the same draws
+    pd.testing.assert_frame_equal(serial, pooled)
+    assert list(serial.index) == [*WELLS, "Pad"]
+    assert (serial["P90"] <= serial["P50"]).all() and (serial["P50"] <= serial["P10"]).all()
+
+
+def test_pf_oil_without_spread():
+    # one fit, one water cut and a fixed reservoir pressure per well leave nothing to sample
+    test_data = _test_data().groupby("well", as_index=False).first()
+    summary = monte_carlo.simulate_pf_oil(
+        _daily_pf_coeffs(spread=0), _ipr_params(), test_data, 2500, num_draws=1_000, pres_sd=0, processes=1, seed=0
+    )
+    ipr_params = _ipr_params().set_index("well")
+    expected = vogel_rate(ipr_params["qmax"], ipr_params["pres"], -0.3 * 2500 + 1500) * (
+        100 - test_data.set_index("well")["WtWaterCut"]
+    ) / 100
+    np.testing.assert_allclose(summary.loc[WELLS, "P50"], expected[WELLS])
+    np.testing.assert_allclose(summary.loc["Pad", ["P90", "P10"]], expected.sum())
+
+
+def test_header_impact_without_spread():
+    daily_coeffs_header = pd.DataFrame(
+        [{"Well": well, "Date": day, "Slope": 2.0, "Intercept": -500.0} for well in WELLS[:2] for day in DAYS[:4]]
+        # MPB-32 has too few fits and sees no change, as in header_slopes
+        + [{"Well": "MPB-32", "Date": DAYS[0], "Slope": 2.0, "Intercept": -500.0}]
+    )
+    test_data = _test_data().groupby("well", as_index=False).first()
+    summary = monte_carlo.simulate_header_impact(
+        daily_coeffs_header, _ipr_params(), test_data, 50, num_draws=1_000, pres_sd=0, processes=1, seed=0
+    )
+    impact = header_scenario.header_pressure_impact(
+        [50], header_scenario.header_slopes(daily_coeffs_header), _ipr_params(), test_data
+    )
+    assert list(summary.index) == ["MPB-30", "MPB-31", "Pad"]
+    np.testing.assert_allclose(summary.loc[["MPB-30", "MPB-31"], "P50"], impact.loc[50, ["MPB-30", "MPB-31"]])
+    assert np.isclose(impact.loc[50, "MPB-32"], 0, atol=1e-3)
+
+
+def test_pf_monte_carlo_stage_writes_percentiles(tmp_path):
+    path = tmp_path / "B-pad pf_oil_percentiles.csv"
+    percentiles = pipelines.pf_monte_carlo(
+        _daily_pf_coeffs(),
+        _ipr_params(),
+        _test_data(),
+        pf_pres=[2000.0, 2500.0, 3000.0],
+        num_draws=5_000,
+        seed=3,
+        history_path=None,
+        percentiles_path=str(path),
+    )
+    written = pd.read_csv(path, index_col=["pf_pres", "well"])
+    pd.testing.assert_frame_equal(written, percentiles, check_index_type=False)
+    # more power fluid pressure lowers BHP and raises oil
+    pad = percentiles.xs("Pad", level="well")["P50"]
+    assert pad.is_monotonic_increasing
@@ -0,0 +1,36 @@
+import pandas as pd
+
+import pipelines
+from process_data.ipr import SCENARIOS, vogel_qmax
+
+
+def _ipr_params() -> pd.DataFrame:
+    ipr_params = pd.DataFrame(
+        [
+            {"well": well, "scenario": scenario, "qtest": qtest, "pwf": 900.0, "pres": 1700.0}
+            for well, qtest in [("MPB-30", 900.0), ("MPB-31", 600.0)]
+            for scenario in SCENARIOS
+        ]
+    )
+    ipr_params["qmax"] = vogel_qmax(ipr_params["qtest"], ipr_params["pwf"], ipr_params["pres"])
+    return ipr_params
+
+
+def _lookups(tmp_path, **kwargs):
+    processed = pd.DataFrame({"Well": ["MPB-30", "MPB-31"], "Mean Slope": -0.3, "Mean Intercept": 1500.0})
+    # MPB-30 has one outlier test at 95% water cut
+    tests = pd.DataFrame(
+        {"well": ["MPB-30"] * 5 + ["MPB-31"] * 2, "WtOilVol": 100.0, "WtWaterCut": [30, 31, 32, 33, 95, 50, 50]}
+    )
+    paths = {name: str(tmp_path / name) for name in ("liquid_path", "oil_path", "sum_path", "engine_path")}
+    rate_lookup_table, _, _ = pipelines.pf_lookups(processed, _ipr_params(), tests, **paths, **kwargs)
+    return rate_lookup_table.groupby("Well")["WtWaterCut"].first()
+
+
+def test_lookup_water_cut_follows_method(tmp_path):
+    mean = _lookups(tmp_path)
+    iqr_mean = _lookups(tmp_path, method="iqr_mean")
+    assert mean["MPB-30"] == (30 + 31 + 32 + 33 + 95) / 5
+    # the interquartile mean leaves the outlier out
+    assert iqr_mean["MPB-30"] < 33
+    assert mean["MPB-31"] == iqr_mean["MPB-31"] == 50
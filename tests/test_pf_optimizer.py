@@ -0,0 +1,89 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from process_data import pf_optimizer
+from process_data.lookup_engine import PFLookupEngine
+
+PF_GRID = np.arange(2000, 3001, 250.0)
+NOZZLE_COEFF = 50.0
+# every well sits at a BHP of 1000 psi, so the power fluid rate only depends on the setpoint
+PF_RATE = NOZZLE_COEFF * np.sqrt(PF_GRID - 1000)
+LIMITS = [4800, 5000, 5250, 5500, 5750, 6000, 6250, 6500]
+
+CONCAVE = {
+    "MPB-01": 400 * np.sqrt(PF_RATE - 1500),
+    "MPB-02": 300 * np.sqrt(PF_RATE - 1550),
+    "MPB-03": 200 * np.sqrt(PF_RATE - 1500),
+}
+# MPB-01 and MPB-02 gain little on their second setpoint and a lot on the third
+NON_CONCAVE = {
+    "MPB-01": np.array([100, 150, 500, 550, 600.0]),
+    "MPB-02": np.array([50, 100, 450, 700, 720.0]),
+    "MPB-03": np.array([50, 250, 400, 500, 560.0]),
+}
+
+
+def _pad(oil_curves):
+    lookup_table = pd.DataFrame(
+        [
+            {"Well": well, "pf_pres": pf_pres, "bhp": 1000.0, "Oil_newest_ipr": oil_rate}
+            for well, oil in oil_curves.items()
+            for pf_pres, oil_rate in zip(PF_GRID, oil)
+        ]
+    )
+    nozzle_coeffs = pd.DataFrame(
+        {"Well": list(oil_curves), "nozzle_coeff": NOZZLE_COEFF, "PF_Rate": np.nan, "PF_Pres": np.nan}
+    )
+    return PFLookupEngine.from_lookup_table(lookup_table), nozzle_coeffs
+
+
+def _best_oil(oil_curves, limit):
+    # every combination of setpoints, small pads only
+    best = -np.inf
+    for levels in itertools.product(range(len(PF_GRID)), repeat=len(oil_curves)):
+        if PF_RATE[list(levels)].sum() <= limit:
+            best = max(best, sum(oil[level] for oil, level in zip(oil_curves.values(), levels)))
+    return best
+
+
+@pytest.mark.parametrize("limit", LIMITS)
+def test_greedy_on_concave_pad(limit):
+    engine, nozzle_coeffs = _pad(CONCAVE)
+    greedy = pf_optimizer.optimize_pf_allocation(engine, nozzle_coeffs, limit, method="greedy")
+    dp = pf_optimizer.optimize_pf_allocation(engine, nozzle_coeffs, limit, method="dp")
+    auto = pf_optimizer.optimize_pf_allocation(engine, nozzle_coeffs, limit)
+
+    pd.testing.assert_frame_equal(auto, greedy)
+    assert greedy["pf_rate"].sum() <= limit
+    best = _best_oil(CONCAVE, limit)
+    assert np.isclose(dp["oil"].sum(), best, rtol=1e-6)
+    # the greedy can miss by at most the one hull step it could not pay for
+    largest_step = max(np.diff(oil).max() for oil in CONCAVE.values())
+    assert best - largest_step <= greedy["oil"].sum() <= best * (1 + 1e-6)
+
+
+@pytest.mark.parametrize("limit", LIMITS)
+def test_dp_on_non_concave_pad(limit):
+    engine, nozzle_coeffs = _pad(NON_CONCAVE)
+    greedy = pf_optimizer.optimize_pf_allocation(engine, nozzle_coeffs, limit, method="greedy")
+    dp = pf_optimizer.optimize_pf_allocation(engine, nozzle_coeffs, limit, method="dp")
+    auto = pf_optimizer.optimize_pf_allocation(engine, nozzle_coeffs, limit)
+
+    pd.testing.assert_frame_equal(auto, dp)
+    assert dp["pf_rate"].sum() <= limit
+    assert np.isclose(dp["oil"].sum(), _best_oil(NON_CONCAVE, limit), rtol=1e-6)
+    assert greedy["pf_rate"].sum() <= limit
+    assert greedy["oil"].sum() <= dp["oil"].sum() * (1 + 1e-6)
+
+
+def test_greedy_falls_short_on_non_concave_pad():
+    # the greedy spends the end of the limit on MPB-02's top setpoint, MPB-01 and MPB-02 at 2750 psi give more oil
+    engine, nozzle_coeffs = _pad(NON_CONCAVE)
+    oil = {
+        method: pf_optimizer.optimize_pf_allocation(engine, nozzle_coeffs, 6500, method=method)["oil"].sum()
+        for method in ("greedy", "dp")
+    }
+    assert oil["greedy"] < oil["dp"]
@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+import pipelines
+from process_data import pipeline
+from process_data.pipeline import Pipeline, Stage
+from process_data.report import sidecar_path
+
+CALLS = []
+
+
+def load(size):
+    CALLS.append("load")
+    return list(range(size))
+
+
+def scale(values, factor):
+    CALLS.append("scale")
+    return [value * factor for value in values]
+
+
+def total(scaled, total_path):
+    CALLS.append("total")
+    with open(total_path, "w") as handle:
+        handle.write(str(sum(scaled)))
+    return sum(scaled)
+
+
+def _pipeline(tmp_path, factor=2):
+    total_path = str(tmp_path / "total.txt")
+    return Pipeline(
+        [
+            Stage("load", load, outputs=["values"], params={"size": 10}),
+            Stage("scale", scale, inputs=["values"], outputs=["scaled"], params={"factor": factor}),
+            Stage(
+                "total", total, inputs=["scaled"], outputs=["total"], params={"total_path": total_path}, writes=[total_path]
+            ),
+        ],
+        cache_dir=str(tmp_path / "cache"),
+    )
+
+
+def _run(tmp_path, **kwargs):
+    CALLS.clear()
+    run = _pipeline(tmp_path, **kwargs)
+    run.run()
+    return run, list(CALLS)
+
+
+def _library(tmp_path, monkeypatch):
+    # a stand in for process_data, so the test can edit library code
+    package = tmp_path / "lib" / "process_data"
+    package.mkdir(parents=True)
+    (package / "fits.py").write_text("SLOPE = 1\n")
+    monkeypatch.setattr(pipeline, "_ROOT", str(tmp_path / "lib"))
+    return package / "fits.py"
+
+
+def test_unchanged_stages_are_skipped(tmp_path, monkeypatch):
+    _library(tmp_path, monkeypatch)
+    first, calls = _run(tmp_path)
+    assert calls == ["load", "scale", "total"]
+    assert first.load("total") == 90
+
+    second, calls = _run(tmp_path)
+    assert calls == []
+    assert second.load("total") == 90
+
+
+def test_params_change_reruns_only_downstream(tmp_path, monkeypatch):
+    _library(tmp_path, monkeypatch)
+    _run(tmp_path)
+    run, calls = _run(tmp_path, factor=3)
+    assert calls == ["scale", "total"]
+    assert run.load("total") == 135
+
+
+def test_missing_written_file_reruns_stage(tmp_path, monkeypatch):
+    _library(tmp_path, monkeypatch)
+    _run(tmp_path)
+    os.remove(tmp_path / "total.txt")
+    _, calls = _run(tmp_path)
+    assert calls == ["total"]
+    assert (tmp_path / "total.txt").exists()
+
+
+def test_library_change_invalidates_cache(tmp_path, monkeypatch):
+    module = _library(tmp_path, monkeypatch)
+    _run(tmp_path)
+    module.write_text("SLOPE = 2\n")
+    _, calls = _run(tmp_path)
+    assert calls == ["load", "scale", "total"]
+
+
+
+@pytest.mark.parametrize(
+    "build, workbook",
+    [(pipelines.header_pipeline, "BHP_WHP Impact Fieldwide.xlsx"), (pipelines.pf_pipeline, "B-pad PF Impact.xlsx")],
+)
+def test_report_stage_writes_sidecars(tmp_path, build, workbook):
+    run = build(["MPB-30"], results_dir=str(tmp_path / "results"), plots_dir=str(tmp_path / "plots"), report=True)
+    report = next(stage for stage in run.stages if stage.name == "report")
+    report_path = str(tmp_path / "results" / workbook)
+    sidecars = [sidecar_path(report_path, sheet) for sheet in report.params["sheets"].values()]
+    # a deleted sidecar reruns the report
+    assert report.writes == [report_path, *sidecars]
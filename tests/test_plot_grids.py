@@ -0,0 +1,116 @@
+import importlib
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+import pipelines
+from process_data import bhp_pf, bhp_vs_whp, plot_cache
+from process_data.plot_cache import PlotCache
+
+HOURS = pd.date_range("2024-04-01", periods=72, freq="h")
+
+
+def _header_wells() -> dict:
+    rng = np.random.default_rng(0)
+    wells = {}
+    for well, slope in [("MPB-30", 1.2), ("MPB-31", 1.5), ("MPB-32", 2.0)]:
+        bhp = 900 + rng.normal(0, 20, len(HOURS))
+        wells[well] = pd.DataFrame(
+            {"BHP": bhp, "WHP": slope * bhp - 700, "HeaderP": slope * bhp - 750 + rng.normal(0, 2, len(HOURS))},
+            index=HOURS,
+        )
+    return wells
+
+
+def _pf_wells() -> dict:
+    rng = np.random.default_rng(0)
+    wells = {}
+    for well in ["MPB-30", "MPB-31"]:
+        pf_pres = 2500 + rng.normal(0, 100, len(HOURS))
+        wells[well] = pd.DataFrame(
+            {"PF_Pres": pf_pres, "BHP": 2000 - 0.4 * pf_pres, "PF_Rate": 1500 + rng.normal(0, 50, len(HOURS))},
+            index=HOURS,
+        )
+    return wells
+
+
+def test_daily_fit_grid_from_panels(tmp_path):
+    one_figure = bhp_vs_whp.plot_grid_BHP_WHP_DailyFit(_header_wells(), filename=str(tmp_path / "one.png"))
+    path = tmp_path / "grid.png"
+    from_panels = bhp_vs_whp.plot_grid_BHP_WHP_DailyFit(_header_wells(), filename=str(path), max_workers=2)
+
+    pd.testing.assert_frame_equal(from_panels, one_figure)
+    panels = sorted(p.name for p in (tmp_path / "panels").iterdir())
+    assert panels == [f"MPB-3{i}_BHP_WHP_dailyfit_panel.png" for i in range(3)]
+    # three panels on a 2 x 2 grid
+    with Image.open(tmp_path / "panels" / panels[0]) as panel, Image.open(path) as grid:
+        assert grid.size == (2 * panel.width, 2 * panel.height)
+
+
+def test_pf_grids_from_panels(tmp_path):
+    one_figure = bhp_pf.plot_grid_BHP_PF_Pres_DailyFit(_pf_wells(), filename=str(tmp_path / "one"))
+    from_panels = bhp_pf.plot_grid_BHP_PF_Pres_DailyFit(_pf_wells(), filename=str(tmp_path / "grid"), max_workers=2)
+    bhp_pf.plot_grid_bhp_vs_pf_pres(_pf_wells(), filename=str(tmp_path / "pres.png"), max_workers=2)
+
+    pd.testing.assert_frame_equal(from_panels, one_figure)
+    # savefig adds the .png to the one figure grid, the pasted grid gets the same name
+    assert (tmp_path / "one.png").exists() and (tmp_path / "grid.png").exists()
+    assert (tmp_path / "pres.png").exists()
+    assert len(list((tmp_path / "panels").iterdir())) == 4
+
+
+def test_fit_stage_passes_density_to_grid(tmp_path, monkeypatch):
+    drawn = []
+    draw = bhp_vs_whp._draw_daily_fits
+    monkeypatch.setattr(bhp_vs_whp, "_draw_daily_fits", lambda *args: drawn.append(args[-1]) or draw(*args))
+    pipelines.fit_header(
+        _header_wells(),
+        plot_path=str(tmp_path / "grid.png"),
+        coeffs_path=str(tmp_path / "coeffs.csv"),
+        processed_path=str(tmp_path / "processed.csv"),
+        plot_workers=1,
+        density="hexbin",
+    )
+    assert drawn == ["hexbin"] * 3
+    assert (tmp_path / "grid.png").exists()
+
+
+def test_cached_grid_redraws_changed_wells(tmp_path, monkeypatch):
+    drawn = []
+    draw = bhp_vs_whp._draw_daily_fits
+    monkeypatch.setattr(bhp_vs_whp, "_draw_daily_fits", lambda *args: drawn.append(args[1]) or draw(*args))
+    path = str(tmp_path / "grid.png")
+    manifest = str(tmp_path / ".manifest.json")
+
+    bhp_vs_whp.plot_grid_BHP_WHP_DailyFit(_header_wells(), filename=path, cache=PlotCache(manifest))
+    assert drawn == ["MPB-30", "MPB-31", "MPB-32"]
+
+    drawn.clear()
+    bhp_vs_whp.plot_grid_BHP_WHP_DailyFit(_header_wells(), filename=path, cache=PlotCache(manifest))
+    assert drawn == []
+
+    wells = _header_wells()
+    wells["MPB-31"]["WHP"] += 10
+    bhp_vs_whp.plot_grid_BHP_WHP_DailyFit(wells, filename=path, cache=PlotCache(manifest))
+    assert drawn == ["MPB-31"]
+
+
+def test_plot_code_change_invalidates_cache(tmp_path, monkeypatch):
+    # a plot module and a helper next to it, editing the helper has to re-render
+    package = tmp_path / "plots_pkg"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "panel.py").write_text("def draw(well):\n    pass\n")
+    (package / "style.py").write_text("COLOR = 'red'\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    panel = importlib.import_module("plots_pkg.panel")
+
+    cache = PlotCache(str(tmp_path / ".manifest.json"))
+    key = cache.key(panel.draw, "MPB-30")
+    plot_cache._package_hash.cache_clear()
+    assert cache.key(panel.draw, "MPB-30") == key
+
+    (package / "style.py").write_text("COLOR = 'blue'\n")
+    plot_cache._package_hash.cache_clear()
+    assert cache.key(panel.draw, "MPB-30") != key
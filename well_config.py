@@ -307,3 +307,8 @@ all_wells_with_gauges = [
 ]
 
 B_pad_JPs = ["MPB-28", "MPB-30", "MPB-32", "MPB-35", "MPB-37", "MPB-39"]
+
+
+def well_pad(well: str) -> str:
+    """Pad letter of a well name, e.g. MPB-28 -> B."""
+    return well.split("-")[0][2:]